@@ -0,0 +1,492 @@
+"""
+Local backtest engine for strategy graphs
+
+Evaluates the same node/connection DAG that compile_to_pinescript consumes,
+in the same topological order and with the same input routing, but over
+whole OHLCV arrays instead of bar by bar.
+"""
+import bisect
+import hashlib
+import json
+from typing import List, Dict, Any, Optional, Tuple, Callable, MutableMapping, Set
+
+import numpy as np
+
+import indicators as ta
+from graph import normalize_type, is_input_node, topological_sort, build_input_map, resolve_input
+from nodes import KIND_INDICATOR, handler
+
+PRICE_FIELDS = ("open", "high", "low", "close", "volume")
+
+# Signature of the raw close series that unconnected inputs fall back to
+PRICE_SIGNATURE = "close"
+
+# Exit reason codes in the resolved position series
+EXIT_NONE = 0
+EXIT_SELL = 1
+EXIT_STOP = 2
+EXIT_TARGET = 3
+EXIT_WINDOW_END = 4  # closed on the last bar of a walk-forward window
+EXIT_REASONS = {EXIT_SELL: "sell", EXIT_STOP: "stop_loss", EXIT_TARGET: "take_profit", EXIT_WINDOW_END: "window_end"}
+
+# Bars after every buy event checked for stop/target hits in one vectorized pass
+_SHORT_HORIZON = 16
+# Bars checked by the first exit-scan window of longer trades; each following window doubles
+_EXIT_SCAN_WINDOW = 64
+
+COMPARISONS = {
+    "<": np.less,
+    ">": np.greater,
+    "<=": np.less_equal,
+    ">=": np.greater_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+
+def prepare_data(data: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Convert OHLCV columns to float64 arrays; missing price columns fall back to close"""
+    if data.get("close") is None or len(data["close"]) == 0:
+        raise ValueError("OHLCV data must include a non-empty 'close' column")
+    close = np.asarray(data["close"], dtype=np.float64)
+    arrays = {"close": close}
+    for field in PRICE_FIELDS:
+        if field == "close":
+            continue
+        values = data.get(field)
+        if values is None or len(values) == 0:
+            arrays[field] = close if field != "volume" else np.zeros_like(close)
+        else:
+            arrays[field] = np.asarray(values, dtype=np.float64)
+    timestamps = data.get("timestamp")
+    if timestamps is not None and len(timestamps) > 0:
+        arrays["timestamp"] = np.asarray(timestamps, dtype=np.int64)
+    for field, values in arrays.items():
+        if len(values) != len(close):
+            raise ValueError(f"OHLCV column '{field}' has {len(values)} bars, expected {len(close)}")
+    return arrays
+
+
+def _float_param(params: dict, key: str, default: float) -> float:
+    value = params.get(key, default)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _as_series(value: np.ndarray) -> np.ndarray:
+    """Logic outputs are boolean; indicators consume them as 0/1 floats"""
+    return value.astype(np.float64) if value.dtype == np.bool_ else value
+
+
+def _as_condition(value: np.ndarray) -> np.ndarray:
+    if value.dtype == np.bool_:
+        return value
+    return np.nan_to_num(value, nan=0.0) != 0.0
+
+
+def evaluate_indicator(name: str, params: dict, source: np.ndarray, data: Dict[str, np.ndarray]) -> np.ndarray:
+    """Evaluate one indicator node; multi-output indicators return the series their Pine variable aliases"""
+    indicator = handler(KIND_INDICATOR, name)
+    return indicator.kernel(indicator.coerce(params), source, data)
+
+
+# --- Indicator kernels, registered per name in nodes.py; params arrive typed ---
+
+def close_kernel(params: dict, source: np.ndarray, data: Dict[str, np.ndarray]) -> np.ndarray:
+    # Unknown indicators compile to `close` in Pine
+    return data["close"]
+
+
+def rsi_kernel(params: dict, source: np.ndarray, data: Dict[str, np.ndarray]) -> np.ndarray:
+    return ta.rsi(source, params["period"])
+
+
+def sma_kernel(params: dict, source: np.ndarray, data: Dict[str, np.ndarray]) -> np.ndarray:
+    return ta.sma(source, params["period"])
+
+
+def ema_kernel(params: dict, source: np.ndarray, data: Dict[str, np.ndarray]) -> np.ndarray:
+    return ta.ema(source, params["period"])
+
+
+def macd_kernel(params: dict, source: np.ndarray, data: Dict[str, np.ndarray]) -> np.ndarray:
+    line, _, _ = ta.macd(source, params["fast"], params["slow"], params["signal"])
+    return line
+
+
+def bollinger_kernel(params: dict, source: np.ndarray, data: Dict[str, np.ndarray]) -> np.ndarray:
+    _, basis, _ = ta.bollinger(source, params["period"], params["std_dev"])
+    return basis
+
+
+def stochastic_kernel(params: dict, source: np.ndarray, data: Dict[str, np.ndarray]) -> np.ndarray:
+    k_line, _ = ta.stochastic(source, data["high"], data["low"], params["k"], params["d"])
+    return k_line
+
+
+def atr_kernel(params: dict, source: np.ndarray, data: Dict[str, np.ndarray]) -> np.ndarray:
+    return ta.atr(data["high"], data["low"], data["close"], params["period"])
+
+
+def adx_kernel(params: dict, source: np.ndarray, data: Dict[str, np.ndarray]) -> np.ndarray:
+    _, _, adx = ta.dmi(data["high"], data["low"], data["close"], params["period"], params["period"])
+    return adx
+
+
+def evaluate_logic(params: dict, operand_a: np.ndarray, operand_b: Optional[np.ndarray]) -> np.ndarray:
+    """Evaluate one logic node; an unconnected 'b' handle uses the static threshold"""
+    operator = params.get("operator", "<")
+    if operand_b is None:
+        operand_b = np.full(len(operand_a), _float_param(params, "value", 0.0))
+    if operator == "crossover":
+        return ta.crossover(_as_series(operand_a), _as_series(operand_b))
+    elif operator == "crossunder":
+        return ta.crossunder(_as_series(operand_a), _as_series(operand_b))
+    elif operator == "and":
+        return _as_condition(operand_a) & _as_condition(operand_b)
+    elif operator == "or":
+        return _as_condition(operand_a) | _as_condition(operand_b)
+    elif operator in COMPARISONS:
+        with np.errstate(invalid="ignore"):
+            return COMPARISONS[operator](_as_series(operand_a), _as_series(operand_b))
+    raise ValueError(f"Unsupported logic operator: {operator}")
+
+
+def node_signature(node: dict, input_signatures: List[Optional[str]]) -> str:
+    """Content hash of what a node computes: kind, indicator name, parameters and upstream signatures
+
+    Node ids and positions are not part of it, so structurally identical nodes
+    share a signature even across different strategies.
+    """
+    nt = normalize_type(node)
+    payload = [nt, node.get("name") if nt == "indicator" else None, node.get("parameters", {}), input_signatures]
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def evaluate_strategy(strategy: dict, data: Dict[str, np.ndarray],
+                      cache: Optional[MutableMapping[str, np.ndarray]] = None,
+                      cacheable: Optional[Set[str]] = None) -> Dict[str, np.ndarray]:
+    """Evaluate every node of the graph over the full arrays, keyed by node id
+
+    Indicator nodes yield float series, logic nodes boolean series and action
+    nodes the (ungated) condition wired into them. With a cache, indicator and
+    logic outputs are looked up and stored by node signature; cacheable limits
+    that to the given node ids. Cached arrays are shared and must not be
+    modified in place.
+    """
+    nodes = strategy.get("nodes", [])
+    connections = strategy.get("connections", [])
+    sorted_nodes = topological_sort(nodes, connections)
+    input_map = build_input_map(connections)
+    outputs = {}
+    signatures = {}
+
+    def get_source(target_id, handle_id='default'):
+        source_id = resolve_input(input_map, target_id, handle_id)
+        if source_id and source_id in outputs:
+            return outputs[source_id], signatures[source_id]
+        return None, None
+
+    for node in sorted_nodes:
+        node_id = node["id"]
+        if is_input_node(node):
+            outputs[node_id] = data["close"]
+            signatures[node_id] = PRICE_SIGNATURE
+            continue
+
+        nt = normalize_type(node)
+        params = node.get("parameters", {})
+
+        if nt == "indicator":
+            source, source_sig = get_source(node_id, 'default')
+            if source is None:
+                source, source_sig = data["close"], PRICE_SIGNATURE
+            input_signatures = [source_sig]
+            compute = lambda: evaluate_indicator(node.get("name", "RSI"), params, _as_series(source), data)
+        elif nt == "logic":
+            operand_a, a_sig = get_source(node_id, 'a')
+            if operand_a is None:
+                operand_a, a_sig = data["close"], PRICE_SIGNATURE
+            operand_b, b_sig = get_source(node_id, 'b')
+            input_signatures = [a_sig, b_sig]
+            compute = lambda: evaluate_logic(params, operand_a, operand_b)
+        elif nt == "action":
+            condition, condition_sig = get_source(node_id, 'default')
+            if condition is not None:
+                outputs[node_id] = _as_condition(condition)
+                signatures[node_id] = condition_sig
+            continue
+        else:
+            continue
+
+        signature = node_signature(node, input_signatures)
+        signatures[node_id] = signature
+        use_cache = cache is not None and (cacheable is None or node_id in cacheable)
+        value = cache.get(signature) if use_cache else None
+        if value is None:
+            value = compute()
+            if use_cache:
+                cache[signature] = value
+        outputs[node_id] = value
+    return outputs
+
+
+def _risk_percent(value: Any) -> float:
+    """Stop-loss/take-profit percentage; None, empty string or 0 disable it"""
+    if value in [None, "", "0", 0]:
+        return 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _risk_flags(nodes: List[dict]) -> Tuple[bool, bool]:
+    """Mirror the compiler's pre-scan deciding whether SL/TP state exists at all"""
+    has_sl = False
+    has_tp = False
+    for node in nodes:
+        if node.get("type", "").lower() in ["action", "actionnode"]:
+            params = node.get("parameters", {})
+            if params.get("actionType") == "buy":
+                if _risk_percent(params.get("stopLoss")) > 0: has_sl = True
+                if _risk_percent(params.get("takeProfit")) > 0: has_tp = True
+    return has_sl, has_tp
+
+
+def build_signals(strategy: dict, outputs: Dict[str, np.ndarray], n: int) -> Dict[str, np.ndarray]:
+    """Collapse action nodes into per-bar buy/sell triggers and SL/TP percentages
+
+    When several buy actions fire on the same bar the last one in topological
+    order sets the stop and target, as the sequential Pine assignments do.
+    """
+    nodes = strategy.get("nodes", [])
+    has_sl, has_tp = _risk_flags(nodes)
+    buy = np.zeros(n, dtype=bool)
+    sell = np.zeros(n, dtype=bool)
+    stop_pct = np.zeros(n)
+    target_pct = np.zeros(n)
+
+    for node in topological_sort(nodes, strategy.get("connections", [])):
+        condition = outputs.get(node["id"])
+        if normalize_type(node) != "action" or condition is None:
+            continue
+        params = node.get("parameters", {})
+        action_type = params.get("actionType", "buy").lower()
+        if action_type == "buy":
+            sl_percent = params.get("stopLoss")
+            if sl_percent is None:
+                sl_percent = params.get("parameters", {}).get("stopLoss", "")
+            tp_percent = params.get("takeProfit")
+            if tp_percent is None:
+                tp_percent = params.get("parameters", {}).get("takeProfit", "")
+            buy |= condition
+            stop_pct = np.where(condition, _risk_percent(sl_percent) if has_sl else 0.0, stop_pct)
+            target_pct = np.where(condition, _risk_percent(tp_percent) if has_tp else 0.0, target_pct)
+        elif action_type == "sell":
+            sell |= condition
+    return {"buy": buy, "sell": sell, "stop_pct": stop_pct, "target_pct": target_pct}
+
+
+def _first_risk_exit(close: np.ndarray, start: int, end: int, stop: float, target: float) -> Tuple[int, int]:
+    """First bar in [start, end) where the stop or target fires -> (index, reason)
+
+    Scans geometrically growing windows, so finding an exit costs time
+    proportional to the length of the trade rather than the whole series.
+    """
+    pos = start
+    width = _EXIT_SCAN_WINDOW
+    while pos < end:
+        stop_at = min(pos + width, end)
+        window = close[pos:stop_at]
+        hit = (window < stop) | (window > target)
+        if hit.any():
+            t = pos + int(np.argmax(hit))
+            return t, EXIT_STOP if close[t] < stop else EXIT_TARGET
+        pos = stop_at
+        width *= 2
+    return end, EXIT_NONE
+
+
+def resolve_positions(close: np.ndarray, buy: np.ndarray, sell: np.ndarray,
+                      stop_pct: np.ndarray, target_pct: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Apply the can_buy/can_sell state machine -> (position, entry price, exit reason)
+
+    All three series describe the state at the close of each bar. Instead of
+    stepping through every bar, the buy triggers are compressed to event
+    indices and each event's would-be exit (next sell, or a stop/target hit
+    within a short horizon) is computed for all events at once. The loop then
+    only jumps from entry to exit to the next buy event: an entry bar can
+    never exit (can_sell is still false and the stop/target straddle the entry
+    close) and the exit bar can never re-enter (can_buy was snapshotted while
+    the position was open). The series are rebuilt with a cumulative sum and
+    a forward fill.
+    """
+    n = len(close)
+    buy_events = np.flatnonzero(buy)
+    # next_sell[i]: first sell trigger at or after bar i (n when there is none)
+    next_sell = np.empty(n + 1, dtype=np.int64)
+    next_sell[n] = n
+    next_sell[:n] = np.minimum.accumulate(np.where(sell, np.arange(n), n)[::-1])[::-1]
+
+    # Exit every buy event would get if it opened the position
+    candidate_exit = next_sell[buy_events + 1]
+    candidate_reason = np.where(candidate_exit < n, EXIT_SELL, EXIT_NONE).astype(np.int8)
+    entry_close = close[buy_events]
+    event_stop_pct = stop_pct[buy_events]
+    event_target_pct = target_pct[buy_events]
+    with np.errstate(invalid="ignore"):
+        stop = np.where(event_stop_pct > 0, entry_close * (1 - event_stop_pct / 100), np.nan)
+        target = np.where(event_target_pct > 0, entry_close * (1 + event_target_pct / 100), np.nan)
+    pending = ~(np.isnan(stop) & np.isnan(target))
+    # Short trades: test the first bars after all events at once
+    for k in range(1, _SHORT_HORIZON + 1):
+        bar = buy_events + k
+        live = pending & (bar < candidate_exit)
+        if not live.any():
+            break
+        price = close[np.minimum(bar, n - 1)]
+        stop_hit = live & (price < stop)
+        target_hit = live & ~stop_hit & (price > target)
+        hit = stop_hit | target_hit
+        candidate_exit[hit] = bar[hit]
+        candidate_reason[stop_hit] = EXIT_STOP
+        candidate_reason[target_hit] = EXIT_TARGET
+        pending &= ~hit
+    # Longer trades are scanned lazily, only if the event actually opens a position
+    pending &= buy_events + _SHORT_HORIZON + 1 < candidate_exit
+
+    events = buy_events.tolist()
+    exit_list = candidate_exit.tolist()
+    reason_list = candidate_reason.tolist()
+    pending_list = pending.tolist()
+    entries = []
+    exits = []
+    reasons = []
+    i = 0
+    while i < len(events):
+        entry = events[i]
+        exit_idx, reason = exit_list[i], reason_list[i]
+        if pending_list[i]:
+            risk_idx, risk_reason = _first_risk_exit(close, entry + _SHORT_HORIZON + 1, exit_idx, stop[i], target[i])
+            if risk_reason != EXIT_NONE:
+                exit_idx, reason = risk_idx, risk_reason
+        entries.append(entry)
+        if reason == EXIT_NONE:
+            break
+        exits.append(exit_idx)
+        reasons.append(reason)
+        i = bisect.bisect_right(events, exit_idx, i + 1)
+
+    delta = np.zeros(n + 1, dtype=np.int8)
+    delta[entries] += 1
+    delta[exits] -= 1
+    position = np.cumsum(delta[:n], dtype=np.int8)
+
+    entry_marks = np.full(n, -1)
+    entry_marks[entries] = entries
+    last_entry = np.maximum.accumulate(entry_marks)
+    entry_price = np.where(position == 1, close[np.maximum(last_entry, 0)], np.nan)
+
+    exit_reason = np.zeros(n, dtype=np.int8)
+    exit_reason[exits] = reasons
+    return position, entry_price, exit_reason
+
+
+def summarize(data: Dict[str, np.ndarray], position: np.ndarray, exit_reason: np.ndarray,
+              starting_cash: float = 10000.0, fee_bps: float = 0.0, slippage_bps: float = 0.0,
+              include_details: bool = True) -> Dict[str, Any]:
+    """Headline metrics, plus the trade list and equity curve unless include_details is off"""
+    close = data["close"]
+    n = len(close)
+    cost = (fee_bps + slippage_bps) / 10000.0
+
+    held = np.zeros(n)
+    held[1:] = position[:-1]
+    bar_return = np.zeros(n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bar_return[1:] = held[1:] * (close[1:] / close[:-1] - 1.0)
+    previous = np.concatenate(([0], position[:-1]))
+    entries = np.flatnonzero((position == 1) & (previous == 0))
+    exits = np.flatnonzero(exit_reason != EXIT_NONE)
+    costs = np.zeros(n)
+    costs[entries] += cost
+    costs[exits] += cost
+    equity = starting_cash * np.cumprod((1.0 + bar_return) * (1.0 - costs))
+
+    # Trades: an entry without a matching exit is still open at the last bar
+    closed_count = len(exits)
+    exit_index = np.append(exits, n - 1) if len(entries) > closed_count else exits
+    entry_prices = close[entries]
+    exit_prices = close[exit_index]
+    returns_pct = (exit_prices / entry_prices * (1.0 - cost) ** 2 - 1.0) * 100.0
+
+    running_max = np.maximum.accumulate(equity)
+    drawdown = (equity / running_max - 1.0) * 100.0
+    wins = int((returns_pct[:closed_count] > 0).sum())
+    metrics = {
+        "bars": n,
+        "num_trades": len(entries),
+        "final_equity": float(equity[-1]),
+        "total_return_pct": float((equity[-1] / starting_cash - 1.0) * 100.0),
+        "max_drawdown_pct": float(-drawdown.min()),
+        "win_rate_pct": (wins / closed_count * 100.0) if closed_count else 0.0,
+        "exposure_pct": float(position.mean() * 100.0),
+    }
+    result = {"metrics": metrics}
+    if not include_details:
+        return result
+
+    timestamps = data.get("timestamp")
+    trades = []
+    for i, (entry_idx, exit_idx, entry_price, exit_price, return_pct) in enumerate(zip(
+            entries.tolist(), exit_index.tolist(), entry_prices.tolist(), exit_prices.tolist(), returns_pct.tolist())):
+        is_open = i >= closed_count
+        trade = {
+            "entry_index": entry_idx,
+            "exit_index": None if is_open else exit_idx,
+            "entry_price": entry_price,
+            "exit_price": exit_price,
+            "exit_reason": "open" if is_open else EXIT_REASONS[int(exit_reason[exit_idx])],
+            "return_pct": return_pct,
+        }
+        if timestamps is not None:
+            trade["entry_time"] = int(timestamps[entry_idx])
+            trade["exit_time"] = None if is_open else int(timestamps[exit_idx])
+        trades.append(trade)
+    result["trades"] = trades
+    result["equity"] = equity.tolist()
+    return result
+
+
+def backtest_arrays(strategy: dict, arrays: Dict[str, np.ndarray], starting_cash: float = 10000.0,
+                    fee_bps: float = 0.0, slippage_bps: float = 0.0,
+                    cache: Optional[MutableMapping[str, np.ndarray]] = None,
+                    cacheable: Optional[Set[str]] = None, include_details: bool = True,
+                    progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Backtest over already prepared arrays, optionally reusing cached node outputs
+
+    progress, if given, is called with each phase name ("indicators",
+    "backtesting", "results") as it starts; raising from it aborts the run.
+    """
+    if progress:
+        progress("indicators")
+    outputs = evaluate_strategy(strategy, arrays, cache=cache, cacheable=cacheable)
+    if progress:
+        progress("backtesting")
+    signals = build_signals(strategy, outputs, len(arrays["close"]))
+    position, _, exit_reason = resolve_positions(
+        arrays["close"], signals["buy"], signals["sell"], signals["stop_pct"], signals["target_pct"]
+    )
+    if progress:
+        progress("results")
+    return summarize(arrays, position, exit_reason, starting_cash, fee_bps, slippage_bps, include_details)
+
+
+def run_backtest(strategy: dict, data: Dict[str, Any], starting_cash: float = 10000.0,
+                 fee_bps: float = 0.0, slippage_bps: float = 0.0) -> Dict[str, Any]:
+    """Evaluate a strategy graph over OHLCV data and simulate its long-only trades"""
+    return backtest_arrays(strategy, prepare_data(data), starting_cash, fee_bps, slippage_bps)
@@ -0,0 +1,203 @@
+"""
+Sharded backtests across a process pool, with price data shared rather than pickled
+"""
+import itertools
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+import numpy as np
+
+from backtest import backtest_arrays
+from ohlcv_store import OHLCVStore
+from sweep import apply_overrides
+
+# Backtests (sources x parameter combinations) allowed in one batch
+MAX_BACKTESTS = 100000
+# Shards per worker when splitting automatically: enough to even out uneven shards
+SHARDS_PER_WORKER = 4
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# Per worker process: stores opened by root, so their column maps are reused across shards
+_stores: Dict[str, OHLCVStore] = {}
+
+
+def worker_count() -> int:
+    """Pool size from BACKTEST_WORKERS, defaulting to the CPU count"""
+    return max(1, int(os.environ.get("BACKTEST_WORKERS", "0")) or os.cpu_count() or 1)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Shared backtest pool, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=worker_count())
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+class SharedArrays:
+    """Columns copied once into a shared memory block that workers map by name
+
+    Workers receive only the small descriptor; the bars themselves are never
+    pickled. The creator unlinks the block with close().
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        layout = {}
+        offset = 0
+        for name, values in arrays.items():
+            values = np.ascontiguousarray(values)
+            layout[name] = (offset, values.dtype.str, len(values))
+            # Keep every column 8-byte aligned
+            offset += -(-values.nbytes // 8) * 8
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 8))
+        for name, values in arrays.items():
+            start, dtype, length = layout[name]
+            np.ndarray(length, dtype=dtype, buffer=self.shm.buf, offset=start)[:] = values
+        self.descriptor = {"shm": self.shm.name, "layout": layout}
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach_source(source: Dict[str, Any]) -> Tuple[Optional[shared_memory.SharedMemory], Dict[str, np.ndarray]]:
+    """Open a shard's bars in the worker: a shared memory block or memory-mapped store columns"""
+    if "shm" in source:
+        shm = shared_memory.SharedMemory(name=source["shm"])
+        arrays = {}
+        for name, (start, dtype, length) in source["layout"].items():
+            column = np.ndarray(length, dtype=dtype, buffer=shm.buf, offset=start)
+            column.flags.writeable = False
+            arrays[name] = column
+        return shm, arrays
+    store = _stores.get(source["store"])
+    if store is None:
+        store = _stores[source["store"]] = OHLCVStore(source["store"])
+    return None, store.load(source["symbol"], source["interval"], source.get("start"), source.get("end"))
+
+
+def release(shm: Optional[shared_memory.SharedMemory]):
+    """Unmap a block opened by attach_source; every view into it should be dropped first"""
+    if shm is None:
+        return
+    try:
+        shm.close()
+    except BufferError:
+        pass  # Still referenced somewhere; unmapped when the worker exits
+
+
+def run_shard(index: int, label: str, strategy: dict, source: Dict[str, Any], combos: List[dict],
+              reusable: List[str], options: Dict[str, float]) -> Dict[str, Any]:
+    """Backtest one slice of parameter combinations over one source (runs in a worker)
+
+    Node outputs that no swept parameter touches are cached across the slice,
+    as in run_sweep.
+    """
+    started = time.perf_counter()
+    result = {"shard": index, "source": label}
+    shm = None
+    try:
+        shm, arrays = attach_source(source)
+        cache: Dict[str, np.ndarray] = {}
+        cacheable = set(reusable)
+        results = []
+        for overrides in combos:
+            outcome = backtest_arrays(apply_overrides(strategy, overrides), arrays, cache=cache,
+                                      cacheable=cacheable, include_details=False, **options)
+            results.append({"parameters": overrides, "metrics": outcome["metrics"]})
+        result["results"] = results
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {str(e)}"
+    finally:
+        # Views into the block must be gone before it can be closed
+        arrays = cache = outcome = None
+        release(shm)
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def plan_shards(sources: int, combinations: int, workers: int, shard_size: Optional[int] = None) -> List[Tuple[int, int, int]]:
+    """(source index, first combination, end) per shard
+
+    Each shard stays on one source so it loads its bars and fills its node
+    cache once. Without a shard_size, combinations are split just enough to
+    give every worker several shards even when there are few sources.
+    """
+    if shard_size is None:
+        chunks = max(1, math.ceil(workers * SHARDS_PER_WORKER / max(sources, 1)))
+        shard_size = math.ceil(combinations / min(chunks, combinations))
+    shards = []
+    for source in range(sources):
+        for start in range(0, combinations, shard_size):
+            shards.append((source, start, min(start + shard_size, combinations)))
+    return shards
+
+
+def expand_grid(grid: Dict[str, Dict[str, List[Any]]]) -> List[Dict[str, Dict[str, Any]]]:
+    """Every combination of {node_id: {parameter: [values]}} as override dicts ([{}] for no grid)"""
+    axes = [(node_id, param, values) for node_id, params in grid.items() for param, values in params.items()]
+    if any(not values for _, _, values in axes):
+        raise ValueError("Every swept parameter needs at least one value")
+    combos = []
+    for combo in itertools.product(*(values for _, _, values in axes)):
+        overrides: Dict[str, Dict[str, Any]] = {}
+        for (node_id, param, _), value in zip(axes, combo):
+            overrides.setdefault(node_id, {})[param] = value
+        combos.append(overrides)
+    return combos
+
+
+def backtest_batch(strategy: dict, sources: List[Tuple[str, Dict[str, Any]]], combos: List[dict],
+                   reusable: List[str], options: Dict[str, float],
+                   shard_size: Optional[int] = None) -> Iterator[str]:
+    """Run every (source, combination) backtest in shards, yielding one NDJSON line per finished shard
+
+    sources are (label, descriptor) pairs: {"shm", "layout"} from SharedArrays
+    or {"store", "symbol", "interval", "start", "end"}. The last line is a
+    summary with the shard count and wall time. Closing the stream early
+    cancels the shards that have not started.
+    """
+    started = time.perf_counter()
+    plan = plan_shards(len(sources), len(combos), worker_count(), shard_size)
+    pool = get_pool()
+    futures = {}
+    try:
+        for index, (source, start, end) in enumerate(plan):
+            label, descriptor = sources[source]
+            future = pool.submit(run_shard, index, label, strategy, descriptor, combos[start:end], reusable, options)
+            futures[future] = (index, label)
+        failed = 0
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker itself died; only this shard fails
+                if isinstance(e, BrokenProcessPool):
+                    shutdown_pool()
+                index, label = futures[future]
+                result = {"shard": index, "source": label, "error": f"{type(e).__name__}: {str(e)}"}
+            failed += "error" in result
+            yield json.dumps(result) + "\n"
+        yield json.dumps({"done": True, "shards": len(plan), "failed": failed,
+                          "backtests": len(sources) * len(combos), "seconds": time.perf_counter() - started}) + "\n"
+    finally:
+        for future in futures:
+            future.cancel()
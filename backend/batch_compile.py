@@ -0,0 +1,83 @@
+"""
+Batch compilation fanned out across a process pool
+"""
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Iterator, Optional
+
+from compiler import EMITTERS
+from ir import lower_strategy
+from validation import validate_strategy
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def worker_count() -> int:
+    """Pool size from COMPILE_WORKERS, defaulting to the CPU count"""
+    return max(1, int(os.environ.get("COMPILE_WORKERS", "0")) or os.cpu_count() or 1)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Shared compile pool, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=worker_count())
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def compile_item(index: int, strategy: dict, targets: List[str]) -> Dict[str, Any]:
+    """Validate one strategy, lower it once and emit every target (runs in a worker)"""
+    result = {"index": index, "id": strategy.get("id"), "name": strategy.get("name"), "code": {}, "errors": {}}
+    try:
+        validate_strategy(strategy)
+    except Exception as e:
+        result["error"] = f"Validation error: {str(e)}"
+        return result
+    try:
+        ir = lower_strategy(strategy)
+    except Exception as e:
+        result["errors"] = {target: f"{type(e).__name__}: {str(e)}" for target in targets}
+        return result
+    for target in targets:
+        try:
+            result["code"][target] = EMITTERS[target](ir)
+        except Exception as e:
+            result["errors"][target] = f"{type(e).__name__}: {str(e)}"
+    return result
+
+
+def compile_batch(items: List[Dict[str, Any]], targets: List[str]) -> Iterator[str]:
+    """Compile items in parallel, yielding one NDJSON line per item as it finishes
+
+    Items carrying an 'error' instead of a 'strategy' (e.g. an unknown id) are
+    reported straight away without touching the pool.
+    """
+    pool = get_pool()
+    futures = {}
+    for index, item in enumerate(items):
+        if "error" in item:
+            yield json.dumps({"index": index, "id": item.get("id"), "error": item["error"]}) + "\n"
+            continue
+        futures[pool.submit(compile_item, index, item["strategy"], targets)] = index
+    for future in as_completed(futures):
+        try:
+            result = future.result()
+        except Exception as e:
+            # The worker itself died; only this item fails
+            if isinstance(e, BrokenProcessPool):
+                shutdown_pool()
+            result = {"index": futures[future], "error": f"{type(e).__name__}: {str(e)}"}
+        yield json.dumps(result) + "\n"
@@ -0,0 +1,225 @@
+"""
+Compiler benchmarks over seeded random strategy DAGs
+
+Usage:
+    python benchmark.py                                  # report only
+    python benchmark.py --save-baseline bench_baseline.json
+    python benchmark.py --check bench_baseline.json      # exit 1 on regression
+"""
+import argparse
+import gc
+import json
+import math
+import random
+import sys
+import time
+import tracemalloc
+from typing import List, Dict, Any, Callable, Optional
+
+from compiler import emit_pinescript, compile_to_pinescript
+from graph import topological_sort
+from ir import lower_strategy
+from validation import validate_strategy
+
+INDICATORS = [
+    ("RSI", {"period": 14}),
+    ("SMA", {"period": 20}),
+    ("EMA", {"period": 20}),
+    ("MACD", {"fast": 12, "slow": 26, "signal": 9}),
+    ("Bollinger Bands", {"period": 20, "std_dev": 2}),
+]
+OPERATORS = ["<", ">", "<=", ">=", "crossover", "crossunder"]
+
+
+def generate_strategy(size: int, seed: int = 0, depth: int = 8, fan_in: int = 2,
+                      mix: tuple = (0.5, 0.4, 0.1)) -> dict:
+    """Random valid strategy DAG with size nodes (plus the Strategy Start node)
+
+    Nodes are spread over depth layers and take their inputs from earlier
+    layers, always including the previous one so the graph really is depth
+    deep. fan_in is the number of wired inputs on logic nodes (1 compares
+    against a constant, 2 against another series); indicators and actions
+    always have one. mix is the indicator/logic/action share. Parameters are
+    randomized so CSE only merges the occasional genuine duplicate.
+    """
+    if not 1 <= fan_in <= 2:
+        raise ValueError("fan_in must be 1 or 2 (logic nodes have two input ports)")
+    rng = random.Random(seed)
+    nodes = [{"id": "start", "type": "input", "name": "Strategy Start", "parameters": {}, "position": {"x": 0, "y": 0}}]
+    connections = []
+    # Per layer: ids producing a series and ids producing a condition
+    series = [["start"]]
+    conditions = [[]]
+    weights = [mix[0], mix[1], mix[2]]
+
+    def pick(pools: List[List[str]], layer: int) -> Optional[str]:
+        previous = pools[layer - 1]
+        if previous and rng.random() < 0.5:
+            return rng.choice(previous)
+        candidates = [ids for ids in pools[:layer] if ids]
+        return rng.choice(rng.choice(candidates)) if candidates else None
+
+    for i in range(size):
+        layer = 1 + i * depth // max(size, 1)
+        while len(series) <= layer:
+            series.append([])
+            conditions.append([])
+        kind = rng.choices(["indicator", "logic", "action"], weights)[0]
+        if kind == "action" and not any(conditions[:layer]):
+            kind = "logic"
+        position = {"x": layer * 200, "y": i}
+
+        if kind == "indicator":
+            name, defaults = rng.choice(INDICATORS)
+            params = {key: value + rng.randint(0, 30) for key, value in defaults.items()}
+            node_id = f"ind-{i}"
+            nodes.append({"id": node_id, "type": "indicator", "name": name, "parameters": params, "position": position})
+            connections.append({"source": pick(series, layer), "target": node_id})
+            series[layer].append(node_id)
+        elif kind == "logic":
+            node_id = f"logic-{i}"
+            params = {"operator": rng.choice(OPERATORS), "value": rng.randint(0, 100)}
+            nodes.append({"id": node_id, "type": "logic", "name": "Logic", "parameters": params, "position": position})
+            for handle in ["a", "b"][:fan_in]:
+                connections.append({"source": pick(series, layer), "target": node_id, "targetHandle": handle})
+            conditions[layer].append(node_id)
+        else:
+            node_id = f"act-{i}"
+            action = rng.choice(["buy", "sell"])
+            params = {"actionType": action}
+            if action == "buy" and rng.random() < 0.3:
+                params.update(stopLoss=rng.randint(1, 5), takeProfit=rng.randint(2, 10))
+            nodes.append({"id": node_id, "type": "action", "name": action.title(), "parameters": params, "position": position})
+            connections.append({"source": pick(conditions, layer), "target": node_id})
+
+    return {"name": f"Bench {size}", "nodes": nodes, "connections": connections}
+
+
+def stages(strategy: dict) -> Dict[str, Callable[[], Any]]:
+    """Each compile stage as a zero-argument callable over the same strategy"""
+    from main import Strategy  # Deferred: importing the app opens the strategy store
+    ir = lower_strategy(strategy)
+    return {
+        "parse": lambda: Strategy(**strategy),
+        "validate": lambda: validate_strategy(strategy),
+        "toposort": lambda: topological_sort(strategy["nodes"], strategy["connections"]),
+        "lower": lambda: lower_strategy(strategy),
+        "emit": lambda: emit_pinescript(ir),
+        "compile": lambda: compile_to_pinescript(strategy),
+    }
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Best wall time of repeat runs, then peak traced allocation of one more
+
+    The cyclic GC is paused while timing, as timeit does: its full collections
+    scale with every live object and would blur the stage's own growth.
+    """
+    best = math.inf
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "peak_bytes": peak}
+
+
+def run(sizes: List[int], seed: int = 0, depth: int = 8, fan_in: int = 2, repeat: int = 3,
+        only: Optional[List[str]] = None) -> Dict[str, Any]:
+    results = {}
+    for size in sizes:
+        strategy = generate_strategy(size, seed, depth, fan_in)
+        for stage, fn in stages(strategy).items():
+            if only and stage not in only:
+                continue
+            results.setdefault(stage, {})[str(size)] = measure(fn, repeat)
+    return {"sizes": sizes, "seed": seed, "depth": depth, "fan_in": fan_in, "results": results}
+
+
+def growth(timings: Dict[str, Dict[str, float]]) -> float:
+    """How much the per-node cost grows from the smallest to the largest size (1.0 = linear)"""
+    sizes = sorted(int(size) for size in timings)
+    small, large = sizes[0], sizes[-1]
+    if small == large:
+        return 1.0
+    per_node_small = timings[str(small)]["seconds"] / small
+    per_node_large = timings[str(large)]["seconds"] / large
+    return per_node_large / per_node_small if per_node_small > 0 else 1.0
+
+
+def check(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, max_growth: float) -> List[str]:
+    """Regressions against the baseline (time and memory) plus superlinear stages"""
+    failures = []
+    for stage, timings in report["results"].items():
+        if growth(timings) > max_growth:
+            failures.append(f"{stage}: per-node cost grows {growth(timings):.1f}x across sizes (limit {max_growth}x)")
+        for size, current in timings.items():
+            reference = baseline.get("results", {}).get(stage, {}).get(size)
+            if reference is None:
+                continue
+            for metric in ("seconds", "peak_bytes"):
+                limit = reference[metric] * (1 + tolerance)
+                if current[metric] > limit:
+                    failures.append(f"{stage} @ {size}: {metric} {current[metric]:.6g} > {limit:.6g} "
+                                    f"(baseline {reference[metric]:.6g} + {tolerance:.0%})")
+    return failures
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"{'stage':<10} {'nodes':>8} {'ms':>10} {'us/node':>9} {'peak MiB':>9}"]
+    for stage, timings in report["results"].items():
+        for size, result in timings.items():
+            lines.append(f"{stage:<10} {size:>8} {result['seconds'] * 1000:>10.2f} "
+                         f"{result['seconds'] * 1e6 / int(size):>9.2f} {result['peak_bytes'] / 2**20:>9.2f}")
+        lines.append(f"{'':<10} {'growth':>8} {growth(timings):>10.2f}x")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated node counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--depth", type=int, default=8)
+    parser.add_argument("--fan-in", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stages", help="comma-separated subset of stages to run")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--save-baseline", help="write the report as the new baseline")
+    parser.add_argument("--check", help="baseline to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown vs baseline (0.5 = +50%%)")
+    parser.add_argument("--max-growth", type=float, default=4.0, help="allowed per-node cost growth across sizes")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    only = args.stages.split(",") if args.stages else None
+    report = run(sizes, args.seed, args.depth, args.fan_in, args.repeat, only)
+    print(format_report(report))
+    for path in filter(None, [args.json, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.check:
+        with open(args.check) as f:
+            baseline = json.load(f)
+        if (baseline.get("seed"), baseline.get("depth"), baseline.get("fan_in")) != (args.seed, args.depth, args.fan_in):
+            print("warning: baseline was recorded with a different seed/depth/fan-in", file=sys.stderr)
+        failures = check(report, baseline, args.tolerance, args.max_growth)
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+"""
+Incremental Pine Script recompilation for the live editor preview
+"""
+import bisect
+import difflib
+import heapq
+import threading
+import uuid
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+from compiler import pine_header, pine_slot, pine_alias, pine_footer
+from ir import KIND_ACTION, lower_strategy, node_kind, refresh_node, risk_flags
+
+# Deltas that only touch one node's own fields; anything else changes the graph shape
+NODE_DELTAS = {"set_parameters", "update_node"}
+
+
+class DeltaError(ValueError):
+    pass
+
+
+def apply_patch(lines: List[str], patch: List[Dict[str, Any]]) -> List[str]:
+    """Apply hunks in order; each start is an index into the already patched lines"""
+    lines = list(lines)
+    for hunk in patch:
+        start = hunk["start"]
+        lines[start:start + hunk["delete"]] = hunk["lines"]
+    return lines
+
+
+def diff_lines(old: List[str], new: List[str]) -> List[Dict[str, Any]]:
+    patch = []
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal":
+            patch.append({"start": j1, "delete": i2 - i1, "lines": new[j1:j2]})
+    return patch
+
+
+class CompileSession:
+    """A strategy being edited, with its Pine output kept per topological slot
+
+    Each slot remembers the variable holding its value, its CSE key and the
+    lines it contributed. A parameter or name edit re-emits the edited node,
+    then only the slots whose inputs or CSE aliasing actually changed as a
+    result, in topological order. Edits that change the graph's shape lower it
+    again and diff the output.
+    """
+
+    def __init__(self, strategy: dict):
+        self.id = str(uuid.uuid4())
+        self.name = strategy.get("name", "Untitled")
+        self.nodes: Dict[str, dict] = {node["id"]: node for node in strategy.get("nodes", [])}
+        self.connections: List[dict] = list(strategy.get("connections", []))
+        self.keep_display_indicators = bool(strategy.get("keep_display_indicators"))
+        self.version = 0
+        self.lock = threading.Lock()
+        self._rebuild()
+
+    def strategy(self) -> dict:
+        return {"name": self.name, "nodes": list(self.nodes.values()), "connections": self.connections,
+                "keep_display_indicators": self.keep_display_indicators}
+
+    def lines(self) -> List[str]:
+        code = list(self.header)
+        for block in self.blocks:
+            code.extend(block)
+        code.extend(self.footer)
+        return code
+
+    def code(self) -> str:
+        return "\n".join(self.lines())
+
+    # --- Emission ---
+
+    def _rebuild(self):
+        self.ir = lower_strategy(self.strategy())
+        count = len(self.ir.nodes)
+        self.vars = [node.var for node in self.ir.nodes]
+        self.keys: List[Optional[str]] = [None] * count
+        self.blocks: List[List[str]] = [[] for _ in range(count)]
+        # CSE key -> sorted slots with that key; the first one with a variable owns it
+        self.owners: Dict[str, List[int]] = {}
+        # Whether each slot's own value lives in a variable rather than being fused into its consumer
+        self.shared: List[bool] = [True] * count
+        self.consumers: List[List[int]] = self.ir.consumers()
+        # Buy actions using a stop-loss / take-profit, so the flags are O(1) to maintain
+        self.risk = {node_id: risk_flags([node]) for node_id, node in self.nodes.items()}
+        self.sl_count = sum(sl for sl, _ in self.risk.values())
+        self.tp_count = sum(tp for _, tp in self.risk.values())
+        self.header = pine_header(self.ir)
+        self.footer = pine_footer(self.ir.has_sl, self.ir.has_tp)
+        self._propagate(range(count))
+
+    def _source_var(self, node, port):
+        slot = node.inputs.get(port)
+        return self.vars[slot] if slot is not None else None
+
+    def _emit(self, slot: int):
+        node = self.ir.nodes[slot]
+        consumers = [self.ir.nodes[s] for s in self.consumers[slot]]
+        key, lines, value = pine_slot(node, self._source_var, self.ir.has_sl, self.ir.has_tp, consumers)
+        self.shared[slot] = value == node.var
+        old_key = self.keys[slot]
+        if key != old_key:
+            if old_key is not None:
+                self.owners[old_key].remove(slot)
+                if not self.owners[old_key]:
+                    del self.owners[old_key]
+            if key is not None:
+                bisect.insort(self.owners.setdefault(key, []), slot)
+            self.keys[slot] = key
+        owner = slot
+        if key is not None:
+            owner = next((s for s in self.owners[key] if s < slot and self.shared[s]), slot)
+        if owner != slot:
+            self.vars[slot] = self.vars[owner]
+            lines = pine_alias(node, self.vars[owner])
+        else:
+            self.vars[slot] = value
+        self.blocks[slot] = lines
+
+    def _propagate(self, seeds) -> Dict[int, List[str]]:
+        """Re-emit seeds and everything their changes reach -> {slot: previous lines}"""
+        heap = list(dict.fromkeys(seeds))
+        heapq.heapify(heap)
+        queued = set(heap)
+        changed = {}
+
+        def enqueue(slots):
+            for s in slots:
+                if s not in queued:
+                    queued.add(s)
+                    heapq.heappush(heap, s)
+
+        while heap:
+            slot = heapq.heappop(heap)
+            old_var, old_key, old_block, old_shared = self.vars[slot], self.keys[slot], self.blocks[slot], self.shared[slot]
+            self._emit(slot)
+            if self.blocks[slot] != old_block:
+                changed[slot] = old_block
+            var, key = self.vars[slot], self.keys[slot]
+            if var != old_var:
+                enqueue(self.consumers[slot])
+            if key != old_key or var != old_var or self.shared[slot] != old_shared:
+                # Later nodes sharing either key may gain, lose or switch their alias
+                for k in {old_key, key} - {None}:
+                    same = self.owners.get(k, [])
+                    enqueue(same[bisect.bisect_right(same, slot):])
+        return changed
+
+    def _patch(self, changed: Dict[int, List[str]]) -> List[Dict[str, Any]]:
+        patch = []
+        position = len(self.header)
+        previous = 0
+        for slot in sorted(changed):
+            position += sum(map(len, self.blocks[previous:slot]))
+            patch.append({"start": position, "delete": len(changed[slot]), "lines": self.blocks[slot]})
+            position += len(self.blocks[slot])
+            previous = slot + 1
+        return patch
+
+    # --- Deltas ---
+
+    def apply(self, deltas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Apply a batch of deltas and return the line patch from the previous output"""
+        if not all(delta.get("op") in NODE_DELTAS for delta in deltas):
+            old = self.lines()
+            nodes, connections = dict(self.nodes), list(self.connections)
+            try:
+                for delta in deltas:
+                    self._apply_raw(delta)
+            except DeltaError:
+                self.nodes, self.connections = nodes, connections
+                raise
+            self._rebuild()
+            self.version += 1
+            return diff_lines(old, self.lines())
+
+        # Check every target up front so a bad delta leaves the session untouched
+        kinds = {}
+        for delta in deltas:
+            node = self._node(delta.get("node_id") if delta["op"] == "set_parameters" else (delta.get("node") or {}).get("id"))
+            kinds.setdefault(node["id"], node_kind(node))
+        node_ids = [self._apply_raw(delta) for delta in deltas]
+        # A node changing kind (even a pruned one, which may come back to life) reshapes the IR
+        if any(node_kind(self.nodes[node_id]) != kind for node_id, kind in kinds.items()):
+            old = self.lines()
+            self._rebuild()
+            self.version += 1
+            return diff_lines(old, self.lines())
+
+        seeds = set()
+        for node_id in node_ids:
+            raw = self.nodes[node_id]
+            sl, tp = self.risk[node_id]
+            self.risk[node_id] = risk_flags([raw])
+            self.sl_count += self.risk[node_id][0] - sl
+            self.tp_count += self.risk[node_id][1] - tp
+            slot = self.ir.slots.get(node_id)
+            # Nodes on a cycle or pruned are not emitted; only their risk flags count
+            if slot is not None:
+                refresh_node(self.ir.nodes[slot], raw)
+                seeds.add(slot)
+
+        has_sl, has_tp = self.sl_count > 0, self.tp_count > 0
+        self.version += 1
+        if (has_sl, has_tp) != (self.ir.has_sl, self.ir.has_tp):
+            # The SL/TP state variables appear or disappear: header, footer and every action change
+            old = self.lines()
+            self.ir.has_sl, self.ir.has_tp = has_sl, has_tp
+            self.header = pine_header(self.ir)
+            self.footer = pine_footer(has_sl, has_tp)
+            seeds.update(node.slot for node in self.ir.nodes if node.kind == KIND_ACTION)
+            self._propagate(seeds)
+            return diff_lines(old, self.lines())
+        return self._patch(self._propagate(seeds))
+
+    def preview(self, deltas: List[Dict[str, Any]]) -> dict:
+        """The strategy a batch of deltas would produce, leaving the session as it is
+
+        Raises DeltaError like apply() does, so callers can validate the
+        resulting graph before committing to it.
+        """
+        saved = self.nodes, self.connections
+        self.nodes, self.connections = dict(self.nodes), list(self.connections)
+        try:
+            for delta in deltas:
+                self._apply_raw(delta)
+            return self.strategy()
+        finally:
+            self.nodes, self.connections = saved
+
+    def _apply_raw(self, delta: Dict[str, Any]) -> Optional[str]:
+        """Update the stored strategy dict; returns the node id for node-local deltas"""
+        op = delta.get("op")
+        if op == "set_parameters":
+            node = self._node(delta.get("node_id"))
+            self.nodes[node["id"]] = {**node, "parameters": {**node.get("parameters", {}), **(delta.get("parameters") or {})}}
+            return node["id"]
+        if op == "update_node":
+            node = delta.get("node") or {}
+            previous = self._node(node.get("id"))
+            self.nodes[previous["id"]] = {**previous, **node}
+            return previous["id"]
+        if op == "add_node":
+            node = delta.get("node") or {}
+            if not node.get("id") or node["id"] in self.nodes:
+                raise DeltaError(f"add_node needs a new node id, got {node.get('id')!r}")
+            self.nodes[node["id"]] = node
+        elif op == "remove_node":
+            node_id = self._node(delta.get("node_id"))["id"]
+            del self.nodes[node_id]
+            self.connections = [c for c in self.connections if node_id not in (c["source"], c["target"])]
+        elif op == "add_edge":
+            connection = delta.get("connection") or {}
+            for end in ("source", "target"):
+                self._node(connection.get(end))
+            self.connections.append(connection)
+        elif op == "remove_edge":
+            connection = delta.get("connection") or {}
+            handle = connection.get("targetHandle")
+            kept = [c for c in self.connections
+                    if not (c["source"] == connection.get("source") and c["target"] == connection.get("target")
+                            and (handle is None or c.get("targetHandle") == handle))]
+            if len(kept) == len(self.connections):
+                raise DeltaError("remove_edge matched no connection")
+            self.connections = kept
+        else:
+            raise DeltaError(f"Unknown delta op: {op}")
+        return None
+
+    def _node(self, node_id: Optional[str]) -> dict:
+        node = self.nodes.get(node_id)
+        if node is None:
+            raise DeltaError(f"Unknown node: {node_id}")
+        return node
+
+
+class CompileSessions:
+    """Bounded set of live sessions; the least recently used one is dropped first"""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._sessions: "OrderedDict[str, CompileSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, strategy: dict) -> CompileSession:
+        session = CompileSession(strategy)
+        with self._lock:
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.maxsize:
+                self._sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id: str) -> Optional[CompileSession]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
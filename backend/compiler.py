@@ -0,0 +1,445 @@
+"""
+Code generators turning a strategy graph into platform source code
+"""
+import operator as op
+import re
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
+
+from ir import KIND_ACTION, IRNode, StrategyIR, comparison_key, lower_strategy
+from metrics import stage
+from mql5 import emit_mql
+from ninjascript import emit_csharp
+from nodes import KIND_LOGIC
+
+def pine_header(ir: StrategyIR) -> List[str]:
+    """Lines before the node calculations"""
+    code = []
+    code.append(f"// Generated by Trading Strategy Builder")
+    code.append(f"// Strategy: {ir.name}")
+    if ir.pruned:
+        shown = ", ".join(ir.pruned[:10]) + (f" and {len(ir.pruned) - 10} more" if len(ir.pruned) > 10 else "")
+        code.append(f"// Pruned {len(ir.pruned)} node(s) that feed no action: {shown}")
+    code.append("")
+    code.append("//@version=5")
+    code.append(f"strategy('{ir.name}', overlay=true)")
+
+    # --- Strategy State Variables ---
+    code.append("// --- Strategy State Variables ---")
+    code.append("var bool positionOpen = false")
+    code.append("var float entryPrice = na")
+    if ir.has_sl: code.append("var float stopLossPrice = na")
+    if ir.has_tp: code.append("var float takeProfitPrice = na")
+    code.append("")
+
+    # Generate code in topological order
+    code.append("// --- Indicator & Logic Calculations ---")
+    code.append("can_buy = not positionOpen")
+    code.append("can_sell = positionOpen")
+    return code
+
+
+def pine_node(node: IRNode, get_source_var: Callable[[IRNode, str], Optional[str]],
+              has_sl: bool, has_tp: bool) -> Tuple[Optional[str], List[str]]:
+    """Pine lines computing one IR node -> (CSE key, lines)
+
+    The key identifies the computed value (None for nodes that are never
+    shared); callers alias a node to the first variable with the same key
+    instead of emitting its lines. The node's registry handler does the
+    emitting, with each port resolved to its variable or fallback.
+    """
+    if node.handler is None:
+        return None, []
+    return node.handler.pine(node, pine_sources(node, get_source_var), has_sl, has_tp)
+
+
+def pine_sources(node: IRNode, get_source_var: Callable[[IRNode, str], Optional[str]]) -> Dict[str, Optional[str]]:
+    """What feeds each of the node's ports: a variable, an inlined expression or the port's fallback"""
+    return {port: get_source_var(node, port) or fallback for port, (_, fallback) in node.handler.ports.items()}
+
+
+# A literal or a single name: substituting it costs nothing, so it never gets a variable
+_PLAIN = re.compile(r"-?[\w.]+")
+
+# Pine operator precedence, loosest first among those generated here
+PRECEDENCE = {"or": 2, "and": 3, "==": 4, "!=": 4, "<": 5, ">": 5, "<=": 5, ">=": 5}
+_OPERATOR = re.compile(r" (or|and|==|!=|<=|>=|<|>) ")
+
+
+def pine_operand(expression: str, binding: int) -> str:
+    """expression, parenthesized unless every operator outside its parentheses has at least this precedence
+
+    Logic and action emitters may be handed fused expressions as sources and
+    pass them through here before combining them with an operator.
+    """
+    outside, depth = [], 0
+    for char in str(expression):
+        depth += char == "("
+        if depth == 0:
+            outside.append(char)
+        depth -= char == ")"
+    operators = _OPERATOR.findall("".join(outside))
+    return f"({expression})" if any(PRECEDENCE[o] < binding for o in operators) else str(expression)
+
+
+def pine_slot(node: IRNode, get_source_var: Callable[[IRNode, str], Optional[str]],
+              has_sl: bool, has_tp: bool, consumers: List[IRNode]) -> Tuple[Optional[str], List[str], str]:
+    """pine_node with condition fusion -> (CSE key, lines, what consumers read for the node's value)
+
+    Nodes with a Pine expression emitter are not given a variable when the
+    expression folds to a literal or a plain name, or when exactly one logic
+    or action node reads them: the consumer gets the expression itself, so a
+    chain of single-use conditions becomes one expression and one series.
+    The consumer's emitter adds whatever parentheses it needs.
+    ta.* calls are only fused into actions, where they come first: they
+    must run on every bar, and Pine may skip the right operand of and/or.
+    Everything else reads node.var.
+    """
+    expression_emitter = node.handler.emitter("pinescript_expression") if node.handler is not None else None
+    if expression_emitter is None:
+        key, lines = pine_node(node, get_source_var, has_sl, has_tp)
+        return key, lines, node.var
+    key, expression = expression_emitter(node, pine_sources(node, get_source_var))
+    if _PLAIN.fullmatch(expression):
+        return None, [], expression
+    if len(consumers) == 1 and (consumers[0].kind == KIND_ACTION or
+                                (consumers[0].kind == KIND_LOGIC and not expression.startswith("ta."))):
+        return key, [], expression
+    return key, [f"{node.var} = {expression}"], node.var
+
+
+# --- Pine emitters, registered per (kind, name) in nodes.py ---
+
+def pine_input(node: IRNode, sources: Dict[str, Optional[str]], has_sl: bool, has_tp: bool):
+    # Input nodes (Strategy Start) read the chart's close directly
+    return None, [f"// {node.name} Node skipped"]
+
+
+def pine_unknown(node: IRNode, sources: Dict[str, Optional[str]], has_sl: bool, has_tp: bool):
+    return "close", [f"{node.var} = close // Unknown indicator {node.name}"]
+
+
+def pine_rsi(node: IRNode, sources: Dict[str, Optional[str]], has_sl: bool, has_tp: bool):
+    var_name, source_var, period = node.var, sources["source"], node.params["period"]
+    return f"ta.rsi({source_var}, {period})", [
+        f"{var_name} = ta.rsi({source_var}, {period})",
+        f"plot({var_name}, title='RSI {period}', color=color.purple, display=display.pane)",
+        f"plot(70, title='RSI Upper', color=color.new(color.red, 50), display=display.pane)",
+        f"plot(30, title='RSI Lower', color=color.new(color.green, 50), display=display.pane)",
+    ]
+
+
+def pine_sma(node: IRNode, sources: Dict[str, Optional[str]], has_sl: bool, has_tp: bool):
+    var_name, source_var, period = node.var, sources["source"], node.params["period"]
+    return f"ta.sma({source_var}, {period})", [
+        f"{var_name} = ta.sma({source_var}, {period})",
+        f"plot({var_name}, title='SMA {period}', color=color.blue, linewidth=1)",
+    ]
+
+
+def pine_ema(node: IRNode, sources: Dict[str, Optional[str]], has_sl: bool, has_tp: bool):
+    var_name, source_var, period = node.var, sources["source"], node.params["period"]
+    return f"ta.ema({source_var}, {period})", [
+        f"{var_name} = ta.ema({source_var}, {period})",
+        f"plot({var_name}, title='EMA {period}', color=color.orange, linewidth=1)",
+    ]
+
+
+def pine_macd(node: IRNode, sources: Dict[str, Optional[str]], has_sl: bool, has_tp: bool):
+    var_name, source_var = node.var, sources["source"]
+    fast, slow, signal = node.params["fast"], node.params["slow"], node.params["signal"]
+    return f"ta.macd({source_var}, {fast}, {slow}, {signal})", [
+        f"[{var_name}_line, {var_name}_sig, {var_name}_hist] = ta.macd({source_var}, {fast}, {slow}, {signal})",
+        f"plot({var_name}_line, title='MACD Line', color=color.blue, display=display.pane)",
+        f"plot({var_name}_sig, title='Signal Line', color=color.orange, display=display.pane)",
+        f"plot({var_name}_hist, title='MACD Histogram', color=color.new(color.gray, 50), style=plot.style_columns, display=display.pane)",
+        f"{var_name} = {var_name}_line",
+    ]
+
+
+def pine_bollinger(node: IRNode, sources: Dict[str, Optional[str]], has_sl: bool, has_tp: bool):
+    var_name, source_var = node.var, sources["source"]
+    period, std_dev = node.params["period"], node.params["std_dev"]
+    return f"ta.bb({source_var}, {period}, {std_dev})", [
+        f"[{var_name}_upper, {var_name}_basis, {var_name}_lower] = ta.bb({source_var}, {period}, {std_dev})",
+        f"plot({var_name}_upper, title='BB Upper', color=color.gray)",
+        f"plot({var_name}_lower, title='BB Lower', color=color.gray)",
+        f"plot({var_name}_basis, title='BB Basis', color=color.gray)",
+        f"{var_name} = {var_name}_basis",
+    ]
+
+
+def pine_stochastic(node: IRNode, sources: Dict[str, Optional[str]], has_sl: bool, has_tp: bool):
+    var_name, source_var, k, d = node.var, sources["source"], node.params["k"], node.params["d"]
+    return f"ta.stoch({source_var}, high, low, {k}), {d}", [
+        f"{var_name}_k = ta.stoch({source_var}, high, low, {k})",
+        f"{var_name}_d = ta.sma({var_name}_k, {d})",
+        f"plot({var_name}_k, title='Stoch %K', color=color.blue, display=display.pane)",
+        f"plot({var_name}_d, title='Stoch %D', color=color.orange, display=display.pane)",
+        f"plot(80, title='Stoch Upper', color=color.new(color.red, 50), display=display.pane)",
+        f"plot(20, title='Stoch Lower', color=color.new(color.green, 50), display=display.pane)",
+        f"{var_name} = {var_name}_k",
+    ]
+
+
+def pine_atr(node: IRNode, sources: Dict[str, Optional[str]], has_sl: bool, has_tp: bool):
+    # True range always comes from the chart's bars, whatever feeds the node
+    var_name, period = node.var, node.params["period"]
+    return f"ta.atr({period})", [
+        f"{var_name} = ta.atr({period})",
+        f"plot({var_name}, title='ATR {period}', color=color.red, display=display.pane)",
+    ]
+
+
+def pine_adx(node: IRNode, sources: Dict[str, Optional[str]], has_sl: bool, has_tp: bool):
+    var_name, period = node.var, node.params["period"]
+    return f"ta.dmi({period}, {period})", [
+        f"[{var_name}_plus, {var_name}_minus, {var_name}_adx] = ta.dmi({period}, {period})",
+        f"plot({var_name}_adx, title='ADX', color=color.purple, display=display.pane)",
+        f"plot({var_name}_plus, title='+DI', color=color.green, display=display.pane)",
+        f"plot({var_name}_minus, title='-DI', color=color.red, display=display.pane)",
+        f"{var_name} = {var_name}_adx",
+    ]
+
+
+COMPARISONS = {"<": op.lt, ">": op.gt, "<=": op.le, ">=": op.ge, "==": op.eq, "!=": op.ne}
+
+
+def _constant(operand) -> Optional[float]:
+    """Value of a literal operand (true/false or a number); None for series"""
+    if operand in ("true", "false"):
+        return float(operand == "true")
+    try:
+        return float(operand)
+    except (TypeError, ValueError):
+        return None
+
+
+def pine_condition(node: IRNode, sources: Dict[str, Optional[str]]) -> Tuple[str, str]:
+    """A logic node as one Pine expression -> (CSE key, expression), with constant operands folded
+
+    and/or with a literal operand reduce to the other operand or to a
+    literal (numbers count as true when nonzero, as in the backtest), two
+    literals compare at compile time and constants never cross.
+    """
+    operator = node.param("operator", "<")
+    # Connected variable or static threshold
+    operand_a = sources["a"]
+    operand_b = sources["b"] or node.params["value"]
+    a, b = _constant(operand_a), _constant(operand_b)
+    if operator in ("and", "or") and (a is not None or b is not None):
+        constant, other = (a, operand_b) if a is not None else (b, operand_a)
+        if (constant != 0) == (operator == "or"):
+            return f"{constant != 0}".lower(), f"{constant != 0}".lower()
+        if _constant(other) is not None:
+            other = f"{_constant(other) != 0}".lower()
+        return str(other), str(other)
+    if a is not None and b is not None:
+        if operator in ("crossunder", "crossover"):
+            return "false", "false"
+        if operator in COMPARISONS:
+            result = f"{COMPARISONS[operator](a, b)}".lower()
+            return result, result
+    if operator in ["crossunder", "crossover"]:
+        expression = f"ta.{operator}({operand_a}, {operand_b})"
+        return expression, expression
+    # and/or chain without parentheses; comparisons need their operands to bind tighter
+    binding = PRECEDENCE.get(operator, 0) + (operator not in ("and", "or"))
+    operand_a, operand_b = pine_operand(operand_a, binding), pine_operand(operand_b, binding)
+    return comparison_key(operator, operand_a, operand_b), f"{operand_a} {operator} {operand_b}"
+
+
+def pine_logic(node: IRNode, sources: Dict[str, Optional[str]], has_sl: bool, has_tp: bool):
+    key, expression = pine_condition(node, sources)
+    return key, [f"{node.var} = {expression}"]
+
+
+def pine_action(node: IRNode, sources: Dict[str, Optional[str]], has_sl: bool, has_tp: bool):
+    condition = sources["condition"]
+    if not condition:
+        return None, [f"// action_{node.id} skipped: no condition connected"]
+    if condition == "false":
+        return None, [f"// action_{node.id} skipped: condition is always false"]
+    # A condition folded to true leaves only the position gate
+    condition = "" if condition == "true" else f"{pine_operand(condition, PRECEDENCE['and'])} and "
+
+    code = []
+    if node.action == "buy":
+        sl_val = node.stop_loss
+        tp_val = node.take_profit
+        trigger_var = f"buy_trigger_{node.suffix}"
+        code.append(f"{trigger_var} = {condition}can_buy")
+        code.append(f"if {trigger_var}")
+        code.append(f"    strategy.entry('Long', strategy.long)")
+        code.append(f"    positionOpen := true")
+        code.append(f"    entryPrice := close")
+        if has_sl: code.append(f"    stopLossPrice := {f'entryPrice * (1 - {sl_val} / 100)' if sl_val > 0 else 'na'}")
+        if has_tp: code.append(f"    takeProfitPrice := {f'entryPrice * (1 + {tp_val} / 100)' if tp_val > 0 else 'na'}")
+        code.append(f"plotshape({trigger_var}, title='Buy Signal', style=shape.labelup, location=location.belowbar, color=color.new(color.green, 0), size=size.small, text='BUY', textcolor=color.white)")
+    elif node.action == "sell":
+        trigger_var = f"sell_trigger_{node.suffix}"
+        code.append(f"{trigger_var} = {condition}can_sell")
+        code.append(f"if {trigger_var}")
+        code.append(f"    strategy.close('Long', comment='Sell Signal')")
+        code.append(f"    positionOpen := false")
+        code.append(f"    entryPrice := na")
+        if has_sl: code.append(f"    stopLossPrice := na")
+        if has_tp: code.append(f"    takeProfitPrice := na")
+        code.append(f"plotshape({trigger_var}, title='Sell Signal', style=shape.labeldown, location=location.abovebar, color=color.new(color.red, 0), size=size.small, text='SELL', textcolor=color.white)")
+    return None, code
+
+
+def pine_footer(has_sl: bool, has_tp: bool) -> List[str]:
+    """Exit logic and entry/stop/target plots after the node calculations"""
+    code = []
+    code.append("")
+    if has_sl or has_tp:
+        code.append("")
+        code.append("// --- Exit Logic (Stop Loss & Take Profit) ---")
+        # Only the exits in use get a series
+        if has_sl: code.append("stopHit = positionOpen and not na(stopLossPrice) and close < stopLossPrice")
+        if has_tp: code.append("targetHit = positionOpen and not na(takeProfitPrice) and close > takeProfitPrice")
+        if has_sl and has_tp:
+            code.append("exit_trigger = stopHit or targetHit")
+            comment = "stopHit ? 'Stop Loss Hit' : 'Take Profit Hit'"
+        else:
+            code.append(f"exit_trigger = {'stopHit' if has_sl else 'targetHit'}")
+            comment = "'Stop Loss Hit'" if has_sl else "'Take Profit Hit'"
+        code.append("if exit_trigger")
+        code.append(f"    strategy.close('Long', comment = {comment})")
+        code.append("    positionOpen := false")
+        code.append("    entryPrice := na")
+        if has_sl: code.append("    stopLossPrice := na")
+        if has_tp: code.append("    takeProfitPrice := na")
+        code.append("")
+        if has_sl:
+            code.append("// Stop-loss exit label")
+            code.append("plotshape(stopHit, title='Stop Exit', style=shape.labeldown, location=location.abovebar, color=color.red, size=size.small, text='STOP', textcolor=color.white)")
+        if has_tp:
+            code.append("// Take-profit exit label")
+            code.append("plotshape(targetHit, title='TP Exit', style=shape.labeldown, location=location.abovebar, color=color.green, size=size.small, text='TP', textcolor=color.white)")
+        code.append("")
+
+    code.append("// --- Plotting Entry/Stop/TP ---")
+    code.append("plot(entryPrice, title='Entry Price', color=color.new(color.green, 0), style=plot.style_linebr)")
+    if has_sl: code.append("plot(stopLossPrice, title='Stop Loss Price', color=color.new(color.red, 0), style=plot.style_linebr)")
+    if has_tp: code.append("plot(takeProfitPrice, title='Take Profit Price', color=color.new(color.lime, 0), style=plot.style_linebr)")
+
+    return code
+
+
+def pine_alias(node: IRNode, existing: str) -> List[str]:
+    """Stand-in for a node whose value is already held by another variable"""
+    return [f"// {node.var} reuses {existing}"]
+
+
+def iter_pinescript(ir: StrategyIR) -> Iterator[str]:
+    """Pine Script lines in order, produced as they are generated"""
+    yield from pine_header(ir)
+
+    # What each slot's consumers read: node.var, the variable it is aliased to
+    # or its fused expression
+    node_vars = [node.var for node in ir.nodes]
+    consumers = [[ir.nodes[slot] for slot in readers] for readers in ir.consumers()]
+
+    def get_source_var(node, port):
+        slot = node.inputs.get(port)
+        return node_vars[slot] if slot is not None else None
+
+    # Common subexpression elimination: structural key -> variable already holding it.
+    # Sources are resolved through node_vars, so aliasing a node also merges
+    # identical computations further downstream. Fused nodes reuse a variable
+    # when one exists but never offer their expression for reuse.
+    computed = {}
+    for node in ir.nodes:
+        key, lines, value = pine_slot(node, get_source_var, ir.has_sl, ir.has_tp, consumers[node.slot])
+        if key is not None:
+            existing = computed.get(key)
+            if existing is not None:
+                node_vars[node.slot] = existing
+                yield from pine_alias(node, existing)
+                continue
+            if value == node.var:
+                computed[key] = value
+        node_vars[node.slot] = value
+        yield from lines
+
+    yield from pine_footer(ir.has_sl, ir.has_tp)
+
+
+def emit_pinescript(ir: StrategyIR) -> str:
+    """Emit TradingView Pine Script with modular node logic"""
+    return "\n".join(iter_pinescript(ir))
+
+
+EMITTERS = {
+    "pinescript": emit_pinescript,
+    "csharp": emit_csharp,
+    "mql": emit_mql,
+}
+
+
+def compile_to_pinescript(strategy: dict) -> str:
+    """Compile to TradingView Pine Script"""
+    with stage("lower"):
+        ir = lower_strategy(strategy)
+    with stage("emit"):
+        return emit_pinescript(ir)
+
+def compile_to_csharp(strategy: dict) -> str:
+    """Compile to NinjaTrader C#"""
+    with stage("lower"):
+        ir = lower_strategy(strategy)
+    with stage("emit"):
+        return emit_csharp(ir)
+
+def compile_to_mql(strategy: dict) -> str:
+    """Compile to MetaTrader MQL"""
+    with stage("lower"):
+        ir = lower_strategy(strategy)
+    with stage("emit"):
+        return emit_mql(ir)
+
+COMPILERS = {
+    "pinescript": compile_to_pinescript,
+    "csharp": compile_to_csharp,
+    "mql": compile_to_mql,
+}
+
+
+def _chunks(lines: Iterator[str], size: int) -> Iterator[str]:
+    """"\n".join(lines) cut into pieces of roughly size characters"""
+    pending: List[str] = []
+    length = 0
+    separator = ""
+    for line in lines:
+        pending.append(separator)
+        pending.append(line)
+        separator = "\n"
+        length += len(line) + 1
+        if length >= size:
+            yield "".join(pending)
+            pending = []
+            length = 0
+    if pending:
+        yield "".join(pending)
+
+
+def stream_code(strategy: dict, target: str, chunk_size: int = 1 << 16) -> Iterator[str]:
+    """Lower now and emit lazily: the same code as COMPILERS[target], in chunks
+
+    Lowering errors raise here, before anything is sent; the returned
+    iterator only generates Pine lines as the consumer asks for them, so the
+    whole script is never held at once.
+    """
+    with stage("lower"):
+        ir = lower_strategy(strategy)
+    lines = iter_pinescript(ir) if target == "pinescript" else iter([EMITTERS[target](ir)])
+    return _chunks(lines, chunk_size)
+
+
+def compile_targets(strategy: dict, targets: List[str]) -> Dict[str, str]:
+    """Lower the strategy once and emit it for every target"""
+    with stage("lower"):
+        ir = lower_strategy(strategy)
+    with stage("emit"):
+        return {target: EMITTERS[target](ir) for target in targets}
@@ -0,0 +1,189 @@
+"""
+Response compression negotiated from Accept-Encoding: brotli when installed, else gzip
+"""
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional; gzip alone covers every browser
+    brotli = None
+
+# Media types that are already compressed, or must reach the client unbuffered
+SKIP_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip", "text/event-stream")
+
+
+def supported_encodings() -> List[str]:
+    """Encodings this process can produce, most preferred first"""
+    return (["br"] if brotli is not None else []) + ["gzip"]
+
+
+def negotiate(accept_encoding: str, available: Optional[List[str]] = None) -> Optional[str]:
+    """Best available encoding the client accepts (q > 0), or None for identity"""
+    available = supported_encodings() if available is None else available
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        # Ties go to the earlier (preferred) encoding
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+def encoded_etag(etag: bytes, encoding: str) -> bytes:
+    """Strong validator of the encoded representation ("abc" -> "abc-gzip"); weak ones are left alone"""
+    if etag.startswith(b'"') and etag.endswith(b'"') and len(etag) > 1:
+        return etag[:-1] + b"-" + encoding.encode("latin-1") + b'"'
+    return etag
+
+
+def _decode_etags(if_none_match: bytes, encoding: str) -> Tuple[bytes, Set[bytes]]:
+    """If-None-Match with this encoding's suffix removed -> (header, the plain tags that had it)
+
+    The application only knows its plain tags, so a client revalidating the
+    gzip representation is matched against the tag it was derived from.
+    """
+    suffix = b"-" + encoding.encode("latin-1") + b'"'
+    tags, decoded = [], set()
+    for tag in if_none_match.split(b","):
+        tag = tag.strip()
+        opaque = tag[2:] if tag.startswith(b"W/") else tag
+        if opaque.endswith(suffix) and len(opaque) > len(suffix):
+            opaque = opaque[:-len(suffix)] + b'"'
+            decoded.add(opaque)
+            tag = (b"W/" if tag.startswith(b"W/") else b"") + opaque
+        tags.append(tag)
+    return b", ".join(tags), decoded
+
+
+class CompressionMiddleware:
+    """Compresses responses of at least minimum_size bytes with the negotiated encoding
+
+    Streaming bodies are compressed chunk by chunk and flushed after each, so
+    a client decodes every chunk as soon as it arrives instead of waiting for
+    the compressor's window to fill. Responses that already carry a
+    Content-Encoding, or whose type is in SKIP_TYPES, pass through.
+
+    A strong ETag on a compressed response gets the encoding as a suffix, so
+    the gzip and identity representations never share a strong validator
+    (RFC 9110 section 8.8.3). If-None-Match tags carrying the negotiated
+    encoding's suffix are handed to the application without it, and a 304
+    for one of them answers with the suffixed tag again.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = negotiate(accept)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        decoded: Set[bytes] = set()
+        request_headers = []
+        for name, value in scope.get("headers", []):
+            if name == b"if-none-match":
+                value, decoded = _decode_etags(value, encoding)
+            request_headers.append((name, value))
+        scope = {**scope, "headers": request_headers}
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", []))
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                passthrough = (b"content-encoding" in headers or message["status"] in (204, 206, 304)
+                               or content_type.startswith(SKIP_TYPES))
+                if passthrough:
+                    etag = headers.get(b"etag")
+                    if message["status"] == 304 and etag in decoded:
+                        message = {**message, "headers": [
+                            (name, encoded_etag(value, encoding) if name == b"etag" else value)
+                            for name, value in message.get("headers", [])]}
+                    await send(message)
+                else:
+                    # Held until the first body shows whether compressing is worth it
+                    start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                headers: List[Tuple[bytes, bytes]] = [
+                    (name, value) for name, value in start.get("headers", []) if name != b"content-length"
+                ]
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = _Brotli(self.brotli_quality) if encoding == "br" else _Gzip(self.gzip_level)
+                body = compressor.chunk(body) if more_body else compressor.finish(body)
+                headers = [(name, encoded_etag(value, encoding) if name == b"etag" else value)
+                           for name, value in headers]
+                headers.append((b"content-encoding", encoding.encode("latin-1")))
+                headers.append((b"vary", b"Accept-Encoding"))
+                if not more_body:
+                    headers.append((b"content-length", str(len(body)).encode("latin-1")))
+                await send({**start, "headers": headers})
+                start = None
+            else:
+                body = compressor.chunk(body) if more_body else compressor.finish(body)
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
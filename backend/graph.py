@@ -0,0 +1,69 @@
+"""
+Graph helpers shared by the compilers and the backtest engine
+"""
+from collections import deque
+from typing import List, Dict, Optional
+
+
+def normalize_type(node: dict) -> str:
+    """Lowercase node type with the React Flow 'node' suffix stripped"""
+    raw_type = node.get("type", "").lower()
+    if raw_type.endswith("node"):
+        return raw_type[:-4]
+    return raw_type
+
+
+def is_input_node(node: dict) -> bool:
+    """Input nodes (Strategy Start) only route price data"""
+    return normalize_type(node) == "input" or node.get("name") == "Strategy Start"
+
+
+def topological_sort(nodes: List[dict], connections: List[dict]) -> List[dict]:
+    """Order nodes with Kahn's algorithm (nodes on a cycle are left out)"""
+    node_map = {node["id"]: node for node in nodes}
+    adj = {node["id"]: [] for node in nodes}
+    in_degree = {node["id"]: 0 for node in nodes}
+
+    for conn in connections:
+        source_id = conn["source"]
+        target_id = conn["target"]
+        if source_id in adj and target_id in adj:
+            adj[source_id].append(target_id)
+            in_degree[target_id] += 1
+
+    queue = deque(n_id for n_id, degree in in_degree.items() if degree == 0)
+    sorted_nodes = []
+    while queue:
+        u = queue.popleft()
+        sorted_nodes.append(node_map[u])
+        for v in adj[u]:
+            in_degree[v] -= 1
+            if in_degree[v] == 0:
+                queue.append(v)
+    return sorted_nodes
+
+
+def build_input_map(connections: List[dict]) -> Dict[str, Dict[str, str]]:
+    """target_node_id -> { handle_id: source_node_id }"""
+    input_map = {}
+    for conn in connections:
+        target = conn["target"]
+        handle = conn.get("targetHandle") or 'default'
+        source = conn["source"]
+        if target not in input_map:
+            input_map[target] = {}
+        input_map[target][handle] = source
+    return input_map
+
+
+def resolve_input(input_map: Dict[str, Dict[str, str]], target_id: str, handle_id: str = 'default') -> Optional[str]:
+    """Source node id wired into a handle, with the legacy 'a'/'default' fallback"""
+    handles = input_map.get(target_id, {})
+    source_id = handles.get(handle_id)
+    if not source_id:
+        # Fallback for old 'a'/'default' mixup
+        if handle_id == 'a':
+            source_id = handles.get('default')
+        elif handle_id == 'default':
+            source_id = handles.get('a')
+    return source_id
@@ -0,0 +1,196 @@
+"""
+Content-addressed cache of node output series, shared across backtests
+"""
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Dict, Any, Iterator, Optional
+
+import numpy as np
+
+
+def data_key(arrays: Dict[str, np.ndarray], symbol: Optional[str] = None, interval: Optional[str] = None,
+             version: Optional[str] = None) -> str:
+    """Identity of the bars a backtest runs over
+
+    A stored series only ever grows, so symbol, interval, store version and
+    the bar range pin its content. Inline data is hashed.
+    """
+    if symbol is not None:
+        timestamps = arrays["timestamp"]
+        return f"{symbol}/{interval}/{version}/{int(timestamps[0])}-{int(timestamps[-1])}/{len(timestamps)}"
+    digest = hashlib.blake2b(digest_size=16)
+    for name in sorted(arrays):
+        column = np.ascontiguousarray(arrays[name])
+        digest.update(f"{name}:{column.dtype.str}:{len(column)}".encode("utf-8"))
+        digest.update(column.data)
+    return f"inline/{digest.hexdigest()}"
+
+
+class IndicatorCache:
+    """Byte-budgeted LRU of node outputs keyed by "<data key>|<node signature>"
+
+    node_signature already hashes the indicator name, its parameters and the
+    signatures of everything upstream, so the data key is all it needs to
+    be content-addressed. Entries evicted from memory go to spill_dir when
+    one is set, and come back from there on the next hit; spilled files are
+    bounded by spill_bytes and cleared at startup. Cached arrays are
+    read-only.
+    """
+
+    def __init__(self, max_bytes: int = 256 << 20, spill_dir: Optional[str] = None, spill_bytes: int = 4 << 30):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.spill_bytes = spill_bytes
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        # key -> file size, least recently used first
+        self._spilled: "OrderedDict[str, int]" = OrderedDict()
+        self._spilled_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            for name in os.listdir(spill_dir):
+                if name.endswith(".npy"):
+                    os.remove(os.path.join(spill_dir, name))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest() + ".npy")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            if key in self._spilled:
+                try:
+                    value = np.load(self._path(key))
+                except OSError:
+                    self._spilled_bytes -= self._spilled.pop(key)
+                else:
+                    self._spilled.move_to_end(key)
+                    self.spill_hits += 1
+                    value.flags.writeable = False
+                    self._insert(key, value)
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: np.ndarray):
+        # A read-only view: the caller's array stays as it was, but nothing can write through the cache
+        value = value.view()
+        value.flags.writeable = False
+        with self._lock:
+            self._insert(key, value)
+
+    def discard(self, key: str) -> bool:
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is not None:
+                self._bytes -= value.nbytes
+            size = self._spilled.pop(key, None)
+            if size is not None:
+                self._spilled_bytes -= size
+                self._remove_file(key)
+            return value is not None or size is not None
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries) + [key for key in self._spilled if key not in self._entries]
+
+    def scope(self, data: str) -> "CacheScope":
+        return CacheScope(self, data)
+
+    def _insert(self, key: str, value: np.ndarray):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+        self._entries[key] = value
+        self._bytes += value.nbytes
+        while self._bytes > self.max_bytes and self._entries:
+            old_key, old_value = self._entries.popitem(last=False)
+            self._bytes -= old_value.nbytes
+            self.evictions += 1
+            if self.spill_dir:
+                self._spill(old_key, old_value)
+
+    def _spill(self, key: str, value: np.ndarray):
+        if key in self._spilled:
+            # Promoted earlier and the file is still there
+            self._spilled.move_to_end(key)
+            return
+        path = self._path(key)
+        partial = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(partial, "wb") as f:
+                np.save(f, value)
+            os.replace(partial, path)
+        except OSError:
+            return
+        size = os.path.getsize(path)
+        self._spilled[key] = size
+        self._spilled_bytes += size
+        while self._spilled_bytes > self.spill_bytes and self._spilled:
+            old_key, old_size = self._spilled.popitem(last=False)
+            self._spilled_bytes -= old_size
+            self._remove_file(old_key)
+
+    def _remove_file(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "spilled_entries": len(self._spilled),
+                "spilled_bytes": self._spilled_bytes,
+                "hits": self.hits,
+                "spill_hits": self.spill_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class CacheScope(MutableMapping):
+    """The cache as evaluate_strategy sees it for one dataset: node signature -> output"""
+
+    def __init__(self, cache: IndicatorCache, data: str):
+        self.cache = cache
+        self.prefix = f"{data}|"
+
+    def get(self, signature: str, default=None):
+        value = self.cache.get(self.prefix + signature)
+        return default if value is None else value
+
+    def __getitem__(self, signature: str) -> np.ndarray:
+        value = self.cache.get(self.prefix + signature)
+        if value is None:
+            raise KeyError(signature)
+        return value
+
+    def __setitem__(self, signature: str, value: np.ndarray):
+        self.cache.put(self.prefix + signature, value)
+
+    def __delitem__(self, signature: str):
+        if not self.cache.discard(self.prefix + signature):
+            raise KeyError(signature)
+
+    def __iter__(self) -> Iterator[str]:
+        return (key[len(self.prefix):] for key in self.cache.keys() if key.startswith(self.prefix))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
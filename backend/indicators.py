@@ -0,0 +1,249 @@
+"""
+Vectorized indicator kernels with Pine Script ta.* semantics
+
+Every kernel takes float64 arrays and returns arrays of the same length,
+with NaN standing in for Pine's na during the warmup period.
+"""
+import math
+from typing import Tuple
+
+import numpy as np
+
+# Largest growth factor allowed inside one closed-form EWM block
+_BLOCK_RANGE = 1e100
+
+
+def _first_valid(src: np.ndarray) -> int:
+    """Index of the first non-NaN value (len(src) if there is none)"""
+    valid = ~np.isnan(src)
+    return int(np.argmax(valid)) if valid.any() else len(src)
+
+
+def _recursive_ewm(src: np.ndarray, alpha: float, start: int, seed: float) -> np.ndarray:
+    """y[start] = seed, y[t] = alpha * src[t] + (1 - alpha) * y[t - 1]
+
+    The recursion is solved in closed form one block at a time:
+    y[s + k] = (y[s - 1] + cumsum(alpha * src * w^-(j + 1))[k]) * w^(k + 1)
+    with w = 1 - alpha. Blocks are sized so w^-B stays well inside float range.
+    """
+    n = len(src)
+    out = np.full(n, np.nan)
+    if start >= n:
+        return out
+    out[start] = seed
+    w = 1.0 - alpha
+    if w <= 0.0:
+        out[start + 1:] = src[start + 1:]
+        return out
+    block = max(1, int(math.log(_BLOCK_RANGE) / -math.log(w))) if w < 1.0 else n
+    carry = seed
+    pos = start + 1
+    while pos < n:
+        end = min(pos + block, n)
+        growth = w ** -np.arange(1, end - pos + 1, dtype=np.float64)
+        acc = np.cumsum(alpha * src[pos:end] * growth)
+        out[pos:end] = (carry + acc) / growth
+        carry = out[end - 1]
+        pos = end
+    return out
+
+
+def sma(src: np.ndarray, length: int) -> np.ndarray:
+    """ta.sma: na until a full window of non-na values is available"""
+    src = np.asarray(src, dtype=np.float64)
+    n = len(src)
+    out = np.full(n, np.nan)
+    if length < 1 or n < length:
+        return out
+    nan_mask = np.isnan(src)
+    filled = np.where(nan_mask, 0.0, src)
+    csum = np.concatenate(([0.0], np.cumsum(filled)))
+    ncount = np.concatenate(([0], np.cumsum(nan_mask)))
+    window_sum = csum[length:] - csum[:-length]
+    window_nans = ncount[length:] - ncount[:-length]
+    out[length - 1:] = np.where(window_nans == 0, window_sum / length, np.nan)
+    return out
+
+
+def _seeded_ewm(src: np.ndarray, length: int, alpha: float) -> np.ndarray:
+    """Exponential average seeded with the SMA of the first full window (ta.ema/ta.rma)"""
+    src = np.asarray(src, dtype=np.float64)
+    n = len(src)
+    first = _first_valid(src)
+    start = first + length - 1
+    if length < 1 or start >= n:
+        return np.full(n, np.nan)
+    seed = float(np.mean(src[first:start + 1]))
+    return _recursive_ewm(src, alpha, start, seed)
+
+
+def ema(src: np.ndarray, length: int) -> np.ndarray:
+    """ta.ema: alpha = 2 / (length + 1)"""
+    return _seeded_ewm(src, length, 2.0 / (length + 1))
+
+
+def rma(src: np.ndarray, length: int) -> np.ndarray:
+    """ta.rma (Wilder smoothing): alpha = 1 / length"""
+    return _seeded_ewm(src, length, 1.0 / length)
+
+
+def rsi(src: np.ndarray, length: int) -> np.ndarray:
+    """ta.rsi built on Wilder-smoothed gains and losses"""
+    src = np.asarray(src, dtype=np.float64)
+    change = np.empty_like(src)
+    change[0] = np.nan
+    change[1:] = np.diff(src)
+    up = rma(np.maximum(change, 0.0), length)
+    down = rma(np.maximum(-change, 0.0), length)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100.0 - 100.0 / (1.0 + up / down)
+    out = np.where(up == 0.0, 0.0, out)
+    out = np.where(down == 0.0, 100.0, out)
+    out[np.isnan(up) | np.isnan(down)] = np.nan
+    return out
+
+
+def macd(src: np.ndarray, fast: int, slow: int, signal: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ta.macd -> (macd line, signal line, histogram)"""
+    line = ema(src, fast) - ema(src, slow)
+    sig = ema(line, signal)
+    return line, sig, line - sig
+
+
+def stdev(src: np.ndarray, length: int) -> np.ndarray:
+    """ta.stdev (population standard deviation over the window)"""
+    src = np.asarray(src, dtype=np.float64)
+    # Shift by a constant first so the sum-of-squares form doesn't cancel out
+    first = _first_valid(src)
+    shifted = src - (src[first] if first < len(src) else 0.0)
+    mean = sma(shifted, length)
+    mean_sq = sma(shifted * shifted, length)
+    return np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+
+
+def bollinger(src: np.ndarray, length: int, mult: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ta.bb -> (upper, basis, lower)"""
+    basis = sma(src, length)
+    dev = mult * stdev(src, length)
+    return basis + dev, basis, basis - dev
+
+
+def _rolling_extreme(src: np.ndarray, length: int, ufunc: np.ufunc) -> np.ndarray:
+    """Rolling max/min in O(n) (van Herk / Gil-Werman): na if the window holds an na
+
+    The series is cut into blocks of length; a window ending at t spans the
+    suffix of one block and the prefix of the next, so its extreme combines a
+    backwards running extreme with a forwards one.
+    """
+    src = np.asarray(src, dtype=np.float64)
+    n = len(src)
+    out = np.full(n, np.nan)
+    if length < 1 or n < length:
+        return out
+    blocks = -(-n // length)
+    padded = np.full(blocks * length, np.nan)
+    padded[:n] = src
+    grid = padded.reshape(blocks, length)
+    prefix = ufunc.accumulate(grid, axis=1).ravel()
+    suffix = ufunc.accumulate(grid[:, ::-1], axis=1)[:, ::-1].ravel()
+    out[length - 1:] = ufunc(suffix[:n - length + 1], prefix[length - 1:n])
+    return out
+
+
+def highest(src: np.ndarray, length: int) -> np.ndarray:
+    """ta.highest over the last length bars"""
+    return _rolling_extreme(src, length, np.maximum)
+
+
+def lowest(src: np.ndarray, length: int) -> np.ndarray:
+    """ta.lowest over the last length bars"""
+    return _rolling_extreme(src, length, np.minimum)
+
+
+def stoch(src: np.ndarray, high: np.ndarray, low: np.ndarray, length: int) -> np.ndarray:
+    """ta.stoch: where src sits in the high-low range of the window, 0-100 (na for a flat range)"""
+    src = np.asarray(src, dtype=np.float64)
+    lo = lowest(low, length)
+    span = highest(high, length) - lo
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100.0 * (src - lo) / span
+    out[span == 0.0] = np.nan
+    return out
+
+
+def stochastic(src: np.ndarray, high: np.ndarray, low: np.ndarray, k: int, d: int) -> Tuple[np.ndarray, np.ndarray]:
+    """-> (%K = ta.stoch(src, high, low, k), %D = ta.sma(%K, d))"""
+    k_line = stoch(src, high, low, k)
+    return k_line, sma(k_line, d)
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray, handle_na: bool = True) -> np.ndarray:
+    """ta.tr(handle_na): the first bar is high - low, or na without handle_na"""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    out = np.empty_like(high)
+    if len(out) == 0:
+        return out
+    out[0] = high[0] - low[0] if handle_na else np.nan
+    prev = close[:-1]
+    out[1:] = np.maximum(high[1:] - low[1:], np.maximum(np.abs(high[1:] - prev), np.abs(low[1:] - prev)))
+    return out
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, length: int) -> np.ndarray:
+    """ta.atr: Wilder-smoothed true range"""
+    return rma(true_range(high, low, close, handle_na=True), length)
+
+
+def fixnan(src: np.ndarray) -> np.ndarray:
+    """fixnan: replace na with the last non-na value (leading na stay)"""
+    src = np.asarray(src, dtype=np.float64)
+    index = np.where(np.isnan(src), 0, np.arange(len(src)))
+    np.maximum.accumulate(index, out=index)
+    out = src[index]
+    # Leading na have nothing to carry forward
+    out[:_first_valid(src)] = np.nan
+    return out
+
+
+def dmi(high: np.ndarray, low: np.ndarray, close: np.ndarray, di_length: int,
+        adx_smoothing: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ta.dmi -> (+DI, -DI, ADX), all Wilder-smoothed"""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    n = len(high)
+    up = np.full(n, np.nan)
+    down = np.full(n, np.nan)
+    up[1:] = np.diff(high)
+    down[1:] = -np.diff(low)
+    with np.errstate(invalid="ignore"):
+        plus_dm = np.where((up > down) & (up > 0), up, 0.0)
+        minus_dm = np.where((down > up) & (down > 0), down, 0.0)
+    plus_dm[np.isnan(up)] = np.nan
+    minus_dm[np.isnan(down)] = np.nan
+    tr = rma(true_range(high, low, close, handle_na=False), di_length)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        plus = fixnan(100.0 * rma(plus_dm, di_length) / tr)
+        minus = fixnan(100.0 * rma(minus_dm, di_length) / tr)
+        total = plus + minus
+        adx = 100.0 * rma(np.abs(plus - minus) / np.where(total == 0.0, 1.0, total), adx_smoothing)
+    return plus, minus, adx
+
+
+def crossover(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """ta.crossover: a[t] > b[t] and a[t - 1] <= b[t - 1]"""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.broadcast_to(np.asarray(b, dtype=np.float64), a.shape)
+    out = np.zeros(a.shape, dtype=bool)
+    out[1:] = (a[1:] > b[1:]) & (a[:-1] <= b[:-1])
+    return out
+
+
+def crossunder(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """ta.crossunder: a[t] < b[t] and a[t - 1] >= b[t - 1]"""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.broadcast_to(np.asarray(b, dtype=np.float64), a.shape)
+    out = np.zeros(a.shape, dtype=bool)
+    out[1:] = (a[1:] < b[1:]) & (a[:-1] >= b[:-1])
+    return out
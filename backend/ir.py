@@ -0,0 +1,250 @@
+"""
+Intermediate representation shared by the code generators
+
+A strategy dict is lowered once into slot-indexed nodes in topological order:
+kinds are resolved, inputs point at source slots instead of node ids, numeric
+parameters are typed and every node already has its variable name. Emitters
+for each target then walk the IR without touching the raw dicts again.
+"""
+import re
+from typing import List, Dict, Any, Optional
+
+from graph import normalize_type, is_input_node, topological_sort, build_input_map, resolve_input
+from metrics import stage
+from nodes import KIND_INPUT, KIND_INDICATOR, KIND_ACTION, handler
+
+_NUMBER = re.compile(r"-?\d+(\.\d+)?")
+
+# Operator after swapping the operands (a < b  <=>  b > a)
+MIRRORED_OPERATORS = {"<": ">", ">": "<", "<=": ">=", ">=": "<=", "==": "==", "!=": "!="}
+COMMUTATIVE_OPERATORS = {"and", "or"}
+
+
+def coerce_param(value: Any) -> Any:
+    """Numeric strings from the frontend's text inputs become int/float"""
+    if isinstance(value, str) and _NUMBER.fullmatch(value):
+        return float(value) if "." in value else int(value)
+    return value
+
+
+def comparison_key(operator, operand_a, operand_b) -> str:
+    """Canonical form of a binary logic expression, so a < b and b > a compare equal"""
+    a, b = str(operand_a), str(operand_b)
+    if b < a:
+        if operator in MIRRORED_OPERATORS:
+            return f"{b} {MIRRORED_OPERATORS[operator]} {a}"
+        if operator in COMMUTATIVE_OPERATORS:
+            return f"{b} {operator} {a}"
+    return f"{a} {operator} {b}"
+
+
+def _risk_enabled(value: Any) -> bool:
+    """None, empty string or 0 disable a stop-loss/take-profit"""
+    return value not in [None, "", "0", 0]
+
+
+class IRNode:
+    """One computation slot
+
+    inputs maps a port ('source', 'a', 'b', 'condition') to the slot feeding
+    it; unconnected ports are absent. handler is the registry entry for the
+    node's (kind, name), None for kinds nothing handles.
+    """
+    __slots__ = ("slot", "id", "kind", "name", "var", "suffix", "params", "inputs",
+                 "action", "stop_loss", "take_profit", "handler")
+
+    def __init__(self, slot: int, node_id: str, kind: str):
+        self.slot = slot
+        self.id = node_id
+        self.kind = kind
+        self.name = ""
+        self.var = ""
+        self.suffix = ""
+        self.params: Dict[str, Any] = {}
+        self.inputs: Dict[str, int] = {}
+        self.action: Optional[str] = None
+        self.stop_loss = 0.0
+        self.take_profit = 0.0
+        self.handler = None
+
+    def param(self, key: str, default: Any = None) -> Any:
+        return self.params.get(key, default)
+
+
+class StrategyIR:
+    """A lowered strategy: nodes in evaluation order plus strategy-wide flags
+
+    pruned lists the ids of nodes dropped because they feed no action.
+    """
+    __slots__ = ("name", "nodes", "slots", "has_sl", "has_tp", "pruned")
+
+    def __init__(self, name: str, nodes: List[IRNode], has_sl: bool, has_tp: bool):
+        self.name = name
+        self.nodes = nodes
+        self.slots = {node.id: node.slot for node in nodes}
+        self.has_sl = has_sl
+        self.has_tp = has_tp
+        self.pruned: List[str] = []
+
+    def source(self, node: IRNode, port: str) -> Optional[IRNode]:
+        slot = node.inputs.get(port)
+        return self.nodes[slot] if slot is not None else None
+
+    def consumers(self) -> List[List[int]]:
+        """Slots reading each slot's value, listed once per port they read it on"""
+        readers: List[List[int]] = [[] for _ in self.nodes]
+        for node in self.nodes:
+            for slot in node.inputs.values():
+                readers[slot].append(node.slot)
+        return readers
+
+
+def variable_name(node: dict) -> str:
+    base = node.get("name", "node").lower().replace(" ", "_").replace("<", "lt").replace(">", "gt")
+    return f"{base}_{str(node['id']).split('-')[-1]}"
+
+
+def risk_flags(nodes: List[dict]):
+    """Whether any buy action uses a stop-loss / take-profit (the SL/TP state vars exist)"""
+    has_sl = False
+    has_tp = False
+    for node in nodes:
+        if node.get("type", "").lower() in ["action", "actionnode"]:
+            params = node.get("parameters", {})
+            if params.get("actionType") == "buy":
+                try:
+                    sl_val = params.get("stopLoss")
+                    tp_val = params.get("takeProfit")
+                    sl = float(sl_val) if _risk_enabled(sl_val) else 0
+                    tp = float(tp_val) if _risk_enabled(tp_val) else 0
+                    if sl > 0: has_sl = True
+                    if tp > 0: has_tp = True
+                except (TypeError, ValueError):
+                    pass
+    return has_sl, has_tp
+
+
+def _action_risk(params: dict):
+    """Stop-loss/take-profit percentages of a buy action, top level or nested"""
+    sl_percent = params.get("stopLoss")
+    if sl_percent is None:
+        sl_percent = params.get("parameters", {}).get("stopLoss", "")
+    tp_percent = params.get("takeProfit")
+    if tp_percent is None:
+        tp_percent = params.get("parameters", {}).get("takeProfit", "")
+    try:
+        sl_val = float(sl_percent) if _risk_enabled(sl_percent) else 0
+        tp_val = float(tp_percent) if _risk_enabled(tp_percent) else 0
+    except (TypeError, ValueError):
+        sl_val = 0
+        tp_val = 0
+    return sl_val, tp_val
+
+
+def node_kind(node: dict) -> str:
+    return KIND_INPUT if is_input_node(node) else normalize_type(node)
+
+
+def refresh_node(node: IRNode, raw: dict):
+    """(Re)derive everything an IR node takes from its own dict, leaving its ports alone
+
+    Parameters the handler declares but the dict leaves out get their defaults.
+    """
+    node.params = {key: coerce_param(value) for key, value in raw.get("parameters", {}).items()}
+    if node.kind == KIND_INPUT:
+        node.name = raw.get("name", "Input")
+        node.var = "close"
+        node.suffix = ""
+    else:
+        node.name = raw.get("name", "RSI" if node.kind == KIND_INDICATOR else "node")
+        node.var = variable_name(raw)
+        node.suffix = str(raw["id"]).split("-")[-1]
+    node.handler = handler(node.kind, node.name)
+    if node.handler is not None:
+        for key, (_, default) in node.handler.params.items():
+            node.params.setdefault(key, default)
+    if node.kind == KIND_ACTION:
+        node.action = str(raw.get("parameters", {}).get("actionType", "buy")).lower()
+        if node.action == "buy":
+            node.stop_loss, node.take_profit = _action_risk(raw.get("parameters", {}))
+        else:
+            node.stop_loss = node.take_profit = 0.0
+
+
+def prune_dead_nodes(ir: StrategyIR, keep_display: bool = False) -> List[IRNode]:
+    """Drop nodes whose value cannot reach an action; returns the removed nodes
+
+    Graphs without actions are chart studies and are left alone. With
+    keep_display, indicators that feed no action stay, along with whatever they
+    read, since they still draw on the chart. Input nodes emit nothing and are
+    always kept.
+    """
+    if not any(node.kind == KIND_ACTION for node in ir.nodes):
+        return []
+    # Inputs always come before their consumers, so one backwards sweep marks everything upstream
+    live = [False] * len(ir.nodes)
+    for node in reversed(ir.nodes):
+        if node.kind in (KIND_ACTION, KIND_INPUT) or (keep_display and node.kind == KIND_INDICATOR):
+            live[node.slot] = True
+        if live[node.slot]:
+            for slot in node.inputs.values():
+                live[slot] = True
+    if all(live):
+        return []
+
+    kept: List[IRNode] = []
+    removed: List[IRNode] = []
+    renumbered: Dict[int, int] = {}
+    for node in ir.nodes:
+        if live[node.slot]:
+            renumbered[node.slot] = len(kept)
+            node.slot = len(kept)
+            kept.append(node)
+        else:
+            removed.append(node)
+    for node in kept:
+        node.inputs = {port: renumbered[slot] for port, slot in node.inputs.items()}
+    ir.nodes = kept
+    ir.slots = {node.id: node.slot for node in kept}
+    ir.pruned = [node.id for node in removed]
+    return removed
+
+
+def lower_strategy(strategy: dict, prune: bool = True) -> StrategyIR:
+    """Parse a strategy dict into the IR (nodes on a cycle are dropped)
+
+    Unless prune is off, nodes feeding no action are dropped as well; a truthy
+    keep_display_indicators on the strategy keeps indicators that only plot.
+    """
+    raw_nodes = strategy.get("nodes", [])
+    connections = strategy.get("connections", [])
+    input_map = build_input_map(connections)
+    has_sl, has_tp = risk_flags(raw_nodes)
+
+    nodes: List[IRNode] = []
+    slots: Dict[str, int] = {}
+
+    def port(node_id, handle_id):
+        source_id = resolve_input(input_map, node_id, handle_id)
+        return slots.get(source_id) if source_id else None
+
+    with stage("toposort"):
+        ordered = topological_sort(raw_nodes, connections)
+    for raw in ordered:
+        node_id = raw["id"]
+        node = IRNode(len(nodes), node_id, node_kind(raw))
+        refresh_node(node, raw)
+
+        if node.handler is not None:
+            for port_name, (handle, _) in node.handler.ports.items():
+                source = port(node_id, handle)
+                if source is not None:
+                    node.inputs[port_name] = source
+
+        slots[node_id] = node.slot
+        nodes.append(node)
+
+    ir = StrategyIR(strategy.get("name", "Untitled"), nodes, has_sl, has_tp)
+    if prune:
+        prune_dead_nodes(ir, bool(strategy.get("keep_display_indicators")))
+    return ir
@@ -0,0 +1,187 @@
+"""
+Background backtest jobs: a bounded worker pool fed by a priority queue
+"""
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Percent complete when a phase starts (the names BacktestPanel.jsx draws)
+PHASES = {
+    "queued": 0,
+    "processing": 10,
+    "indicators": 25,
+    "backtesting": 65,
+    "results": 90,
+    "completed": 100,
+}
+
+MESSAGES = {
+    "queued": "Waiting for a worker",
+    "processing": "Loading price data",
+    "indicators": "Computing indicators",
+    "backtesting": "Simulating trades",
+    "results": "Summarizing results",
+    "completed": "Backtest complete",
+}
+
+
+class QueueFull(Exception):
+    """The queue is at capacity; the caller should retry later"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job at its next progress report after cancel()"""
+
+
+class Job:
+    """One queued callable and its progress, as polled by clients"""
+
+    def __init__(self, fn: Callable[[Callable[[str], None]], Any], priority: int):
+        self.id = uuid.uuid4().hex
+        self.fn = fn
+        self.priority = priority
+        self.status = "queued"  # queued | running | completed | error | cancelled
+        self.phase = "queued"
+        self.message = MESSAGES["queued"]
+        self.result: Any = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.cancel_requested = False
+
+    def report(self, phase: str, message: Optional[str] = None):
+        """Progress callback handed to the job; also where cancellation takes effect"""
+        if self.cancel_requested:
+            raise JobCancelled()
+        self.phase = phase
+        self.message = message or MESSAGES.get(phase, phase)
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "phase": self.phase,
+            "progress": PHASES.get(self.phase, 0),
+            "message": self.message,
+            "elapsed": round((self.finished or time.time()) - self.created, 3),
+        }
+        if self.status == "completed":
+            data["result"] = self.result
+        return data
+
+
+class JobManager:
+    """Runs jobs on a fixed set of threads, highest priority first, FIFO within a priority
+
+    The threads are its own, so long jobs never occupy the request threads
+    that the compile endpoints are served from. submit() refuses work once
+    max_queued jobs are waiting, and finished jobs are forgotten ttl seconds
+    after they end.
+    """
+
+    def __init__(self, workers: int = 2, max_queued: int = 64, ttl: float = 600.0):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._heap: List[Tuple[int, int, Job]] = []
+        self._order = itertools.count()
+        self._jobs: Dict[str, Job] = {}
+        # Finished jobs in the order they ended, for expiry
+        self._finished: "deque[Job]" = deque()
+        self._threads: List[threading.Thread] = []
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.rejected = 0
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        while self._finished and self._finished[0].finished < cutoff:
+            self._jobs.pop(self._finished.popleft().id, None)
+
+    def _finish(self, job: Job, status: str):
+        job.status = status
+        job.finished = time.time()
+        self._finished.append(job)
+
+    def submit(self, fn: Callable[[Callable[[str], None]], Any], priority: int = 0) -> Job:
+        """Queue fn(report); raises QueueFull when max_queued jobs are already waiting"""
+        with self._lock:
+            self._expire()
+            if self.queued >= self.max_queued:
+                self.rejected += 1
+                raise QueueFull(f"Backtest queue is full ({self.max_queued} waiting)")
+            job = Job(fn, priority)
+            self._jobs[job.id] = job
+            heapq.heappush(self._heap, (-priority, next(self._order), job))
+            self.queued += 1
+            # Threads start on first use, so importing the app spawns nothing
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"backtest-job-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._ready.notify()
+            return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Drop a queued job, or stop a running one at its next progress report"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status == "queued":
+                # Left in the heap; the worker that pops it skips it
+                self.queued -= 1
+                self.cancelled += 1
+                job.message = "Cancelled"
+                self._finish(job, "cancelled")
+            elif job.status == "running":
+                job.cancel_requested = True
+                job.message = "Cancelling"
+            return job
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while not self._heap:
+                    self._ready.wait()
+                job = heapq.heappop(self._heap)[2]
+                if job.status != "queued":
+                    continue
+                self.queued -= 1
+                self.running += 1
+                job.status = "running"
+            try:
+                result = job.fn(job.report)
+                status = "completed"
+            except JobCancelled:
+                status = "cancelled"
+            except Exception as e:
+                status = "error"
+                result = None
+                job.message = str(e) or type(e).__name__
+            with self._lock:
+                self.running -= 1
+                if status == "completed":
+                    self.completed += 1
+                    job.result = result
+                    job.phase = "completed"
+                    job.message = MESSAGES["completed"]
+                elif status == "cancelled":
+                    self.cancelled += 1
+                    job.message = "Cancelled"
+                else:
+                    self.failed += 1
+                self._finish(job, status)
@@ -0,0 +1,93 @@
+"""
+Message handling for the live-compile WebSocket: bursts of edits become one compile
+"""
+import asyncio
+import json
+import os
+from typing import List, Dict, Any, AsyncIterator, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+# Quiet period that ends a burst, and the longest a burst may keep growing
+DEBOUNCE_SECONDS = int(os.environ.get("LIVE_COMPILE_DEBOUNCE_MS", "75")) / 1000
+MAX_WAIT_SECONDS = int(os.environ.get("LIVE_COMPILE_MAX_WAIT_MS", "500")) / 1000
+
+
+async def message_bursts(websocket: WebSocket, debounce: float = DEBOUNCE_SECONDS,
+                         max_wait: float = MAX_WAIT_SECONDS) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Yield lists of messages that arrived within debounce of each other
+
+    A reader task drains the socket into a queue so waiting for the quiet
+    period never cancels a receive half way. max_wait caps a burst, so a
+    client typing non-stop still gets output.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def reader():
+        try:
+            while True:
+                text = await websocket.receive_text()
+                try:
+                    message = json.loads(text)
+                except ValueError:
+                    message = {"type": "invalid", "error": "Message is not valid JSON"}
+                await queue.put(message if isinstance(message, dict) else {"type": "invalid"})
+        except WebSocketDisconnect:
+            pass
+        finally:
+            await queue.put(None)
+
+    task = asyncio.create_task(reader())
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            first = await queue.get()
+            if first is None:
+                return
+            burst = [first]
+            deadline = loop.time() + max_wait
+            closed = False
+            while True:
+                timeout = min(debounce, deadline - loop.time())
+                if timeout <= 0:
+                    break
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if message is None:
+                    closed = True
+                    break
+                burst.append(message)
+            yield burst
+            if closed:
+                return
+    finally:
+        task.cancel()
+
+
+def coalesce(burst: List[Dict[str, Any]]):
+    """Fold a burst into (latest full strategy or None, deltas after it, errors, last seq)
+
+    A full strategy supersedes every delta sent before it in the burst.
+    """
+    strategy: Optional[dict] = None
+    deltas: List[dict] = []
+    errors: List[str] = []
+    seq = None
+    for message in burst:
+        seq = message.get("seq", seq)
+        kind = message.get("type")
+        if kind == "init":
+            strategy = message.get("strategy")
+            deltas = []
+            if not isinstance(strategy, dict):
+                errors.append("init needs a 'strategy' object")
+        elif kind == "deltas":
+            if isinstance(message.get("deltas"), list):
+                deltas.extend(message["deltas"])
+            else:
+                errors.append("deltas needs a 'deltas' list")
+        else:
+            errors.append(message.get("error") or f"Unknown message type: {kind}")
+    return strategy, deltas, errors, seq
@@ -1,14 +1,38 @@
 """
 FastAPI backend for Trading Strategy Builder
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
+import json
+import os
 import uuid
-from validation import validate_strategy
+from validation import StrategyValidationError, check_strategy, validate_strategy
+from compiler import COMPILERS, stream_code
+# Re-exported: scripts and tests written against the original main.py import it from here
+from compiler import compile_to_pinescript  # noqa: F401
+from compression import CompressionMiddleware
+from nodes import KIND_INDICATOR, handlers
+from backtest import backtest_arrays, prepare_data
+from sweep import expand_values, reusable_nodes, run_sweep, validate_grid
+from batch_backtest import MAX_BACKTESTS, SharedArrays, backtest_batch, expand_grid
+from walkforward import walk_forward
+from compile_cache import CompileCache, strategy_fingerprint
+from batch_compile import compile_batch
+from store import StrategyStore
+from ohlcv_store import OHLCVStore
+from jobs import JobManager, QueueFull
+from indicator_cache import IndicatorCache, data_key
+from compile_session import CompileSession, CompileSessions, DeltaError
+from live_compile import message_bursts, coalesce
+import metrics
+from metrics import MetricsMiddleware, TimedRoute, note, stage
 
 app = FastAPI(title="Trading Strategy Builder API")
+app.router.route_class = TimedRoute
 
 # CORS for React frontend (Vite defaults to 5173, CRA to 3000)
 origins = [
@@ -22,8 +46,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Next-Cursor"],
 )
 
+# Stage timings per request (Server-Timing) and aggregates for /metrics; METRICS_ENABLED=0 removes both
+if metrics.ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# gzip, or brotli when the module is installed, for bodies of at least COMPRESSION_MIN_BYTES
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.environ.get("COMPRESSION_MIN_BYTES", "1024")))
+
 # Data models
 class IndicatorNode(BaseModel):
     id: str
@@ -44,26 +76,168 @@ class Strategy(BaseModel):
     nodes: List[IndicatorNode]
     connections: List[Connection]
     target_platform: str = "pinescript"  # pinescript, csharp, mql
+    keep_display_indicators: bool = False  # keep indicators that feed no action, for their plots
+
+class BatchCompileRequest(BaseModel):
+    strategies: List[Strategy] = []
+    strategy_ids: List[str] = []
+    targets: List[str] = ["pinescript"]
+
+class CompileDelta(BaseModel):
+    op: str  # set_parameters, update_node, add_node, remove_node, add_edge, remove_edge
+    node_id: Optional[str] = None
+    parameters: Optional[Dict[str, Any]] = None
+    node: Optional[IndicatorNode] = None
+    connection: Optional[Connection] = None
+
+class CompileDeltaRequest(BaseModel):
+    deltas: List[CompileDelta]
+    version: Optional[int] = None  # version the client last saw; stale edits get a 409
+
+class OHLCVData(BaseModel):
+    close: List[float]
+    open: List[float] = []
+    high: List[float] = []
+    low: List[float] = []
+    volume: List[float] = []
+    timestamp: Optional[List[int]] = None
+
+class DataSource(BaseModel):
+    """Bars from the local OHLCV store, optionally limited to a timestamp range (inclusive)"""
+    symbol: str
+    interval: str
+    start: Optional[int] = None
+    end: Optional[int] = None
+
+class BacktestRequest(BaseModel):
+    strategy: Strategy
+    data: Optional[OHLCVData] = None
+    source: Optional[DataSource] = None  # instead of inline data
+    starting_cash: float = 10000
+    slippage_bps: float = 0
+    fee_bps: float = 0
+    priority: int = 0  # queued jobs with a higher priority start first
+
+class SweepParameter(BaseModel):
+    node_id: str
+    parameter: str
+    values: Optional[List[Any]] = None
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    step: Optional[float] = None
+
+class SweepRequest(BaseModel):
+    strategy: Strategy
+    data: Optional[OHLCVData] = None
+    source: Optional[DataSource] = None  # instead of inline data
+    parameters: List[SweepParameter]
+    starting_cash: float = 10000
+    slippage_bps: float = 0
+    fee_bps: float = 0
+    sort_by: str = "total_return_pct"
+    top: Optional[int] = 50
+
+class WalkForwardRequest(BaseModel):
+    strategy: Strategy
+    data: Optional[OHLCVData] = None
+    source: Optional[DataSource] = None  # instead of inline data
+    parameters: List[SweepParameter]
+    in_sample_bars: int
+    out_of_sample_bars: int
+    anchored: bool = False  # in-sample windows grow from the first bar instead of rolling
+    starting_cash: float = 10000
+    slippage_bps: float = 0
+    fee_bps: float = 0
+    sort_by: str = "total_return_pct"
+
+class BatchBacktestRequest(BaseModel):
+    strategy: Strategy
+    sources: List[DataSource] = []  # one backtest per source and combination
+    data: Optional[OHLCVData] = None  # or a single inline series
+    parameters: List[SweepParameter] = []
+    starting_cash: float = 10000
+    slippage_bps: float = 0
+    fee_bps: float = 0
+    shard_size: Optional[int] = None  # combinations per shard; split automatically when unset
+
+# Saved strategies (SQLite, WAL mode)
+strategy_store = StrategyStore(os.environ.get(
+    "STRATEGY_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "strategies.db")
+))
+
+# Price history for local backtests, memory-mapped per symbol and interval
+ohlcv_store = OHLCVStore(os.environ.get(
+    "OHLCV_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "ohlcv_data")
+))
+
+# Node outputs shared across backtests of the same bars
+indicator_cache = IndicatorCache(
+    max_bytes=int(os.environ.get("INDICATOR_CACHE_BYTES", str(256 << 20))),
+    spill_dir=os.environ.get("INDICATOR_CACHE_SPILL_DIR") or None,
+    spill_bytes=int(os.environ.get("INDICATOR_CACHE_SPILL_BYTES", str(4 << 30))),
+)
+
+# Queued backtests, run on their own threads so they never hold the request
+# threads that compiles are served from
+backtest_jobs = JobManager(
+    workers=int(os.environ.get("BACKTEST_JOB_WORKERS", "2")),
+    max_queued=int(os.environ.get("BACKTEST_QUEUE_SIZE", "64")),
+    ttl=float(os.environ.get("BACKTEST_JOB_TTL", "600")),
+)
 
-# In-memory storage (replace with database later)
-strategies_db = []
+# Live editor sessions compiling Pine incrementally from deltas
+compile_sessions = CompileSessions(maxsize=int(os.environ.get("COMPILE_SESSIONS_MAX", "256")))
+
+# Generated code keyed by strategy fingerprint
+compile_cache = CompileCache(maxsize=int(os.environ.get("COMPILE_CACHE_SIZE", "512")))
+
+if metrics.ENABLED:
+    metrics.registry.register("compile_cache_hits_total", "counter", "Compiles answered from the cache",
+                              lambda: compile_cache.hits)
+    metrics.registry.register("compile_cache_misses_total", "counter", "Compiles that generated code",
+                              lambda: compile_cache.misses)
+    metrics.registry.register("compile_cache_coalesced_total", "counter", "Compiles that waited on an identical one",
+                              lambda: compile_cache.coalesced)
+    metrics.registry.register("compile_cache_entries", "gauge", "Generated programs held in the cache",
+                              lambda: compile_cache.stats()["size"])
+    metrics.registry.register("strategies", "gauge", "Saved strategies", lambda: strategy_store.count())
+    metrics.registry.register("compile_sessions", "gauge", "Open live compile sessions", lambda: len(compile_sessions))
+    metrics.registry.register("indicator_cache_hits_total", "counter", "Node outputs served from memory",
+                              lambda: indicator_cache.hits)
+    metrics.registry.register("indicator_cache_spill_hits_total", "counter", "Node outputs reloaded from disk",
+                              lambda: indicator_cache.spill_hits)
+    metrics.registry.register("indicator_cache_misses_total", "counter", "Node outputs computed",
+                              lambda: indicator_cache.misses)
+    metrics.registry.register("indicator_cache_evictions_total", "counter", "Node outputs evicted from memory",
+                              lambda: indicator_cache.evictions)
+    metrics.registry.register("indicator_cache_bytes", "gauge", "Bytes of node outputs held in memory",
+                              lambda: indicator_cache.stats()["bytes"])
+    metrics.registry.register("indicator_cache_spilled_bytes", "gauge", "Bytes of node outputs spilled to disk",
+                              lambda: indicator_cache.stats()["spilled_bytes"])
+    metrics.registry.register("backtest_jobs_queued", "gauge", "Backtest jobs waiting for a worker",
+                              lambda: backtest_jobs.queued)
+    metrics.registry.register("backtest_jobs_running", "gauge", "Backtest jobs on a worker",
+                              lambda: backtest_jobs.running)
+    metrics.registry.register("backtest_jobs_rejected_total", "counter", "Backtests refused with 429 (queue full)",
+                              lambda: backtest_jobs.rejected)
 
 @app.get("/")
 def read_root():
     return {"message": "Trading Strategy Builder API"}
 
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition of request, stage, cache and store metrics"""
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/indicators")
 def get_available_indicators():
     """Get list of available indicators"""
     indicators = [
-        {"id": "rsi", "name": "RSI", "category": "momentum", "default_params": {"period": 14}},
-        {"id": "macd", "name": "MACD", "category": "trend", "default_params": {"fast": 12, "slow": 26, "signal": 9}},
-        {"id": "sma", "name": "SMA", "category": "trend", "default_params": {"period": 20}},
-        {"id": "ema", "name": "EMA", "category": "trend", "default_params": {"period": 20}},
-        {"id": "bollinger", "name": "Bollinger Bands", "category": "volatility", "default_params": {"period": 20, "std_dev": 2}},
-        {"id": "stochastic", "name": "Stochastic", "category": "momentum", "default_params": {"k": 14, "d": 3}},
-        {"id": "atr", "name": "ATR", "category": "volatility", "default_params": {"period": 14}},
-        {"id": "adx", "name": "ADX", "category": "trend", "default_params": {"period": 14}},
+        {"id": h.id, "name": h.name, "category": h.category, "default_params": h.defaults()}
+        for h in handlers(KIND_INDICATOR)
     ]
     return indicators
 
@@ -72,304 +246,486 @@ def create_strategy(strategy: Strategy):
     """Save a new strategy"""
     if not strategy.id:
         strategy.id = str(uuid.uuid4())
-    strategies_db.append(strategy.dict())
+    strategy_store.save(strategy.dict())
     return {"id": strategy.id, "message": "Strategy saved"}
 
 @app.get("/api/strategies")
-def get_strategies():
-    """Get all saved strategies"""
-    return strategies_db
+def get_strategies(response: Response, cursor: Optional[str] = None, limit: Optional[int] = None,
+                   fields: Optional[str] = None):
+    """Get saved strategies, a page at a time when cursor or limit is given
+
+    Pages hold limit strategies (100 by default) and the next page's cursor is
+    in X-Next-Cursor. Without either parameter every strategy is returned, as
+    before pagination existed.
+    """
+    projection = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    if cursor is None and limit is None:
+        return list(strategy_store.iter_all(fields=projection))
+    limit = 100 if limit is None else limit
+    if not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000")
+    try:
+        items, next_cursor = strategy_store.list(cursor, limit, projection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
+
+@app.get("/api/strategies/export")
+def export_strategies(fields: Optional[str] = None):
+    """Every saved strategy as NDJSON, streamed a page at a time instead of built in memory"""
+    projection = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+    def lines():
+        # One chunk per page: every chunk costs a compressor flush
+        page = []
+        for strategy in strategy_store.iter_all(fields=projection):
+            page.append(json.dumps(strategy) + "\n")
+            if len(page) == 500:
+                yield "".join(page)
+                page = []
+        if page:
+            yield "".join(page)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/api/validate")
+def validate_strategy_graph(strategy: Strategy):
+    """Every error and warning in a strategy graph, without compiling it"""
+    report = check_strategy(strategy.dict())
+    return {"valid": not report["errors"], **report}
 
 @app.post("/api/compile/temp")
-def compile_strategy_temp(strategy: Strategy, target: str = "pinescript"):
+def compile_strategy_temp(strategy: Strategy, target: str = "pinescript",
+                          if_none_match: Optional[str] = Header(None)):
     """Compile strategy directly from payload without saving"""
-    # Validate strategy
+    if target not in COMPILERS:
+        raise HTTPException(status_code=400, detail="Unsupported target language")
+
+    strategy_data = strategy.dict()
+    key = strategy_fingerprint(strategy_data, target)
+    etag = f'"{key}"'
+    # Only answer 304 for code this process has actually generated
+    if if_none_match and etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        if compile_cache.get(key) is not None:
+            return Response(status_code=304, headers={"ETag": etag})
+
+    compiled = False
+
+    def compile_fn():
+        nonlocal compiled
+        compiled = True
+        # Validate strategy
+        try:
+            with stage("validate"):
+                validate_strategy(strategy_data)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Validation error: {str(e)}")
+        return COMPILERS[target](strategy_data)
+
+    code = compile_cache.get_or_compile(key, compile_fn)
+    note("cache", "miss" if compiled else "hit")
+    return JSONResponse({"code": code, "language": target}, headers={"ETag": etag})
+
+@app.post("/api/compile/stream")
+def compile_strategy_stream(strategy: Strategy, target: str = "pinescript",
+                            if_none_match: Optional[str] = Header(None)):
+    """Compile like /api/compile/temp, but send the bare code as text while it is generated
+
+    Code already in the compile cache is sent from there. Otherwise it is
+    emitted line by line and not cached, so the full script is never held.
+    """
+    if target not in COMPILERS:
+        raise HTTPException(status_code=400, detail="Unsupported target language")
+
+    strategy_data = strategy.dict()
+    key = strategy_fingerprint(strategy_data, target)
+    etag = f'"{key}"'
+    cached = compile_cache.get(key)
+    if cached is not None and if_none_match and etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    if cached is not None:
+        note("cache", "hit")
+        step = 1 << 16
+        chunks = (cached[i:i + step] for i in range(0, len(cached), step))
+    else:
+        note("cache", "miss")
+        try:
+            with stage("validate"):
+                validate_strategy(strategy_data)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Validation error: {str(e)}")
+        chunks = stream_code(strategy_data, target)
+    return StreamingResponse(chunks, media_type="text/plain; charset=utf-8", headers={"ETag": etag})
+
+@app.post("/api/compile/batch")
+def compile_strategies_batch(request: BatchCompileRequest):
+    """Compile many strategies for several targets, streaming one NDJSON line per item"""
+    unsupported = [t for t in request.targets if t not in COMPILERS]
+    if unsupported or not request.targets:
+        raise HTTPException(status_code=400, detail=f"Unsupported target language: {', '.join(unsupported)}")
+
+    items = [{"strategy": strategy.dict()} for strategy in request.strategies]
+    saved = strategy_store.get_many(request.strategy_ids) if request.strategy_ids else {}
+    for strategy_id in request.strategy_ids:
+        strategy = saved.get(strategy_id)
+        if strategy:
+            items.append({"strategy": strategy})
+        else:
+            items.append({"id": strategy_id, "error": "Strategy not found"})
+
+    return StreamingResponse(compile_batch(items, request.targets), media_type="application/x-ndjson")
+
+def apply_checked(session: CompileSession, deltas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Apply deltas only if the graph they produce passes validation, as a one-shot compile would"""
+    validate_strategy(session.preview(deltas))
+    return session.apply(deltas)
+
+@app.post("/api/compile/sessions")
+def create_compile_session(strategy: Strategy):
+    """Start a live Pine Script preview session for the editor"""
+    strategy_data = strategy.dict()
     try:
-        validate_strategy(strategy.dict())
+        validate_strategy(strategy_data)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Validation error: {str(e)}")
+    session = compile_sessions.create(strategy_data)
+    return {"session_id": session.id, "version": session.version, "code": session.code()}
+
+@app.get("/api/compile/sessions/{session_id}")
+def get_compile_session(session_id: str):
+    """Full current code of a session (to resync after a 409)"""
+    session = compile_sessions.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    with session.lock:
+        return {"session_id": session.id, "version": session.version, "code": session.code()}
+
+@app.post("/api/compile/sessions/{session_id}/deltas")
+def apply_compile_deltas(session_id: str, request: CompileDeltaRequest):
+    """Apply graph edits and return a patch of changed code lines"""
+    session = compile_sessions.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    deltas = [delta.dict(exclude_none=True) for delta in request.deltas]
+
+    with session.lock:
+        if request.version is not None and request.version != session.version:
+            raise HTTPException(status_code=409, detail=f"Session is at version {session.version}")
+        try:
+            patch = apply_checked(session, deltas)
+        except DeltaError as e:
+            raise HTTPException(status_code=400, detail=f"Delta error: {str(e)}")
+        except StrategyValidationError as e:
+            raise HTTPException(status_code=400, detail=f"Validation error: {str(e)}")
+        return {"version": session.version, "patch": patch}
+
+@app.delete("/api/compile/sessions/{session_id}")
+def delete_compile_session(session_id: str):
+    if not compile_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"message": "Session closed"}
+
+@app.websocket("/ws/compile")
+async def live_compile(websocket: WebSocket):
+    """Live Pine preview over one connection
+
+    Clients send {"type": "init", "strategy": {...}} and then
+    {"type": "deltas", "deltas": [...]}, optionally tagged with a "seq".
+    Messages arriving in a burst are compiled together; the reply is the full
+    code after an init, otherwise a line patch, or the errors for a burst that
+    was rejected as a whole.
+    """
+    await websocket.accept()
+    session = None
+    try:
+        async for burst in message_bursts(websocket):
+            strategy, deltas, errors, seq = coalesce(burst)
+            reply = {"seq": seq, "coalesced": len(burst)}
+            if not errors:
+                try:
+                    if strategy is not None:
+                        strategy = Strategy(**strategy).dict()
+                        validate_strategy(strategy)
+                    deltas = [CompileDelta(**delta).dict(exclude_none=True) for delta in deltas]
+                except Exception as e:
+                    errors.append(f"Validation error: {str(e)}")
+            if not errors and strategy is None and session is None:
+                errors.append("Send an init message before deltas")
+            if errors:
+                await websocket.send_json({"type": "error", "errors": errors, **reply})
+                continue
 
-    # Compile based on target
-    if target == "pinescript":
-        code = compile_to_pinescript(strategy.dict())
-    elif target == "csharp":
-        code = compile_to_csharp(strategy.dict())
-    elif target == "mql":
-        code = compile_to_mql(strategy.dict())
-    else:
-        raise HTTPException(status_code=400, detail="Unsupported target language")
-    
-    return {"code": code, "language": target}
+            try:
+                target = await run_in_threadpool(CompileSession, strategy) if strategy is not None else session
+                patch = await run_in_threadpool(apply_checked, target, deltas) if deltas else []
+            except DeltaError as e:
+                await websocket.send_json({"type": "error", "errors": [f"Delta error: {str(e)}"], **reply})
+                continue
+            except StrategyValidationError as e:
+                await websocket.send_json({"type": "error", "errors": [f"Validation error: {str(e)}"], **reply})
+                continue
+            session = target
+            if strategy is not None:
+                await websocket.send_json({"type": "code", "version": session.version, "code": session.code(), **reply})
+            else:
+                await websocket.send_json({"type": "patch", "version": session.version, "patch": patch, **reply})
+    except WebSocketDisconnect:
+        pass
 
 @app.post("/api/compile/{strategy_id}")
-def compile_strategy(strategy_id: str, target: str = "pinescript"):
+def compile_strategy(strategy_id: str, target: str = "pinescript",
+                     if_none_match: Optional[str] = Header(None)):
     """Compile saved strategy to target language"""
-    # Find strategy
-    strategy = next((s for s in strategies_db if s["id"] == strategy_id), None)
+    strategy = strategy_store.get(strategy_id)
     if not strategy:
         raise HTTPException(status_code=404, detail="Strategy not found")
     
-    return compile_strategy_temp(Strategy(**strategy), target)
-
-def compile_to_pinescript(strategy: dict) -> str:
-    """Compile to TradingView Pine Script with modular node logic"""
-    code = []
-    code.append(f"// Generated by Trading Strategy Builder")
-    code.append(f"// Strategy: {strategy.get('name', 'Untitled')}")
-    code.append("")
-    code.append("//@version=5")
-    code.append(f"strategy('{strategy.get('name', 'Untitled')}', overlay=true)")
-    # 0. Pre-scan for SL/TP usage
-    has_sl = False
-    has_tp = False
-    nodes = strategy.get("nodes", []) # Ensure nodes is defined for the pre-scan
-    for node in nodes:
-        if node.get("type", "").lower() in ["action", "actionnode"]:
-            params = node.get("parameters", {})
-            if params.get("actionType") == "buy":
-                try:
-                    sl_val = params.get("stopLoss")
-                    tp_val = params.get("takeProfit")
-                    # Treat None, empty string, or 0 as disabled
-                    sl = float(sl_val) if sl_val not in [None, "", "0", 0] else 0
-                    tp = float(tp_val) if tp_val not in [None, "", "0", 0] else 0
-                    if sl > 0: has_sl = True
-                    if tp > 0: has_tp = True
-                except: pass
-
-    # --- Strategy State Variables ---
-    code.append("// --- Strategy State Variables ---")
-    code.append("var bool positionOpen = false")
-    code.append("var float entryPrice = na")
-    if has_sl: code.append("var float stopLossPrice = na")
-    if has_tp: code.append("var float takeProfitPrice = na")
-    code.append("")
-
-    nodes = strategy.get("nodes", [])
-    connections = strategy.get("connections", [])
-    
-    # 1. Pre-process nodes and build dependency graph
-    node_map = {node["id"]: node for node in nodes}
-    node_vars = {}
-    adj = {node["id"]: [] for node in nodes}
-    in_degree = {node["id"]: 0 for node in nodes}
-
-    for conn in connections:
-        source_id = conn["source"]
-        target_id = conn["target"]
-        if source_id in adj and target_id in adj:
-            adj[source_id].append(target_id)
-            in_degree[target_id] += 1
-
-    # 2. Topological Sort (Kahn's Algorithm)
-    queue = [n_id for n_id, degree in in_degree.items() if degree == 0]
-    sorted_nodes = []
-    while queue:
-        u = queue.pop(0)
-        sorted_nodes.append(node_map[u])
-        for v in adj[u]:
-            in_degree[v] -= 1
-            if in_degree[v] == 0:
-                queue.append(v)
-
-    # 3. Map handles for each node
-    # input_map: target_node_id -> { handle_id: source_node_id }
-    input_map = {}
-    for conn in connections:
-        target = conn["target"]
-        handle = conn.get("targetHandle") or 'default'
-        source = conn["source"]
-        if target not in input_map:
-            input_map[target] = {}
-        input_map[target][handle] = source
-
-    def get_source_var(target_id, handle_id='default'):
-        source_id = input_map.get(target_id, {}).get(handle_id)
-        if not source_id:
-            # Fallback for old 'a'/'default' mixup
-            if handle_id == 'a':
-                source_id = input_map.get(target_id, {}).get('default')
-            elif handle_id == 'default':
-                source_id = input_map.get(target_id, {}).get('a')
-        return node_vars.get(source_id) if source_id else None
-
-    # 4. Generate code in topological order
-    code.append("// --- Indicator & Logic Calculations ---")
-    code.append("can_buy = not positionOpen")
-    code.append("can_sell = positionOpen")
-    for node in sorted_nodes:
-        node_id = node["id"]
-        # Normalize type
-        raw_type = node.get("type", "").lower()
-        if raw_type.endswith("node"):
-            nt = raw_type[:-4]
-        else:
-            nt = raw_type
-        
-        # Default to indicator if type is ambiguous but it has a name like RSI
-        # Ignore input nodes (Strategy Start)
-        if nt == "input" or node.get("name") == "Strategy Start":
-            code.append(f"// {node.get('name', 'Input')} Node skipped")
-            node_vars[node_id] = "close" # Fallback if connected
-            continue
-
-        params = node.get("parameters", {})
-        
-        node_var_base = node.get("name", "node").lower().replace(" ", "_").replace("<", "lt").replace(">", "gt")
-        var_name = f"{node_var_base}_{str(node_id).split('-')[-1]}"
-        node_vars[node_id] = var_name
-
-        if nt == "indicator":
-            name = node.get("name", "RSI")
-            # Get source (default is 'close' if not connected)
-            source_var = get_source_var(node_id, 'default') or get_source_var(node_id, 'a') or "close"
-            
-            if name == "RSI":
-                period = params.get("period", 14)
-                code.append(f"{var_name} = ta.rsi({source_var}, {period})")
-                code.append(f"plot({var_name}, title='RSI {period}', color=color.purple, display=display.pane)")
-                code.append(f"plot(70, title='RSI Upper', color=color.new(color.red, 50), display=display.pane)")
-                code.append(f"plot(30, title='RSI Lower', color=color.new(color.green, 50), display=display.pane)")
-            elif name == "SMA":
-                period = params.get("period", 20)
-                code.append(f"{var_name} = ta.sma({source_var}, {period})")
-                code.append(f"plot({var_name}, title='SMA {period}', color=color.blue, linewidth=1)")
-            elif name == "EMA":
-                period = params.get("period", 20)
-                code.append(f"{var_name} = ta.ema({source_var}, {period})")
-                code.append(f"plot({var_name}, title='EMA {period}', color=color.orange, linewidth=1)")
-            elif name == "MACD":
-                fast = params.get("fast", 12)
-                slow = params.get("slow", 26)
-                signal = params.get("signal", 9)
-                code.append(f"[{var_name}_line, {var_name}_sig, {var_name}_hist] = ta.macd({source_var}, {fast}, {slow}, {signal})")
-                code.append(f"plot({var_name}_line, title='MACD Line', color=color.blue, display=display.pane)")
-                code.append(f"plot({var_name}_sig, title='Signal Line', color=color.orange, display=display.pane)")
-                code.append(f"plot({var_name}_hist, title='MACD Histogram', color=color.new(color.gray, 50), style=plot.style_columns, display=display.pane)")
-                code.append(f"{var_name} = {var_name}_line")
-            elif name == "Bollinger Bands":
-                period = params.get("period", 20)
-                std_dev = params.get("std_dev", 2)
-                code.append(f"[{var_name}_upper, {var_name}_basis, {var_name}_lower] = ta.bb({source_var}, {period}, {std_dev})")
-                code.append(f"plot({var_name}_upper, title='BB Upper', color=color.gray)")
-                code.append(f"plot({var_name}_lower, title='BB Lower', color=color.gray)")
-                code.append(f"plot({var_name}_basis, title='BB Basis', color=color.gray)")
-                code.append(f"{var_name} = {var_name}_basis")
-            else:
-                code.append(f"{var_name} = close // Unknown indicator {name}")
-
-        elif nt == "logic":
-            operator = params.get("operator", "<")
-            threshold = params.get("value", 0)
-            
-            var_a = get_source_var(node_id, 'a')
-            var_b = get_source_var(node_id, 'b')
-            
-            # Use connected variable or static threshold
-            operand_a = var_a if var_a else "close"
-            operand_b = var_b if var_b else threshold
-            
-            if operator == "crossunder":
-                code.append(f"{var_name} = ta.crossunder({operand_a}, {operand_b})")
-            elif operator == "crossover":
-                code.append(f"{var_name} = ta.crossover({operand_a}, {operand_b})")
-            else:
-                code.append(f"{var_name} = {operand_a} {operator} {operand_b}")
-
-        elif nt == "action":
-            action_type = params.get("actionType", "buy").lower()
-            condition = get_source_var(node_id, 'default') # Action nodes usually have one input
-            if not condition:
-                condition = get_source_var(node_id, 'a') # Fallback
-            
-            if not condition:
-                code.append(f"// action_{node_id} skipped: no condition connected")
-                continue
+    return compile_strategy_temp(Strategy(**strategy), target, if_none_match)
+
+def request_arrays(data: Optional[OHLCVData], source: Optional[DataSource]):
+    """Bars for a backtest: inline data, or views into the OHLCV store"""
+    if (data is None) == (source is None):
+        raise ValueError("Send either 'data' or 'source'")
+    with stage("load"):
+        if source is not None:
+            return ohlcv_store.load(source.symbol, source.interval, source.start, source.end)
+        return prepare_data(data.dict())
+
+def cached_outputs(source: Optional[DataSource], arrays: Dict[str, Any]):
+    """The shared node output cache, scoped to these bars"""
+    if source is not None:
+        version = ohlcv_store.version(source.symbol, source.interval)
+        return indicator_cache.scope(data_key(arrays, source.symbol, source.interval, version))
+    return indicator_cache.scope(data_key(arrays))
+
+@app.get("/api/data")
+def list_ohlcv_series():
+    """Stored OHLCV series with their bar count and timestamp range"""
+    return ohlcv_store.series()
+
+@app.get("/api/data/{symbol}/{interval}")
+def get_ohlcv_series(symbol: str, interval: str):
+    try:
+        info = ohlcv_store.info(symbol, interval)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if info is None:
+        raise HTTPException(status_code=404, detail="Series not found")
+    return info
+
+@app.post("/api/data/{symbol}/{interval}")
+def append_ohlcv_bars(symbol: str, interval: str, data: OHLCVData):
+    """Append bars (with timestamps) to a stored series; bars already stored are skipped"""
+    try:
+        appended = ohlcv_store.append(symbol, interval, data.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Data error: {str(e)}")
+    return {"appended": appended, **ohlcv_store.info(symbol, interval)}
 
-            if action_type == "buy":
-                # Check both top-level and nested for stopLoss/takeProfit
-                sl_percent = params.get("stopLoss")
-                if sl_percent is None:
-                    sl_percent = params.get("parameters", {}).get("stopLoss", "")
-                
-                tp_percent = params.get("takeProfit")
-                if tp_percent is None:
-                    tp_percent = params.get("parameters", {}).get("takeProfit", "")
-                
-                # Treat empty strings or 0 as disabled
-                is_sl_enabled = sl_percent not in [None, "", "0", 0]
-                is_tp_enabled = tp_percent not in [None, "", "0", 0]
+@app.delete("/api/data/{symbol}/{interval}")
+def delete_ohlcv_series(symbol: str, interval: str):
+    try:
+        deleted = ohlcv_store.delete(symbol, interval)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Series not found")
+    return {"message": "Series deleted"}
+
+@app.post("/api/backtest")
+def submit_backtest(request: BacktestRequest):
+    """Queue a backtest; poll /api/backtest/progress/{job_id} for its phase and result"""
+    strategy_data = request.strategy.dict()
+    try:
+        with stage("validate"):
+            validate_strategy(strategy_data)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Validation error: {str(e)}")
+    if (request.data is None) == (request.source is None):
+        raise HTTPException(status_code=400, detail="Backtest error: Send either 'data' or 'source'")
+
+    def run(report):
+        report("processing")
+        arrays = request_arrays(request.data, request.source)
+        return backtest_arrays(
+            strategy_data,
+            arrays,
+            starting_cash=request.starting_cash,
+            fee_bps=request.fee_bps,
+            slippage_bps=request.slippage_bps,
+            cache=cached_outputs(request.source, arrays),
+            progress=report,
+        )
 
-                try:
-                    sl_val = float(sl_percent) if is_sl_enabled else 0
-                    tp_val = float(tp_percent) if is_tp_enabled else 0
-                except:
-                    sl_val = 0
-                    tp_val = 0
-                
-                trigger_var = f"buy_trigger_{str(node_id).split('-')[-1]}"
-                code.append(f"{trigger_var} = {condition} and can_buy")
-                code.append(f"if {trigger_var}")
-                code.append(f"    strategy.entry('Long', strategy.long)")
-                code.append(f"    positionOpen := true")
-                code.append(f"    entryPrice := close")
-                if has_sl: code.append(f"    stopLossPrice := {f'entryPrice * (1 - {sl_val} / 100)' if sl_val > 0 else 'na'}")
-                if has_tp: code.append(f"    takeProfitPrice := {f'entryPrice * (1 + {tp_val} / 100)' if tp_val > 0 else 'na'}")
-                code.append(f"plotshape({trigger_var}, title='Buy Signal', style=shape.labelup, location=location.belowbar, color=color.new(color.green, 0), size=size.small, text='BUY', textcolor=color.white)")
-            elif action_type == "sell":
-                trigger_var = f"sell_trigger_{str(node_id).split('-')[-1]}"
-                code.append(f"{trigger_var} = {condition} and can_sell")
-                code.append(f"if {trigger_var}")
-                code.append(f"    strategy.close('Long', comment='Sell Signal')")
-                code.append(f"    positionOpen := false")
-                code.append(f"    entryPrice := na")
-                if has_sl: code.append(f"    stopLossPrice := na")
-                if has_tp: code.append(f"    takeProfitPrice := na")
-                code.append(f"plotshape({trigger_var}, title='Sell Signal', style=shape.labeldown, location=location.abovebar, color=color.new(color.red, 0), size=size.small, text='SELL', textcolor=color.white)")
-
-    code.append("")
-    if has_sl or has_tp:
-        code.append("")
-        code.append("// --- Exit Logic (Stop Loss & Take Profit) ---")
-        code.append(f"stopHit = positionOpen and {'not na(stopLossPrice) and close < stopLossPrice' if has_sl else 'false'}")
-        code.append(f"targetHit = positionOpen and {'not na(takeProfitPrice) and close > takeProfitPrice' if has_tp else 'false'}")
-        code.append("exit_trigger = stopHit or targetHit")
-        code.append("if exit_trigger")
-        code.append("    strategy.close('Long', comment = stopHit ? 'Stop Loss Hit' : 'Take Profit Hit')")
-        code.append("    positionOpen := false")
-        code.append("    entryPrice := na")
-        if has_sl: code.append("    stopLossPrice := na")
-        if has_tp: code.append("    takeProfitPrice := na")
-        code.append("")
-        if has_sl:
-            code.append("// Stop-loss exit label")
-            code.append("plotshape(stopHit, title='Stop Exit', style=shape.labeldown, location=location.abovebar, color=color.red, size=size.small, text='STOP', textcolor=color.white)")
-        if has_tp:
-            code.append("// Take-profit exit label")
-            code.append("plotshape(targetHit, title='TP Exit', style=shape.labeldown, location=location.abovebar, color=color.green, size=size.small, text='TP', textcolor=color.white)")
-        code.append("")
-
-    code.append("// --- Plotting Entry/Stop/TP ---")
-    code.append("plot(entryPrice, title='Entry Price', color=color.new(color.green, 0), style=plot.style_linebr)")
-    if has_sl: code.append("plot(stopLossPrice, title='Stop Loss Price', color=color.new(color.red, 0), style=plot.style_linebr)")
-    if has_tp: code.append("plot(takeProfitPrice, title='Take Profit Price', color=color.new(color.lime, 0), style=plot.style_linebr)")
-
-    return "\n".join(code)
-
-
-def compile_to_csharp(strategy: dict) -> str:
-    """Compile to NinjaTrader C#"""
-    return f"""// NinjaTrader C# Strategy
-// Generated for: {strategy.get('name', 'Untitled')}
-// TODO: Implement full C# compilation
-"""
+    try:
+        job = backtest_jobs.submit(run, priority=request.priority)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/api/backtest/progress/{job_id}")
+def backtest_progress(job_id: str):
+    """Status, phase, percent, message and elapsed seconds of a job; the result once completed"""
+    job = backtest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
+
+@app.delete("/api/backtest/jobs/{job_id}")
+def cancel_backtest(job_id: str):
+    job = backtest_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
+
+@app.post("/api/backtest/run")
+def backtest_strategy(request: BacktestRequest):
+    """Backtest a strategy graph locally over the supplied or stored OHLCV bars, waiting for the result"""
+    strategy_data = request.strategy.dict()
+    try:
+        with stage("validate"):
+            validate_strategy(strategy_data)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Validation error: {str(e)}")
 
-def compile_to_mql(strategy: dict) -> str:
-    """Compile to MetaTrader MQL"""
-    return f"""// MetaTrader MQL Strategy  
-// Generated for: {strategy.get('name', 'Untitled')}
-// TODO: Implement full MQL compilation
-"""
+    try:
+        arrays = request_arrays(request.data, request.source)
+        cache = cached_outputs(request.source, arrays)
+        with stage("backtest"):
+            return backtest_arrays(
+                strategy_data,
+                arrays,
+                starting_cash=request.starting_cash,
+                fee_bps=request.fee_bps,
+                slippage_bps=request.slippage_bps,
+                cache=cache,
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Backtest error: {str(e)}")
+
+@app.post("/api/backtest/sweep")
+def sweep_strategy(request: SweepRequest):
+    """Backtest every combination of the requested node parameter values"""
+    strategy_data = request.strategy.dict()
+    try:
+        with stage("validate"):
+            validate_strategy(strategy_data)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Validation error: {str(e)}")
+
+    try:
+        grid = {}
+        for param in request.parameters:
+            grid.setdefault(param.node_id, {})[param.parameter] = expand_values(
+                param.values, param.start, param.stop, param.step
+            )
+        arrays = request_arrays(request.data, request.source)
+        with stage("sweep"):
+            return run_sweep(
+                strategy_data,
+                {},
+                grid,
+                starting_cash=request.starting_cash,
+                fee_bps=request.fee_bps,
+                slippage_bps=request.slippage_bps,
+                sort_by=request.sort_by,
+                top=request.top,
+                arrays=arrays,
+                cache=cached_outputs(request.source, arrays),
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Sweep error: {str(e)}")
+
+@app.post("/api/backtest/walkforward")
+def walk_forward_strategy(request: WalkForwardRequest):
+    """Optimize on rolling or anchored in-sample windows and report the stitched out-of-sample run"""
+    strategy_data = request.strategy.dict()
+    try:
+        with stage("validate"):
+            validate_strategy(strategy_data)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Validation error: {str(e)}")
+
+    try:
+        grid = {}
+        for param in request.parameters:
+            grid.setdefault(param.node_id, {})[param.parameter] = expand_values(
+                param.values, param.start, param.stop, param.step
+            )
+        arrays = request_arrays(request.data, request.source)
+        # Stored bars are mapped by the workers themselves
+        source = {"store": ohlcv_store.root, **request.source.dict()} if request.source is not None else None
+        with stage("walkforward"):
+            return walk_forward(
+                strategy_data,
+                arrays,
+                grid,
+                request.in_sample_bars,
+                request.out_of_sample_bars,
+                anchored=request.anchored,
+                sort_by=request.sort_by,
+                starting_cash=request.starting_cash,
+                fee_bps=request.fee_bps,
+                slippage_bps=request.slippage_bps,
+                source=source,
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Walk-forward error: {str(e)}")
+
+@app.post("/api/backtest/batch")
+def backtest_strategy_batch(request: BatchBacktestRequest):
+    """Backtest a grid over many series on the worker pool, streaming one NDJSON line per shard"""
+    strategy_data = request.strategy.dict()
+    try:
+        with stage("validate"):
+            validate_strategy(strategy_data)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Validation error: {str(e)}")
+
+    try:
+        if bool(request.sources) == (request.data is not None):
+            raise ValueError("Send either 'sources' or 'data'")
+        if request.shard_size is not None and request.shard_size < 1:
+            raise ValueError("shard_size must be at least 1")
+        grid = {}
+        for param in request.parameters:
+            grid.setdefault(param.node_id, {})[param.parameter] = expand_values(
+                param.values, param.start, param.stop, param.step
+            )
+        combos = expand_grid(grid)
+        total = max(len(request.sources), 1) * len(combos)
+        if total > MAX_BACKTESTS:
+            raise ValueError(f"{total} backtests requested, the limit is {MAX_BACKTESTS}")
+        validate_grid(strategy_data, grid)
+        sources = []
+        for source in request.sources:
+            # Fail fast on unknown series; workers map the columns themselves
+            ohlcv_store.load(source.symbol, source.interval, source.start, source.end)
+            sources.append((f"{source.symbol}/{source.interval}", {"store": ohlcv_store.root, **source.dict()}))
+        arrays = prepare_data(request.data.dict()) if request.data is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Batch error: {str(e)}")
+
+    shared = None
+    if arrays is not None:
+        # Copied once; workers map the block instead of unpickling the bars per shard
+        shared = SharedArrays(arrays)
+        sources.append(("data", shared.descriptor))
+    options = {"starting_cash": request.starting_cash, "fee_bps": request.fee_bps,
+               "slippage_bps": request.slippage_bps}
+
+    def stream():
+        try:
+            yield from backtest_batch(strategy_data, sources, combos, sorted(reusable_nodes(strategy_data, grid)),
+                                      options, request.shard_size)
+        finally:
+            if shared is not None:
+                shared.close()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,230 @@
+"""
+Per-request stage timings (Server-Timing) and Prometheus-style aggregate metrics
+"""
+import bisect
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+from typing import List, Dict, Any, Callable, Tuple
+
+from fastapi.routing import APIRoute
+
+ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() not in ("0", "false", "no", "")
+PREFIX = "strategy_builder"
+
+# Seconds; compiles of toy graphs take well under a millisecond
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestTimings:
+    """Stage durations collected while one request is handled"""
+    __slots__ = ("start", "stages", "notes")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []
+        self.notes: List[Tuple[str, str]] = []
+
+    def header(self) -> str:
+        entries = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages]
+        entries += [f'{name};desc="{desc}"' for name, desc in self.notes]
+        entries.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.3f}")
+        return ", ".join(entries)
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("request_timings", default=None)
+
+
+class _Stage:
+    __slots__ = ("timings", "name", "started")
+
+    def __init__(self, timings: RequestTimings, name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timings.stages.append((self.name, time.perf_counter() - self.started))
+        return False
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name: str):
+    """Time a block as a stage of the current request; a shared no-op outside one"""
+    timings = _current.get()
+    if timings is None:
+        return _NO_STAGE
+    return _Stage(timings, name)
+
+
+def note(name: str, desc: str):
+    """Attach a description-only Server-Timing entry (e.g. cache;desc=hit)"""
+    timings = _current.get()
+    if timings is not None:
+        timings.notes.append((name, desc))
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(DURATION_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(DURATION_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+class Registry:
+    """Request counters, duration histograms and gauges read at scrape time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.request_durations: Dict[str, Histogram] = {}
+        self.stage_durations: Dict[str, Histogram] = {}
+        self._collectors: List[Tuple[str, str, str, Callable[[], Any]]] = []
+
+    def register(self, name: str, kind: str, help_text: str, collect: Callable[[], Any]):
+        """Add a gauge/counter whose value (or {labels-tuple: value}) is read on every scrape"""
+        self._collectors.append((name, kind, help_text, collect))
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float,
+                        stages: List[Tuple[str, float]]):
+        with self._lock:
+            key = (method, route, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.request_durations.setdefault(route, Histogram()).observe(seconds)
+            for name, duration in stages:
+                self.stage_durations.setdefault(name, Histogram()).observe(duration)
+
+    def _histogram(self, lines: List[str], name: str, label: str, histograms: Dict[str, Histogram]):
+        for value, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_labels({label: value, 'le': le})} {cumulative}")
+            lines.append(f"{name}_sum{_labels({label: value})} {histogram.total}")
+            lines.append(f"{name}_count{_labels({label: value})} {histogram.count}")
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            lines.append(f"# HELP {PREFIX}_requests_total HTTP requests by route and status")
+            lines.append(f"# TYPE {PREFIX}_requests_total counter")
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f"{PREFIX}_requests_total{_labels({'method': method, 'route': route, 'status': status})} {count}")
+            lines.append(f"# HELP {PREFIX}_request_duration_seconds HTTP request latency")
+            lines.append(f"# TYPE {PREFIX}_request_duration_seconds histogram")
+            self._histogram(lines, f"{PREFIX}_request_duration_seconds", "route", self.request_durations)
+            lines.append(f"# HELP {PREFIX}_stage_duration_seconds Time spent per request stage")
+            lines.append(f"# TYPE {PREFIX}_stage_duration_seconds histogram")
+            self._histogram(lines, f"{PREFIX}_stage_duration_seconds", "stage", self.stage_durations)
+        for name, kind, help_text, collect in self._collectors:
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+            value = collect()
+            if isinstance(value, dict):
+                for labels, v in sorted(value.items()):
+                    lines.append(f"{PREFIX}_{name}{_labels(dict(labels))} {v}")
+            else:
+                lines.append(f"{PREFIX}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    """Collects stage timings per HTTP request and reports them in Server-Timing"""
+
+    def __init__(self, app, registry: Registry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timings.header().encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.registry.observe_request(scope["method"], route, status,
+                                          time.perf_counter() - timings.start, timings.stages)
+
+
+class TimedRoute(APIRoute):
+    """Route whose endpoint records a 'parse' stage: body read, JSON decode and model validation
+
+    FastAPI does that work before calling the endpoint, so the stage runs from
+    the start of the request to the moment the endpoint is entered.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if ENABLED:
+            endpoint = _mark_parse(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _record_parse():
+    timings = _current.get()
+    if timings is not None:
+        timings.stages.append(("parse", time.perf_counter() - timings.start))
+
+
+def _mark_parse(endpoint: Callable) -> Callable:
+    # functools.wraps keeps __wrapped__, so FastAPI still reads the original signature
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            _record_parse()
+            return await endpoint(*args, **kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def timed(*args, **kwargs):
+            _record_parse()
+            return endpoint(*args, **kwargs)
+    return timed
@@ -0,0 +1,342 @@
+"""
+MQL5 (MetaTrader 5 Expert Advisor) code generator
+
+Indicator handles are created once in OnInit and released in OnDeinit.
+OnTick returns straight away unless a new bar has opened; then it copies
+only the closed bars the graph reads (one, or two when a crossover needs
+the previous bar) into preallocated series arrays and evaluates the graph
+on them, with the same canBuy / canSell gating as the Pine output.
+"""
+from typing import List, Dict, Optional
+
+from ir import IRNode, StrategyIR, KIND_INDICATOR, comparison_key
+from ninjascript import identifier, literal, warmup_bars
+
+INDENT = "   "
+
+# Series array of closed-bar closes; [0] is the bar that just closed
+CLOSE_ARRAY = "bar_close"
+
+
+class MqlValue:
+    """How generated MQL reads a slot
+
+    array is a series array filled by CopyBuffer/CopyClose (None for bool
+    logic results, which only exist for the current bar); value reads the
+    bar that just closed. handle is set for indicator outputs, so a
+    downstream indicator can take it as applied_price.
+    """
+    __slots__ = ("array", "value", "boolean", "handle")
+
+    def __init__(self, array: Optional[str], value: str, boolean: bool = False, handle: Optional[str] = None):
+        self.array = array
+        self.value = value
+        self.boolean = boolean
+        self.handle = handle
+
+
+CLOSE = MqlValue(CLOSE_ARRAY, f"{CLOSE_ARRAY}[0]")
+
+
+class MqlNode:
+    """MQL produced for one IR node
+
+    key identifies the computed value for CSE (None if never shared).
+    Indicators have create, the call making value.handle in OnInit, and
+    buffer, the one copied into value.array on each new bar. update runs on
+    each new bar; crosses marks logic that reads the previous bar.
+    """
+    __slots__ = ("key", "value", "create", "buffer", "update", "crosses")
+
+    def __init__(self, key: Optional[str] = None, value: Optional[MqlValue] = None, create: Optional[str] = None,
+                 buffer: int = 0, update: Optional[List[str]] = None, crosses: bool = False):
+        self.key = key
+        self.value = value
+        self.create = create
+        self.buffer = buffer
+        self.update = update or []
+        self.crosses = crosses
+
+
+def as_double(operand: MqlValue) -> str:
+    return f"({operand.value} ? 1.0 : 0.0)" if operand.boolean else operand.value
+
+
+def as_bool(operand: MqlValue) -> str:
+    return operand.value if operand.boolean else f"{operand.value} != 0"
+
+
+# --- MQL emitters, registered per (kind, name) in nodes.py ---
+
+def _indicator(node: IRNode, create: str, buffer: int = 0) -> MqlNode:
+    var = identifier(node.var)
+    return MqlNode(key=f"{create}#{buffer}", value=MqlValue(var, f"{var}[0]", handle=f"{var}_handle"),
+                   create=create, buffer=buffer)
+
+
+def _applied(sources: Dict[str, Optional[MqlValue]]) -> str:
+    """applied_price argument: PRICE_CLOSE, or the upstream indicator's handle (MetaTrader reads its buffer 0)"""
+    return sources["source"].handle or "PRICE_CLOSE"
+
+
+def mql_input(node: IRNode, sources: Dict[str, Optional[MqlValue]], has_sl: bool, has_tp: bool) -> MqlNode:
+    return MqlNode(value=CLOSE)
+
+
+def mql_unknown(node: IRNode, sources: Dict[str, Optional[MqlValue]], has_sl: bool, has_tp: bool) -> MqlNode:
+    return MqlNode(value=CLOSE, update=[f"// {identifier(node.var)}: unknown indicator {node.name}, reads the close"])
+
+
+def mql_rsi(node: IRNode, sources: Dict[str, Optional[MqlValue]], has_sl: bool, has_tp: bool) -> MqlNode:
+    p = node.handler.coerce(node.params)
+    return _indicator(node, f"iRSI(_Symbol, _Period, {p['period']}, {_applied(sources)})")
+
+
+def mql_sma(node: IRNode, sources: Dict[str, Optional[MqlValue]], has_sl: bool, has_tp: bool) -> MqlNode:
+    p = node.handler.coerce(node.params)
+    return _indicator(node, f"iMA(_Symbol, _Period, {p['period']}, 0, MODE_SMA, {_applied(sources)})")
+
+
+def mql_ema(node: IRNode, sources: Dict[str, Optional[MqlValue]], has_sl: bool, has_tp: bool) -> MqlNode:
+    p = node.handler.coerce(node.params)
+    return _indicator(node, f"iMA(_Symbol, _Period, {p['period']}, 0, MODE_EMA, {_applied(sources)})")
+
+
+def mql_macd(node: IRNode, sources: Dict[str, Optional[MqlValue]], has_sl: bool, has_tp: bool) -> MqlNode:
+    # Buffer 0 is the MACD line, which is what the Pine variable holds
+    p = node.handler.coerce(node.params)
+    return _indicator(node, f"iMACD(_Symbol, _Period, {p['fast']}, {p['slow']}, {p['signal']}, {_applied(sources)})")
+
+
+def mql_bollinger(node: IRNode, sources: Dict[str, Optional[MqlValue]], has_sl: bool, has_tp: bool) -> MqlNode:
+    p = node.handler.coerce(node.params)
+    return _indicator(node, f"iBands(_Symbol, _Period, {p['period']}, 0, {literal(p['std_dev'])}, {_applied(sources)})")
+
+
+def mql_stochastic(node: IRNode, sources: Dict[str, Optional[MqlValue]], has_sl: bool, has_tp: bool) -> MqlNode:
+    # Always the chart's high/low/close; slowing 1 leaves %K raw like ta.stoch
+    p = node.handler.coerce(node.params)
+    return _indicator(node, f"iStochastic(_Symbol, _Period, {p['k']}, {p['d']}, 1, MODE_SMA, STO_LOWHIGH)")
+
+
+def mql_atr(node: IRNode, sources: Dict[str, Optional[MqlValue]], has_sl: bool, has_tp: bool) -> MqlNode:
+    # True range always comes from the chart's bars; MetaTrader averages it with an SMA, Pine with Wilder's RMA
+    p = node.handler.coerce(node.params)
+    return _indicator(node, f"iATR(_Symbol, _Period, {p['period']})")
+
+
+def mql_adx(node: IRNode, sources: Dict[str, Optional[MqlValue]], has_sl: bool, has_tp: bool) -> MqlNode:
+    # iADXWilder smooths like ta.dmi; buffer 0 is the ADX line
+    p = node.handler.coerce(node.params)
+    return _indicator(node, f"iADXWilder(_Symbol, _Period, {p['period']})")
+
+
+def _at(operand: Optional[MqlValue], threshold: str, shift: int) -> str:
+    if operand is None:
+        return threshold
+    if operand.array is not None:
+        return f"{operand.array}[{shift}]"
+    return as_double(operand)
+
+
+def mql_logic(node: IRNode, sources: Dict[str, Optional[MqlValue]], has_sl: bool, has_tp: bool) -> MqlNode:
+    var = identifier(node.var)
+    operator = node.param("operator", "<")
+    operand_a, operand_b = sources["a"], sources["b"]
+    threshold = node.handler.coerce(node.params)["value"]
+    crosses = False
+    if operator in ("crossover", "crossunder"):
+        if operand_a.array is None:
+            expression = f"false /* {operator} needs a price series */"
+        else:
+            now, before = (">", "<=") if operator == "crossover" else ("<", ">=")
+            b_now, b_before = _at(operand_b, literal(threshold), 0), _at(operand_b, literal(threshold), 1)
+            expression = f"{operand_a.array}[0] {now} {b_now} && {operand_a.array}[1] {before} {b_before}"
+            crosses = True
+        key = expression
+    elif operator in ("and", "or"):
+        a = as_bool(operand_a)
+        b = ("true" if threshold != 0 else "false") if operand_b is None else as_bool(operand_b)
+        expression = f"{a} {'&&' if operator == 'and' else '||'} {b}"
+        key = comparison_key(operator, a, b)
+    else:
+        a = as_double(operand_a)
+        b = literal(threshold) if operand_b is None else as_double(operand_b)
+        expression = f"{a} {operator} {b}"
+        key = comparison_key(operator, a, b)
+    return MqlNode(key=key, value=MqlValue(None, var, boolean=True), update=[f"bool {var} = {expression};"],
+                   crosses=crosses)
+
+
+def mql_action(node: IRNode, sources: Dict[str, Optional[MqlValue]], has_sl: bool, has_tp: bool) -> MqlNode:
+    condition = sources["condition"]
+    if condition is None:
+        return MqlNode(update=[f"// action_{node.id} skipped: no condition connected"])
+
+    code = []
+    if node.action == "buy":
+        trigger = identifier(f"buy_trigger_{node.suffix}")
+        code.append(f"bool {trigger} = {as_bool(condition)} && canBuy;")
+        code.append(f"if({trigger})")
+        code.append("{")
+        code.append(f"{INDENT}trade.Buy(Lots, _Symbol);")
+        code.append(f"{INDENT}positionOpen = true;")
+        code.append(f"{INDENT}entryPrice = {CLOSE.value};")
+        if has_sl:
+            stop = f"entryPrice * (1 - {literal(node.stop_loss)} / 100)" if node.stop_loss > 0 else "0.0"
+            code.append(f"{INDENT}stopLossPrice = {stop};")
+        if has_tp:
+            target = f"entryPrice * (1 + {literal(node.take_profit)} / 100)" if node.take_profit > 0 else "0.0"
+            code.append(f"{INDENT}takeProfitPrice = {target};")
+        code.append("}")
+    elif node.action == "sell":
+        trigger = identifier(f"sell_trigger_{node.suffix}")
+        code.append(f"bool {trigger} = {as_bool(condition)} && canSell;")
+        code.append(f"if({trigger})")
+        code.append("{")
+        code.append(f"{INDENT}trade.PositionClose(_Symbol);")
+        code.extend(INDENT + line for line in _reset_state(has_sl, has_tp))
+        code.append("}")
+    return MqlNode(update=code)
+
+
+def _reset_state(has_sl: bool, has_tp: bool) -> List[str]:
+    # 0.0 stands in for Pine's na: prices are positive
+    code = ["positionOpen = false;", "entryPrice = 0.0;"]
+    if has_sl: code.append("stopLossPrice = 0.0;")
+    if has_tp: code.append("takeProfitPrice = 0.0;")
+    return code
+
+
+def _exit_logic(has_sl: bool, has_tp: bool) -> List[str]:
+    """Stop-loss / take-profit checks after the actions, as in the Pine footer"""
+    if not (has_sl or has_tp):
+        return []
+    code = ["", "// --- Exit Logic (Stop Loss & Take Profit) ---"]
+    hits = []
+    if has_sl:
+        code.append(f"bool stopHit = positionOpen && stopLossPrice > 0 && {CLOSE.value} < stopLossPrice;")
+        hits.append("stopHit")
+    if has_tp:
+        code.append(f"bool targetHit = positionOpen && takeProfitPrice > 0 && {CLOSE.value} > takeProfitPrice;")
+        hits.append("targetHit")
+    code.append(f"if({' || '.join(hits)})")
+    code.append("{")
+    code.append(f"{INDENT}trade.PositionClose(_Symbol);")
+    code.extend(INDENT + line for line in _reset_state(has_sl, has_tp))
+    code.append("}")
+    return code
+
+
+def _block(lines: List[str], depth: int) -> List[str]:
+    return [INDENT * depth + line if line else "" for line in lines]
+
+
+def emit_mql(ir: StrategyIR) -> str:
+    """Emit a MetaTrader 5 Expert Advisor"""
+    values: List[Optional[MqlValue]] = [None] * len(ir.nodes)
+    indicators: List[MqlNode] = []
+    update: List[str] = []
+    notes: List[str] = []
+    crosses = False
+    # CSE key -> value of the node that computed it first
+    computed: Dict[str, MqlValue] = {}
+
+    for node in ir.nodes:
+        if node.handler is None:
+            continue
+        emitter = node.handler.emitter("mql")
+        if emitter is None:
+            notes.append(f"// {identifier(node.var)}: {node.name} has no MQL5 emitter")
+            continue
+        sources = {}
+        for port, (_, fallback) in node.handler.ports.items():
+            slot = node.inputs.get(port)
+            source = values[slot] if slot is not None else None
+            sources[port] = source if source is not None else (CLOSE if fallback == "close" else None)
+        result = emitter(node, sources, ir.has_sl, ir.has_tp)
+        if result.key is not None:
+            existing = computed.get(result.key)
+            if existing is not None:
+                values[node.slot] = existing
+                (notes if node.kind == KIND_INDICATOR else update).append(
+                    f"// {identifier(node.var)} reuses {existing.array or existing.value}")
+                continue
+            computed[result.key] = result.value
+        values[node.slot] = result.value
+        crosses = crosses or result.crosses
+        if result.create is not None:
+            indicators.append(result)
+        update.extend(result.update)
+    # Arrays are only ever read at [0], or [1] as well for crossovers
+    bars = 2 if crosses else 1
+
+    state = ["bool positionOpen = false;", "double entryPrice = 0.0;"]
+    if ir.has_sl: state.append("double stopLossPrice = 0.0;")
+    if ir.has_tp: state.append("double takeProfitPrice = 0.0;")
+
+    code = ["// Generated by Trading Strategy Builder", f"// Strategy: {ir.name}"]
+    if ir.pruned:
+        shown = ", ".join(ir.pruned[:10]) + (f" and {len(ir.pruned) - 10} more" if len(ir.pruned) > 10 else "")
+        code.append(f"// Pruned {len(ir.pruned)} node(s) that feed no action: {shown}")
+    code += [
+        "#property version \"1.00\"",
+        "#include <Trade\\Trade.mqh>",
+        "",
+        "input double Lots = 0.1;",
+        "",
+        "CTrade trade;",
+        "",
+        "// Closed bars copied on each new bar; [0] is the bar that just closed",
+        f"#define COPY_BARS {bars}",
+        f"#define WARMUP_BARS {warmup_bars(ir)}",
+        f"double {CLOSE_ARRAY}[];",
+        "",
+    ]
+    if indicators:
+        code.append("// --- Indicator handles, created once in OnInit ---")
+        for indicator in indicators:
+            code.append(f"int {indicator.value.handle} = INVALID_HANDLE;")
+            code.append(f"double {indicator.value.array}[];")
+        code.append("")
+    code += ["// --- Strategy State Variables ---"] + state + ["datetime lastBarTime = 0;", ""]
+    code += notes + ([""] if notes else [])
+
+    code += ["int OnInit()", "{"]
+    for indicator in indicators:
+        code += _block([
+            f"{indicator.value.handle} = {indicator.create};",
+            f"if({indicator.value.handle} == INVALID_HANDLE)",
+            f"{INDENT}return INIT_FAILED;",
+            f"ArraySetAsSeries({indicator.value.array}, true);",
+        ], 1)
+    code += _block([f"ArraySetAsSeries({CLOSE_ARRAY}, true);"] + _reset_state(ir.has_sl, ir.has_tp)
+                   + ["lastBarTime = 0;", "return INIT_SUCCEEDED;"], 1)
+    code += ["}", "", "void OnDeinit(const int reason)", "{"]
+    code += _block([f"IndicatorRelease({indicator.value.handle});" for indicator in indicators], 1)
+    code += ["}", "", "void OnTick()", "{"]
+    code += _block([
+        "// Evaluate once per bar, when it opens",
+        "datetime barTime = iTime(_Symbol, _Period, 0);",
+        "if(barTime == lastBarTime)",
+        f"{INDENT}return;",
+        "if(Bars(_Symbol, _Period) <= WARMUP_BARS + COPY_BARS)",
+        f"{INDENT}return;",
+        f"if(CopyClose(_Symbol, _Period, 1, COPY_BARS, {CLOSE_ARRAY}) < COPY_BARS)",
+        f"{INDENT}return;",
+    ], 1)
+    for indicator in indicators:
+        code += _block([
+            f"if(CopyBuffer({indicator.value.handle}, {indicator.buffer}, 1, COPY_BARS, {indicator.value.array}) < COPY_BARS)",
+            f"{INDENT}return;",
+        ], 1)
+    code += _block([
+        # Only marked as seen once every copy succeeded, so a failed read retries on the next tick
+        "lastBarTime = barTime;",
+        "",
+        "// --- Indicator & Logic Calculations ---",
+        "bool canBuy = !positionOpen;",
+        "bool canSell = positionOpen;",
+    ] + update + _exit_logic(ir.has_sl, ir.has_tp), 1)
+    code += ["}", ""]
+    return "\n".join(code)
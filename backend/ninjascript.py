@@ -0,0 +1,348 @@
+"""
+NinjaScript (NinjaTrader 8 C#) code generator
+
+Indicators are instantiated once in State.DataLoaded and read through series
+indexing (rsi_1[0]) in OnBarUpdate, which only declares bool and double
+locals: nothing is allocated per bar. Entry and exit are gated by canBuy /
+canSell taken from positionOpen at the top of the bar, the same mutually
+exclusive state the Pine output keeps.
+"""
+import re
+from typing import List, Dict, Optional
+
+from ir import IRNode, StrategyIR, KIND_INDICATOR, comparison_key
+
+INDENT = "    "
+
+_NON_IDENTIFIER = re.compile(r"\W")
+
+
+class CsValue:
+    """How generated C# reads a slot
+
+    series is an ISeries<double> expression (None for bool logic results);
+    value reads the current bar.
+    """
+    __slots__ = ("series", "value", "boolean")
+
+    def __init__(self, series: Optional[str], value: str, boolean: bool = False):
+        self.series = series
+        self.value = value
+        self.boolean = boolean
+
+
+CLOSE = CsValue("Close", "Close[0]")
+
+
+class CsNode:
+    """C# produced for one IR node
+
+    key identifies the computed value for CSE (None if never shared); fields
+    are class members, init runs once in State.DataLoaded and update runs
+    in OnBarUpdate.
+    """
+    __slots__ = ("key", "value", "fields", "init", "update")
+
+    def __init__(self, key: Optional[str] = None, value: Optional[CsValue] = None, fields: Optional[List[str]] = None,
+                 init: Optional[List[str]] = None, update: Optional[List[str]] = None):
+        self.key = key
+        self.value = value
+        self.fields = fields or []
+        self.init = init or []
+        self.update = update or []
+
+
+def identifier(name: str) -> str:
+    """A valid C# identifier for a Pine-style variable name"""
+    name = _NON_IDENTIFIER.sub("_", name)
+    return f"_{name}" if not name or name[0].isdigit() else name
+
+
+def class_name(strategy_name: str) -> str:
+    words = [word for word in re.split(r"\W+", strategy_name) if word]
+    name = "".join(word[:1].upper() + word[1:] for word in words) or "GeneratedStrategy"
+    return f"Generated{name}" if name[0].isdigit() else name
+
+
+def literal(value) -> str:
+    """C# numeric literal (ints stay ints so they fit int parameters)"""
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+def string_literal(text: str) -> str:
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def as_double(operand: CsValue) -> str:
+    return f"({operand.value} ? 1.0 : 0.0)" if operand.boolean else operand.value
+
+
+def as_bool(operand: CsValue) -> str:
+    return operand.value if operand.boolean else f"{operand.value} != 0"
+
+
+# --- C# emitters, registered per (kind, name) in nodes.py ---
+
+def _indicator(node: IRNode, type_name: str, call: str, plot: str = "") -> CsNode:
+    """Member holding the indicator instance, created once and added to the chart"""
+    var = identifier(node.var)
+    series = f"{var}.{plot}" if plot else var
+    return CsNode(key=f"{call}{plot}", value=CsValue(series, f"{series}[0]"),
+                  fields=[f"private {type_name} {var};"],
+                  init=[f"{var} = {call};", f"AddChartIndicator({var});"])
+
+
+def _source(sources: Dict[str, Optional[CsValue]]) -> str:
+    # Logic results are not series; indicators fed by one read the close like unconnected ones
+    return sources["source"].series or "Close"
+
+
+def cs_input(node: IRNode, sources: Dict[str, Optional[CsValue]], has_sl: bool, has_tp: bool) -> CsNode:
+    return CsNode(value=CLOSE)
+
+
+def cs_unknown(node: IRNode, sources: Dict[str, Optional[CsValue]], has_sl: bool, has_tp: bool) -> CsNode:
+    return CsNode(value=CLOSE, init=[f"// {identifier(node.var)}: unknown indicator {node.name}, reads Close"])
+
+
+def cs_rsi(node: IRNode, sources: Dict[str, Optional[CsValue]], has_sl: bool, has_tp: bool) -> CsNode:
+    p = node.handler.coerce(node.params)
+    return _indicator(node, "RSI", f"RSI({_source(sources)}, {p['period']}, 1)")
+
+
+def cs_sma(node: IRNode, sources: Dict[str, Optional[CsValue]], has_sl: bool, has_tp: bool) -> CsNode:
+    p = node.handler.coerce(node.params)
+    return _indicator(node, "SMA", f"SMA({_source(sources)}, {p['period']})")
+
+
+def cs_ema(node: IRNode, sources: Dict[str, Optional[CsValue]], has_sl: bool, has_tp: bool) -> CsNode:
+    p = node.handler.coerce(node.params)
+    return _indicator(node, "EMA", f"EMA({_source(sources)}, {p['period']})")
+
+
+def cs_macd(node: IRNode, sources: Dict[str, Optional[CsValue]], has_sl: bool, has_tp: bool) -> CsNode:
+    # The default plot is the MACD line, which is what the Pine variable holds
+    p = node.handler.coerce(node.params)
+    return _indicator(node, "MACD", f"MACD({_source(sources)}, {p['fast']}, {p['slow']}, {p['signal']})")
+
+
+def cs_bollinger(node: IRNode, sources: Dict[str, Optional[CsValue]], has_sl: bool, has_tp: bool) -> CsNode:
+    p = node.handler.coerce(node.params)
+    return _indicator(node, "Bollinger", f"Bollinger({_source(sources)}, {literal(p['std_dev'])}, {p['period']})", "Middle")
+
+
+def cs_stochastic(node: IRNode, sources: Dict[str, Optional[CsValue]], has_sl: bool, has_tp: bool) -> CsNode:
+    # NinjaTrader's Stochastics reads the input's own high/low/close; smooth 1 leaves %K raw like ta.stoch
+    p = node.handler.coerce(node.params)
+    return _indicator(node, "Stochastics", f"Stochastics({_source(sources)}, {p['d']}, {p['k']}, 1)", "K")
+
+
+def cs_atr(node: IRNode, sources: Dict[str, Optional[CsValue]], has_sl: bool, has_tp: bool) -> CsNode:
+    # True range always comes from the chart's bars, whatever feeds the node
+    p = node.handler.coerce(node.params)
+    return _indicator(node, "ATR", f"ATR({p['period']})")
+
+
+def cs_adx(node: IRNode, sources: Dict[str, Optional[CsValue]], has_sl: bool, has_tp: bool) -> CsNode:
+    p = node.handler.coerce(node.params)
+    return _indicator(node, "ADX", f"ADX({p['period']})")
+
+
+def cs_logic(node: IRNode, sources: Dict[str, Optional[CsValue]], has_sl: bool, has_tp: bool) -> CsNode:
+    var = identifier(node.var)
+    operator = node.param("operator", "<")
+    operand_a, operand_b = sources["a"], sources["b"]
+    threshold = node.handler.coerce(node.params)["value"]
+    if operator in ("crossover", "crossunder"):
+        function = "CrossAbove" if operator == "crossover" else "CrossBelow"
+        if operand_a.series is None:
+            expression = f"false /* {operator} needs a price series */"
+        else:
+            second = literal(threshold) if operand_b is None else operand_b.series or as_double(operand_b)
+            expression = f"{function}({operand_a.series}, {second}, 1)"
+        key = expression
+    elif operator in ("and", "or"):
+        a = as_bool(operand_a)
+        b = ("true" if threshold != 0 else "false") if operand_b is None else as_bool(operand_b)
+        expression = f"{a} {'&&' if operator == 'and' else '||'} {b}"
+        key = comparison_key(operator, a, b)
+    else:
+        a = as_double(operand_a)
+        b = literal(threshold) if operand_b is None else as_double(operand_b)
+        expression = f"{a} {operator} {b}"
+        key = comparison_key(operator, a, b)
+    return CsNode(key=key, value=CsValue(None, var, boolean=True), update=[f"bool {var} = {expression};"])
+
+
+def cs_action(node: IRNode, sources: Dict[str, Optional[CsValue]], has_sl: bool, has_tp: bool) -> CsNode:
+    condition = sources["condition"]
+    if condition is None:
+        return CsNode(update=[f"// action_{node.id} skipped: no condition connected"])
+
+    code = []
+    if node.action == "buy":
+        trigger = identifier(f"buy_trigger_{node.suffix}")
+        code.append(f"bool {trigger} = {as_bool(condition)} && canBuy;")
+        code.append(f"if ({trigger})")
+        code.append("{")
+        code.append(f"{INDENT}EnterLong(\"Long\");")
+        code.append(f"{INDENT}positionOpen = true;")
+        code.append(f"{INDENT}entryPrice = Close[0];")
+        if has_sl:
+            stop = f"entryPrice * (1 - {literal(node.stop_loss)} / 100)" if node.stop_loss > 0 else "double.NaN"
+            code.append(f"{INDENT}stopLossPrice = {stop};")
+        if has_tp:
+            target = f"entryPrice * (1 + {literal(node.take_profit)} / 100)" if node.take_profit > 0 else "double.NaN"
+            code.append(f"{INDENT}takeProfitPrice = {target};")
+        code.append("}")
+    elif node.action == "sell":
+        trigger = identifier(f"sell_trigger_{node.suffix}")
+        code.append(f"bool {trigger} = {as_bool(condition)} && canSell;")
+        code.append(f"if ({trigger})")
+        code.append("{")
+        code.append(f"{INDENT}ExitLong(\"Sell Signal\", \"Long\");")
+        code.append(f"{INDENT}positionOpen = false;")
+        code.append(f"{INDENT}entryPrice = double.NaN;")
+        if has_sl: code.append(f"{INDENT}stopLossPrice = double.NaN;")
+        if has_tp: code.append(f"{INDENT}takeProfitPrice = double.NaN;")
+        code.append("}")
+    return CsNode(update=code)
+
+
+def _reset_state(has_sl: bool, has_tp: bool) -> List[str]:
+    code = ["positionOpen = false;", "entryPrice = double.NaN;"]
+    if has_sl: code.append("stopLossPrice = double.NaN;")
+    if has_tp: code.append("takeProfitPrice = double.NaN;")
+    return code
+
+
+def _exit_logic(has_sl: bool, has_tp: bool) -> List[str]:
+    """Stop-loss / take-profit checks after the actions, as in the Pine footer"""
+    if not (has_sl or has_tp):
+        return []
+    code = ["", "// --- Exit Logic (Stop Loss & Take Profit) ---"]
+    hits = []
+    if has_sl:
+        code.append("bool stopHit = positionOpen && !double.IsNaN(stopLossPrice) && Close[0] < stopLossPrice;")
+        hits.append("stopHit")
+    if has_tp:
+        code.append("bool targetHit = positionOpen && !double.IsNaN(takeProfitPrice) && Close[0] > takeProfitPrice;")
+        hits.append("targetHit")
+    if has_sl and has_tp:
+        signal = 'stopHit ? "Stop Loss Hit" : "Take Profit Hit"'
+    else:
+        signal = '"Stop Loss Hit"' if has_sl else '"Take Profit Hit"'
+    code.append(f"if ({' || '.join(hits)})")
+    code.append("{")
+    code.append(f"{INDENT}ExitLong({signal}, \"Long\");")
+    code.extend(INDENT + line for line in _reset_state(has_sl, has_tp))
+    code.append("}")
+    return code
+
+
+def warmup_bars(ir: StrategyIR) -> int:
+    """Bars before trading: the longest integer lookback of any indicator"""
+    longest = 0
+    for node in ir.nodes:
+        if node.kind == KIND_INDICATOR and node.handler is not None:
+            for key, value in node.handler.coerce(node.params).items():
+                if node.handler.params[key][0] is int:
+                    longest = max(longest, value)
+    return longest
+
+
+def _block(lines: List[str], depth: int) -> List[str]:
+    return [INDENT * depth + line if line else "" for line in lines]
+
+
+def emit_csharp(ir: StrategyIR) -> str:
+    """Emit a NinjaTrader 8 strategy"""
+    values: List[Optional[CsValue]] = [None] * len(ir.nodes)
+    fields: List[str] = []
+    init: List[str] = []
+    update: List[str] = []
+    # CSE key -> value of the node that computed it first
+    computed: Dict[str, CsValue] = {}
+
+    for node in ir.nodes:
+        if node.handler is None:
+            continue
+        emitter = node.handler.emitter("csharp")
+        if emitter is None:
+            init.append(f"// {identifier(node.var)}: {node.name} has no NinjaScript emitter")
+            continue
+        sources = {}
+        for port, (_, fallback) in node.handler.ports.items():
+            slot = node.inputs.get(port)
+            source = values[slot] if slot is not None else None
+            sources[port] = source if source is not None else (CLOSE if fallback == "close" else None)
+        result = emitter(node, sources, ir.has_sl, ir.has_tp)
+        if result.key is not None:
+            existing = computed.get(result.key)
+            if existing is not None:
+                values[node.slot] = existing
+                (init if node.kind == KIND_INDICATOR else update).append(
+                    f"// {identifier(node.var)} reuses {existing.series or existing.value}")
+                continue
+            computed[result.key] = result.value
+        values[node.slot] = result.value
+        fields.extend(result.fields)
+        init.extend(result.init)
+        update.extend(result.update)
+
+    state = ["private bool positionOpen;", "private double entryPrice;"]
+    if ir.has_sl: state.append("private double stopLossPrice;")
+    if ir.has_tp: state.append("private double takeProfitPrice;")
+
+    code = ["// Generated by Trading Strategy Builder", f"// Strategy: {ir.name}"]
+    if ir.pruned:
+        shown = ", ".join(ir.pruned[:10]) + (f" and {len(ir.pruned) - 10} more" if len(ir.pruned) > 10 else "")
+        code.append(f"// Pruned {len(ir.pruned)} node(s) that feed no action: {shown}")
+    code += [
+        "#region Using declarations",
+        "using System;",
+        "using NinjaTrader.Cbi;",
+        "using NinjaTrader.NinjaScript;",
+        "using NinjaTrader.NinjaScript.Indicators;",
+        "#endregion",
+        "",
+        "namespace NinjaTrader.NinjaScript.Strategies",
+        "{",
+        f"{INDENT}public class {class_name(ir.name)} : Strategy",
+        f"{INDENT}{{",
+    ]
+    if fields:
+        code += _block(["// Indicator instances, created once in State.DataLoaded"] + fields + [""], 2)
+    code += _block(["// --- Strategy State Variables ---"] + state + [""], 2)
+    code += _block([
+        "protected override void OnStateChange()",
+        "{",
+        f"{INDENT}if (State == State.SetDefaults)",
+        f"{INDENT}{{",
+    ], 2)
+    code += _block([
+        f"Name = {string_literal(ir.name)};",
+        "Calculate = Calculate.OnBarClose;",
+        "EntriesPerDirection = 1;",
+        "EntryHandling = EntryHandling.AllEntries;",
+        # Pine keeps positions across sessions
+        "IsExitOnSessionCloseStrategy = false;",
+        f"BarsRequiredToTrade = {warmup_bars(ir)};",
+    ], 4)
+    code += _block([f"{INDENT}}}", f"{INDENT}else if (State == State.DataLoaded)", f"{INDENT}{{"], 2)
+    code += _block(init + _reset_state(ir.has_sl, ir.has_tp), 4)
+    code += _block([f"{INDENT}}}", "}", ""], 2)
+    code += _block([
+        "protected override void OnBarUpdate()",
+        "{",
+        f"{INDENT}if (CurrentBar < BarsRequiredToTrade)",
+        f"{INDENT}{INDENT}return;",
+        "",
+        f"{INDENT}// --- Indicator & Logic Calculations ---",
+        f"{INDENT}bool canBuy = !positionOpen;",
+        f"{INDENT}bool canSell = positionOpen;",
+    ], 2)
+    code += _block(update + _exit_logic(ir.has_sl, ir.has_tp), 3)
+    code += _block(["}"], 2)
+    code += [f"{INDENT}}}", "}", ""]
+    return "\n".join(code)
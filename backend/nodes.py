@@ -0,0 +1,149 @@
+"""
+Registry of node handlers keyed by (kind, name)
+
+A handler declares everything the rest of the backend needs to know about
+one node type: the ports it reads, its parameter schema, how it is emitted
+for each target platform and, optionally, the vectorized kernel the
+backtest evaluates it with. Emitters and kernels are given as
+"module:function" references and imported on first use, so registering the
+catalog is one dict insert per entry and compiling never imports NumPy.
+
+Adding a node type is a register() call from any module; nothing in the
+compiler or the backtest has to change.
+"""
+import importlib
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+KIND_INPUT = "input"
+KIND_INDICATOR = "indicator"
+KIND_LOGIC = "logic"
+KIND_ACTION = "action"
+
+Reference = Union[str, Callable]
+
+
+def _resolve(reference: Reference) -> Callable:
+    if callable(reference):
+        return reference
+    module, _, attribute = reference.partition(":")
+    return getattr(importlib.import_module(module), attribute)
+
+
+class NodeHandler:
+    """How one node type is wired, parameterized, emitted and evaluated
+
+    ports maps each IR port to (connection handle, fallback when
+    unconnected: "close" or None). params maps a parameter to (type,
+    default); types are int or float. emit maps a target to its emitter,
+    called as emitter(node, sources, has_sl, has_tp) with sources holding
+    whatever feeds each port in that target; what it returns is up to the
+    target's code generator. An indicator kernel is kernel(params, source,
+    data) -> series, called with typed params.
+
+    A node whose Pine value is one expression can also register a
+    "pinescript_expression" emitter, emitter(node, sources) -> (CSE key,
+    expression); the Pine generator may then fuse it into its consumer
+    instead of assigning it a variable.
+    """
+    __slots__ = ("kind", "name", "id", "category", "ports", "params", "_emit", "_kernel")
+
+    def __init__(self, kind: str, name: Optional[str], emit: Dict[str, Reference],
+                 ports: Optional[Dict[str, Tuple[str, Optional[str]]]] = None,
+                 params: Optional[Dict[str, Tuple[type, Any]]] = None,
+                 kernel: Optional[Reference] = None, id: Optional[str] = None,
+                 category: Optional[str] = None):
+        self.kind = kind
+        self.name = name
+        self.id = id
+        self.category = category
+        self.ports = ports or {}
+        self.params = params or {}
+        self._emit = dict(emit)
+        self._kernel = kernel
+
+    def emitter(self, target: str) -> Optional[Callable]:
+        reference = self._emit.get(target)
+        if reference is not None and not callable(reference):
+            reference = self._emit[target] = _resolve(reference)
+        return reference
+
+    @property
+    def pine(self) -> Callable:
+        return self.emitter("pinescript")
+
+    @property
+    def kernel(self) -> Optional[Callable]:
+        if self._kernel is not None and not callable(self._kernel):
+            self._kernel = _resolve(self._kernel)
+        return self._kernel
+
+    def defaults(self) -> Dict[str, Any]:
+        return {key: default for key, (_, default) in self.params.items()}
+
+    def coerce(self, params: dict) -> Dict[str, Any]:
+        """Typed parameter values; missing or unparseable ones take the default"""
+        typed = {}
+        for key, (kind, default) in self.params.items():
+            try:
+                typed[key] = kind(float(params.get(key, default)))
+            except (TypeError, ValueError):
+                typed[key] = default
+        return typed
+
+
+# (kind, name) -> handler; name None is the kind's fallback
+_handlers: Dict[Tuple[str, Optional[str]], NodeHandler] = {}
+
+
+def register(handler: NodeHandler) -> NodeHandler:
+    """Add a handler, replacing any registered for the same (kind, name)"""
+    _handlers[(handler.kind, handler.name)] = handler
+    return handler
+
+
+def handler(kind: str, name: Optional[str] = None) -> Optional[NodeHandler]:
+    """Handler for a node, falling back to the kind's catch-all (None if the kind is unknown)"""
+    found = _handlers.get((kind, name))
+    return found if found is not None else _handlers.get((kind, None))
+
+
+def handlers(kind: str) -> List[NodeHandler]:
+    """Named handlers of a kind in registration order (the catalog)"""
+    return [h for (k, name), h in _handlers.items() if k == kind and name is not None]
+
+
+def _builtin(function: str) -> Dict[str, str]:
+    """Emitters of a built-in node: compiler.pine_<function>, ninjascript.cs_<function>, mql5.mql_<function>"""
+    return {"pinescript": f"compiler:pine_{function}", "csharp": f"ninjascript:cs_{function}",
+            "mql": f"mql5:mql_{function}"}
+
+
+SOURCE = {"source": ("default", "close")}
+
+register(NodeHandler(KIND_INPUT, None, _builtin("input")))
+register(NodeHandler(KIND_LOGIC, None, {**_builtin("logic"), "pinescript_expression": "compiler:pine_condition"},
+                     ports={"a": ("a", "close"), "b": ("b", None)},
+                     params={"value": (float, 0)}))
+register(NodeHandler(KIND_ACTION, None, _builtin("action"), ports={"condition": ("default", None)}))
+
+# Unknown indicators compile to `close`
+register(NodeHandler(KIND_INDICATOR, None, _builtin("unknown"), ports=SOURCE, kernel="backtest:close_kernel"))
+register(NodeHandler(KIND_INDICATOR, "RSI", _builtin("rsi"), ports=SOURCE, params={"period": (int, 14)},
+                     kernel="backtest:rsi_kernel", id="rsi", category="momentum"))
+register(NodeHandler(KIND_INDICATOR, "MACD", _builtin("macd"), ports=SOURCE,
+                     params={"fast": (int, 12), "slow": (int, 26), "signal": (int, 9)},
+                     kernel="backtest:macd_kernel", id="macd", category="trend"))
+register(NodeHandler(KIND_INDICATOR, "SMA", _builtin("sma"), ports=SOURCE, params={"period": (int, 20)},
+                     kernel="backtest:sma_kernel", id="sma", category="trend"))
+register(NodeHandler(KIND_INDICATOR, "EMA", _builtin("ema"), ports=SOURCE, params={"period": (int, 20)},
+                     kernel="backtest:ema_kernel", id="ema", category="trend"))
+register(NodeHandler(KIND_INDICATOR, "Bollinger Bands", _builtin("bollinger"), ports=SOURCE,
+                     params={"period": (int, 20), "std_dev": (float, 2)},
+                     kernel="backtest:bollinger_kernel", id="bollinger", category="volatility"))
+register(NodeHandler(KIND_INDICATOR, "Stochastic", _builtin("stochastic"), ports=SOURCE,
+                     params={"k": (int, 14), "d": (int, 3)},
+                     kernel="backtest:stochastic_kernel", id="stochastic", category="momentum"))
+register(NodeHandler(KIND_INDICATOR, "ATR", _builtin("atr"), ports=SOURCE, params={"period": (int, 14)},
+                     kernel="backtest:atr_kernel", id="atr", category="volatility"))
+register(NodeHandler(KIND_INDICATOR, "ADX", _builtin("adx"), ports=SOURCE, params={"period": (int, 14)},
+                     kernel="backtest:adx_kernel", id="adx", category="trend"))
@@ -0,0 +1,201 @@
+"""
+Columnar OHLCV store: one raw typed file per column, opened memory-mapped
+"""
+import os
+import re
+import shutil
+import threading
+import uuid
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+# Column name -> on-disk dtype (little-endian, fixed width, so bar i is at offset i * itemsize)
+COLUMNS = {
+    "timestamp": np.dtype("<i8"),
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+}
+
+_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]*")
+
+
+def _column(data: Dict[str, Any], name: str, dtype) -> Optional[np.ndarray]:
+    values = data.get(name)
+    if values is None or len(values) == 0:
+        return None
+    return np.asarray(values, dtype=dtype)
+
+
+class OHLCVStore:
+    """Bars per (symbol, interval) as contiguous typed columns under root
+
+    Readers get read-only np.memmap columns, so every backtest on the box
+    shares the OS page cache instead of holding a private copy; date-range
+    slices are views found by binary search on the timestamp column. Appends
+    only ever add bytes at the end of each file, so views handed out earlier
+    stay valid. A torn append (some columns longer than others) is ignored by
+    readers, which use the shortest column, and trimmed by the next append.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        # (symbol, interval) -> (bars mapped, columns)
+        self._maps: Dict[Tuple[str, str], Tuple[int, Dict[str, np.ndarray]]] = {}
+
+    def _dir(self, symbol: str, interval: str) -> str:
+        for label, value in (("symbol", symbol), ("interval", interval)):
+            if not _NAME.fullmatch(value):
+                raise ValueError(f"Invalid {label} {value!r}: use letters, digits, '.', '_' or '-'")
+        return os.path.join(self.root, symbol, interval)
+
+    @staticmethod
+    def _length(directory: str) -> int:
+        """Complete bars on disk: the shortest column wins"""
+        length = None
+        for name, dtype in COLUMNS.items():
+            try:
+                bars = os.path.getsize(os.path.join(directory, f"{name}.bin")) // dtype.itemsize
+            except FileNotFoundError:
+                return 0
+            length = bars if length is None else min(length, bars)
+        return length or 0
+
+    def columns(self, symbol: str, interval: str) -> Dict[str, np.ndarray]:
+        """Every bar of a series as read-only mapped columns (empty arrays if there are none)"""
+        directory = self._dir(symbol, interval)
+        length = self._length(directory)
+        key = (symbol, interval)
+        with self._lock:
+            mapped = self._maps.get(key)
+            if mapped is not None and mapped[0] == length:
+                return mapped[1]
+            if length == 0:
+                # mmap cannot map an empty file
+                columns = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+            else:
+                columns = {
+                    name: np.memmap(os.path.join(directory, f"{name}.bin"), dtype=dtype, mode="r", shape=(length,))
+                    for name, dtype in COLUMNS.items()
+                }
+            self._maps[key] = (length, columns)
+            return columns
+
+    def load(self, symbol: str, interval: str, start: Optional[int] = None,
+             end: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Bars with start <= timestamp <= end, as zero-copy views in backtest.prepare_data's layout"""
+        columns = self.columns(symbol, interval)
+        timestamps = columns["timestamp"]
+        lo = 0 if start is None else int(np.searchsorted(timestamps, start, side="left"))
+        hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side="right"))
+        if hi <= lo:
+            raise ValueError(f"No {symbol} {interval} bars between {start} and {end}")
+        return {name: column[lo:hi] for name, column in columns.items()}
+
+    def append(self, symbol: str, interval: str, data: Dict[str, Any]) -> int:
+        """Append bars newer than the last stored one; returns how many were written
+
+        data holds equal-length columns with a strictly increasing 'timestamp'.
+        Bars at or before the last stored timestamp are skipped, so re-sending
+        an overlapping download is harmless. Missing open/high/low fall back to
+        close and missing volume to zero, as in backtest.prepare_data.
+        """
+        timestamps = _column(data, "timestamp", np.int64)
+        close = _column(data, "close", np.float64)
+        if timestamps is None or close is None:
+            raise ValueError("Appending bars requires non-empty 'timestamp' and 'close' columns")
+        if np.any(np.diff(timestamps) <= 0):
+            raise ValueError("Timestamps must be strictly increasing")
+        arrays = {"timestamp": timestamps, "close": close}
+        for name in ("open", "high", "low", "volume"):
+            values = _column(data, name, np.float64)
+            if values is None:
+                values = close if name != "volume" else np.zeros_like(close)
+            arrays[name] = values
+        for name, values in arrays.items():
+            if len(values) != len(timestamps):
+                raise ValueError(f"OHLCV column '{name}' has {len(values)} bars, expected {len(timestamps)}")
+
+        directory = self._dir(symbol, interval)
+        with self._lock:
+            os.makedirs(directory, exist_ok=True)
+            length = self._length(directory)
+            first = 0
+            if length:
+                last = np.memmap(os.path.join(directory, "timestamp.bin"), dtype=COLUMNS["timestamp"],
+                                 mode="r", offset=(length - 1) * COLUMNS["timestamp"].itemsize, shape=(1,))[0]
+                first = int(np.searchsorted(timestamps, last, side="right"))
+            if first == len(timestamps):
+                return 0
+            for name, dtype in COLUMNS.items():
+                path = os.path.join(directory, f"{name}.bin")
+                with open(path, "ab") as f:
+                    # Drop the tail of a torn earlier append before adding bars
+                    f.truncate(length * dtype.itemsize)
+                    f.write(arrays[name][first:].astype(dtype, copy=False).tobytes())
+            return len(timestamps) - first
+
+    def version(self, symbol: str, interval: str) -> str:
+        """Token that changes when a series is deleted and recreated
+
+        Appends keep it: they never change bars already stored, so a range of
+        bars plus this token identifies its content.
+        """
+        path = os.path.join(self._dir(symbol, interval), "version")
+        try:
+            with open(path) as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+        token = uuid.uuid4().hex
+        partial = f"{path}.{token}"
+        with open(partial, "w") as f:
+            f.write(token)
+        try:
+            # Fails if another writer got there first; both then read the winner's token
+            os.link(partial, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(partial)
+        with open(path) as f:
+            return f.read()
+
+    def info(self, symbol: str, interval: str) -> Optional[Dict[str, Any]]:
+        directory = self._dir(symbol, interval)
+        if not os.path.isdir(directory):
+            return None
+        timestamps = self.columns(symbol, interval)["timestamp"]
+        return {
+            "symbol": symbol,
+            "interval": interval,
+            "bars": len(timestamps),
+            "start": int(timestamps[0]) if len(timestamps) else None,
+            "end": int(timestamps[-1]) if len(timestamps) else None,
+        }
+
+    def series(self) -> List[Dict[str, Any]]:
+        """info() of every stored series, by symbol then interval"""
+        result = []
+        for symbol in sorted(os.listdir(self.root)):
+            if not os.path.isdir(os.path.join(self.root, symbol)) or not _NAME.fullmatch(symbol):
+                continue
+            for interval in sorted(os.listdir(os.path.join(self.root, symbol))):
+                if _NAME.fullmatch(interval):
+                    result.append(self.info(symbol, interval))
+        return [entry for entry in result if entry is not None]
+
+    def delete(self, symbol: str, interval: str) -> bool:
+        directory = self._dir(symbol, interval)
+        with self._lock:
+            self._maps.pop((symbol, interval), None)
+            if not os.path.isdir(directory):
+                return False
+            # Existing maps keep working: the files stay alive until they are unmapped
+            shutil.rmtree(directory)
+            return True
@@ -0,0 +1,128 @@
+"""
+Persistent strategy store backed by SQLite in WAL mode
+"""
+import json
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+
+# Fields served straight from indexed columns without decoding the JSON body
+COLUMN_FIELDS = ("id", "name")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS strategies (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    name TEXT,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+class StrategyStore:
+    """Strategies keyed by id with cursor pagination over insertion order
+
+    Each thread gets its own connection; WAL lets readers proceed while a
+    write is in progress, and writes are serialized with a lock so upserts
+    never hit SQLITE_BUSY under concurrent requests.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._write_lock:
+            conn = self._connection()
+            conn.execute(SCHEMA)
+            conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def save(self, strategy: Dict[str, Any]) -> str:
+        """Insert or replace a strategy by id (its position in listings is kept)"""
+        now = time.time()
+        data = json.dumps(strategy, separators=(",", ":"))
+        with self._write_lock:
+            conn = self._connection()
+            conn.execute(
+                """
+                INSERT INTO strategies (id, name, data, created_at, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET name = excluded.name, data = excluded.data, updated_at = excluded.updated_at
+                """,
+                (strategy["id"], strategy.get("name"), data, now, now),
+            )
+            conn.commit()
+        return strategy["id"]
+
+    def get(self, strategy_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute("SELECT data FROM strategies WHERE id = ?", (strategy_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, strategy_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Strategies for the ids that exist, keyed by id"""
+        found = {}
+        conn = self._connection()
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(strategy_ids), 500):
+            chunk = strategy_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for strategy_id, data in conn.execute(f"SELECT id, data FROM strategies WHERE id IN ({placeholders})", chunk):
+                found[strategy_id] = json.loads(data)
+        return found
+
+    def delete(self, strategy_id: str) -> bool:
+        with self._write_lock:
+            conn = self._connection()
+            deleted = conn.execute("DELETE FROM strategies WHERE id = ?", (strategy_id,)).rowcount
+            conn.commit()
+        return deleted > 0
+
+    def list(self, cursor: Optional[str] = None, limit: int = 100,
+             fields: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of strategies after cursor -> (items, next cursor or None)
+
+        The cursor is the last row's sequence number, so every page is an
+        index range scan regardless of how deep into the listing it is.
+        """
+        try:
+            after = int(cursor) if cursor else 0
+        except ValueError:
+            raise ValueError(f"Invalid cursor: {cursor}")
+        columns_only = fields is not None and all(f in COLUMN_FIELDS for f in fields)
+        select = "seq, id, name" if columns_only else "seq, data"
+        rows = self._connection().execute(
+            f"SELECT {select} FROM strategies WHERE seq > ? ORDER BY seq LIMIT ?", (after, limit + 1)
+        ).fetchall()
+        next_cursor = str(rows[limit - 1][0]) if len(rows) > limit else None
+        items = []
+        for row in rows[:limit]:
+            if columns_only:
+                record = {"id": row[1], "name": row[2]}
+            else:
+                record = json.loads(row[1])
+            if fields is not None:
+                record = {f: record.get(f) for f in fields}
+            items.append(record)
+        return items, next_cursor
+
+    def iter_all(self, batch_size: int = 500, fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Every strategy in save order, read a page at a time"""
+        cursor = None
+        while True:
+            items, cursor = self.list(cursor, batch_size, fields)
+            yield from items
+            if cursor is None:
+                return
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM strategies").fetchone()[0]
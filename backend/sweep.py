@@ -0,0 +1,157 @@
+"""
+Parameter sweeps (grid search) over strategy graph node parameters
+"""
+import itertools
+import math
+from collections.abc import MutableMapping
+from typing import Iterator, List, Dict, Any, Optional, Set
+
+import numpy as np
+
+from backtest import prepare_data, backtest_arrays
+from graph import topological_sort, build_input_map
+from validation import validate_strategy
+
+MAX_COMBINATIONS = 100000
+
+# Metrics where smaller is better
+ASCENDING_METRICS = {"max_drawdown_pct"}
+
+
+def expand_values(values: Optional[List[Any]] = None, start: Optional[float] = None,
+                  stop: Optional[float] = None, step: Optional[float] = None) -> List[Any]:
+    """Explicit values, or an inclusive start/stop/step range (integers stay integers)"""
+    if values:
+        return list(values)
+    if start is None or stop is None:
+        raise ValueError("Sweep parameters need either 'values' or 'start' and 'stop'")
+    step = step or 1
+    if step <= 0 or stop < start:
+        raise ValueError("Sweep range needs start <= stop and a positive step")
+    count = int(math.floor((stop - start) / step + 1e-9)) + 1
+    if all(float(v).is_integer() for v in (start, stop, step)):
+        return [int(start + i * step) for i in range(count)]
+    return [round(start + i * step, 10) for i in range(count)]
+
+
+def apply_overrides(strategy: dict, overrides: Dict[str, Dict[str, Any]]) -> dict:
+    """Copy of the strategy with parameters replaced on the overridden nodes only"""
+    nodes = []
+    for node in strategy.get("nodes", []):
+        if node["id"] in overrides:
+            node = {**node, "parameters": {**node.get("parameters", {}), **overrides[node["id"]]}}
+        nodes.append(node)
+    return {**strategy, "nodes": nodes}
+
+
+def validate_grid(strategy: dict, grid: Dict[str, Dict[str, List[Any]]]):
+    """Raise StrategyValidationError if any swept value makes the strategy invalid
+
+    Parameter rules only look at one parameter at a time, so checking each
+    value on its own covers every combination of the grid.
+    """
+    for node_id, params in grid.items():
+        for param, values in params.items():
+            for value in values:
+                validate_strategy(apply_overrides(strategy, {node_id: {param: value}}))
+
+
+def reusable_nodes(strategy: dict, grid: Dict[str, Dict[str, List[Any]]]) -> Set[str]:
+    """Nodes whose output repeats across combinations and is worth caching
+
+    A node's output only depends on the swept parameters of itself and its
+    ancestors. When those span fewer values than the full grid, several
+    combinations share the same output; otherwise (e.g. a crossover of two
+    swept EMAs) every combination is unique and caching would only hold memory.
+    """
+    total = math.prod(len(values) for params in grid.values() for values in params.values())
+    input_map = build_input_map(strategy.get("connections", []))
+    swept = {}
+    reusable = set()
+    for node in topological_sort(strategy.get("nodes", []), strategy.get("connections", [])):
+        node_id = node["id"]
+        keys = {(node_id, param) for param in grid.get(node_id, {})}
+        for source_id in input_map.get(node_id, {}).values():
+            keys |= swept.get(source_id, set())
+        swept[node_id] = keys
+        if math.prod(len(grid[n][p]) for n, p in keys) < total:
+            reusable.add(node_id)
+    return reusable
+
+
+class _StoreLog(MutableMapping):
+    """A node-output cache that remembers which signatures were stored through it"""
+
+    def __init__(self, cache: MutableMapping):
+        self.cache = cache
+        self.stored: Set[str] = set()
+
+    def get(self, signature: str, default=None):
+        return self.cache.get(signature, default)
+
+    def __getitem__(self, signature: str) -> np.ndarray:
+        return self.cache[signature]
+
+    def __setitem__(self, signature: str, value: np.ndarray):
+        self.cache[signature] = value
+        self.stored.add(signature)
+
+    def __delitem__(self, signature: str):
+        del self.cache[signature]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.cache)
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+
+def run_sweep(strategy: dict, data: Dict[str, Any], grid: Dict[str, Dict[str, List[Any]]],
+              starting_cash: float = 10000.0, fee_bps: float = 0.0, slippage_bps: float = 0.0,
+              sort_by: str = "total_return_pct", top: Optional[int] = None,
+              arrays: Optional[Dict[str, np.ndarray]] = None,
+              cache: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, Any]:
+    """Backtest every combination of the grid {node_id: {parameter: [values]}}
+
+    Node outputs are cached by signature for the duration of the sweep, so a
+    node is recomputed only when a swept parameter on it or upstream of it
+    changes: a 50x50 grid over two EMA periods runs 100 EMAs, not 2,500.
+    cached_series in the result counts the series this sweep stored, not
+    what a shared cache already held.
+    """
+    node_ids = {node["id"] for node in strategy.get("nodes", [])}
+    unknown = [node_id for node_id in grid if node_id not in node_ids]
+    if unknown:
+        raise ValueError(f"Sweep references unknown nodes: {', '.join(unknown)}")
+    axes = [(node_id, param, values) for node_id, params in grid.items() for param, values in params.items()]
+    if any(not values for _, _, values in axes):
+        raise ValueError("Every swept parameter needs at least one value")
+    combinations = math.prod(len(values) for _, _, values in axes)
+    if combinations > MAX_COMBINATIONS:
+        raise ValueError(f"Sweep has {combinations} combinations, the limit is {MAX_COMBINATIONS}")
+    validate_grid(strategy, grid)
+
+    if arrays is None:
+        arrays = prepare_data(data)
+    cache = _StoreLog({} if cache is None else cache)
+    reusable = reusable_nodes(strategy, grid)
+
+    results = []
+    for combo in itertools.product(*(values for _, _, values in axes)):
+        overrides = {}
+        for (node_id, param, _), value in zip(axes, combo):
+            overrides.setdefault(node_id, {})[param] = value
+        result = backtest_arrays(
+            apply_overrides(strategy, overrides), arrays, starting_cash, fee_bps, slippage_bps,
+            cache=cache, cacheable=reusable, include_details=False,
+        )
+        results.append({"parameters": overrides, "metrics": result["metrics"]})
+
+    if results and sort_by not in results[0]["metrics"]:
+        raise ValueError(f"Unknown metric to sort by: {sort_by}")
+    results.sort(key=lambda r: r["metrics"][sort_by], reverse=sort_by not in ASCENDING_METRICS)
+    return {
+        "combinations": combinations,
+        "cached_series": len(cache.stored),
+        "results": results[:top] if top else results,
+    }
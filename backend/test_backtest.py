@@ -0,0 +1,291 @@
+"""
+Local backtest engine tests
+
+Usage:
+    python -m pytest test_backtest.py -v
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import indicators as ta
+from backtest import (
+    EXIT_NONE, EXIT_SELL, EXIT_STOP, EXIT_TARGET,
+    evaluate_strategy, build_signals, resolve_positions, run_backtest, prepare_data,
+)
+from main import app
+
+
+# ─── Sample Data ──────────────────────────────────────────────────────────────
+
+def random_walk(n: int = 500, seed: int = 7) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return 100.0 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+
+
+EMA_FLIP = {
+    "name": "Moving Average Flip",
+    "nodes": [
+        {"id": "ema-12", "type": "indicator", "name": "EMA", "parameters": {"period": 12}, "position": {"x": 0, "y": 0}},
+        {"id": "ema-26", "type": "indicator", "name": "EMA", "parameters": {"period": 26}, "position": {"x": 0, "y": 0}},
+        {"id": "logic-buy", "type": "logic", "name": "Logic", "parameters": {"operator": "crossover"}, "position": {"x": 0, "y": 0}},
+        {"id": "logic-sell", "type": "logic", "name": "Logic", "parameters": {"operator": "crossunder"}, "position": {"x": 0, "y": 0}},
+        {"id": "action-buy", "type": "action", "name": "Action buy", "parameters": {"actionType": "buy", "stopLoss": 2, "takeProfit": 4}, "position": {"x": 0, "y": 0}},
+        {"id": "action-sell", "type": "action", "name": "Action sell", "parameters": {"actionType": "sell"}, "position": {"x": 0, "y": 0}},
+    ],
+    "connections": [
+        {"source": "ema-12", "target": "logic-buy", "targetHandle": "a"},
+        {"source": "ema-26", "target": "logic-buy", "targetHandle": "b"},
+        {"source": "ema-12", "target": "logic-sell", "targetHandle": "a"},
+        {"source": "ema-26", "target": "logic-sell", "targetHandle": "b"},
+        {"source": "logic-buy", "target": "action-buy", "targetHandle": "default"},
+        {"source": "logic-sell", "target": "action-sell", "targetHandle": "default"},
+    ],
+}
+
+
+def reference_positions(close, buy, sell, stop_pct, target_pct):
+    """Bar-by-bar transcription of the generated Pine state machine."""
+    n = len(close)
+    position = np.zeros(n, dtype=np.int8)
+    entry_price = np.full(n, np.nan)
+    exit_reason = np.zeros(n, dtype=np.int8)
+    position_open = False
+    entry = stop = target = np.nan
+    for t in range(n):
+        can_buy = not position_open
+        can_sell = position_open
+        if buy[t] and can_buy:
+            position_open = True
+            entry = close[t]
+            stop = entry * (1 - stop_pct[t] / 100) if stop_pct[t] > 0 else np.nan
+            target = entry * (1 + target_pct[t] / 100) if target_pct[t] > 0 else np.nan
+        if sell[t] and can_sell:
+            position_open = False
+            exit_reason[t] = EXIT_SELL
+        stop_hit = position_open and not np.isnan(stop) and close[t] < stop
+        target_hit = position_open and not np.isnan(target) and close[t] > target
+        if stop_hit or target_hit:
+            position_open = False
+            exit_reason[t] = EXIT_STOP if stop_hit else EXIT_TARGET
+        if position_open:
+            position[t] = 1
+            entry_price[t] = entry
+    return position, entry_price, exit_reason
+
+
+def reference_ema(src: np.ndarray, length: int) -> np.ndarray:
+    alpha = 2.0 / (length + 1)
+    out = np.full(len(src), np.nan)
+    out[length - 1] = src[:length].mean()
+    for t in range(length, len(src)):
+        out[t] = alpha * src[t] + (1 - alpha) * out[t - 1]
+    return out
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. KERNELS
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestKernels:
+    """Vectorized kernels against straightforward per-bar loops."""
+
+    def test_ema_matches_recursion(self):
+        """ta.ema is seeded with the SMA of the first window, then recursive."""
+        close = random_walk(5000)
+        np.testing.assert_allclose(ta.ema(close, 20), reference_ema(close, 20), rtol=1e-10, equal_nan=True)
+
+    def test_ema_short_period_spans_many_blocks(self):
+        """Tiny periods force many closed-form blocks without losing precision."""
+        close = random_walk(3000)
+        np.testing.assert_allclose(ta.ema(close, 2), reference_ema(close, 2), rtol=1e-10, equal_nan=True)
+
+    def test_sma_warmup_is_nan(self):
+        """The first length - 1 bars are na."""
+        out = ta.sma(np.arange(10, dtype=float), 4)
+        assert np.isnan(out[:3]).all()
+        np.testing.assert_allclose(out[3:], np.arange(1.5, 8.5))
+
+    def test_chained_source_delays_seed(self):
+        """An EMA of an indicator starts after the upstream warmup."""
+        close = random_walk(200)
+        out = ta.ema(ta.sma(close, 10), 5)
+        assert np.isnan(out[:13]).all()
+        assert not np.isnan(out[13:]).any()
+
+    def test_crossover(self):
+        """Crossover only fires on the bar a moves above b."""
+        a = np.array([1.0, 2.0, 3.0, 2.0, 4.0])
+        out = ta.crossover(a, np.full(5, 2.5))
+        assert out.tolist() == [False, False, True, False, True]
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. GRAPH EVALUATION
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestGraphEvaluation:
+    """evaluate_strategy follows the compiler's routing rules."""
+
+    def test_ema_flip_nodes(self):
+        """Indicators and logic nodes evaluate to whole-array series."""
+        data = prepare_data({"close": random_walk()})
+        outputs = evaluate_strategy(EMA_FLIP, data)
+        fast = ta.ema(data["close"], 12)
+        slow = ta.ema(data["close"], 26)
+        np.testing.assert_array_equal(outputs["ema-12"], fast)
+        np.testing.assert_array_equal(outputs["logic-buy"], ta.crossover(fast, slow))
+        np.testing.assert_array_equal(outputs["action-sell"], ta.crossunder(fast, slow))
+
+    def test_static_threshold_and_default_handle(self):
+        """A logic node without 'b' compares against its value; 'default' falls back to 'a'."""
+        strategy = {
+            "nodes": [
+                {"id": "rsi-1", "type": "indicatorNode", "name": "RSI", "parameters": {"period": "14"}},
+                {"id": "logic-1", "type": "logicNode", "name": "RSI < 30", "parameters": {"operator": "<", "value": "30"}},
+            ],
+            "connections": [{"source": "rsi-1", "target": "logic-1", "targetHandle": "default"}],
+        }
+        data = prepare_data({"close": random_walk()})
+        outputs = evaluate_strategy(strategy, data)
+        with np.errstate(invalid="ignore"):
+            expected = ta.rsi(data["close"], 14) < 30
+        np.testing.assert_array_equal(outputs["logic-1"], expected)
+
+    def test_input_node_routes_close(self):
+        """Strategy Start feeds close into downstream indicators."""
+        strategy = {
+            "nodes": [
+                {"id": "start", "type": "input", "name": "Strategy Start"},
+                {"id": "sma-1", "type": "indicator", "name": "SMA", "parameters": {"period": 5}},
+            ],
+            "connections": [{"source": "start", "target": "sma-1", "targetHandle": "a"}],
+        }
+        data = prepare_data({"close": random_walk(50)})
+        np.testing.assert_array_equal(evaluate_strategy(strategy, data)["sma-1"], ta.sma(data["close"], 5))
+
+    def test_mismatched_columns_rejected(self):
+        """Columns must all have the same number of bars."""
+        with pytest.raises(ValueError):
+            prepare_data({"close": [1.0, 2.0], "high": [1.0]})
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 3. POSITIONS & RESULTS
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestPositions:
+    """can_buy / can_sell and SL/TP exits."""
+
+    def test_sell_then_stop_then_target(self):
+        """Each exit path closes the position on its own bar."""
+        close = np.array([100, 101, 102, 103, 100, 97, 98, 99, 104, 105], dtype=float)
+        buy = np.array([1, 1, 0, 0, 0, 1, 0, 0, 0, 0], dtype=bool)
+        sell = np.array([0, 0, 1, 1, 0, 0, 0, 0, 0, 0], dtype=bool)
+        buy[3] = True
+        stop = np.full(10, 2.0)
+        target = np.full(10, 5.0)
+        position, entry, reason = resolve_positions(close, buy, sell, stop, target)
+        assert position.tolist() == [1, 1, 0, 1, 0, 1, 1, 1, 0, 0]
+        assert reason.tolist() == [EXIT_NONE, EXIT_NONE, EXIT_SELL, EXIT_NONE, EXIT_STOP,
+                                   EXIT_NONE, EXIT_NONE, EXIT_NONE, EXIT_TARGET, EXIT_NONE]
+        assert entry[3] == 103
+        assert np.isnan(entry[4])
+        assert entry[7] == 97
+
+    def test_take_profit(self):
+        """Close above entry * (1 + tp) exits with the target reason."""
+        close = np.array([100, 103, 106], dtype=float)
+        buy = np.array([1, 0, 0], dtype=bool)
+        position, _, reason = resolve_positions(close, buy, np.zeros(3, bool), np.zeros(3), np.full(3, 5.0))
+        assert reason[2] == EXIT_TARGET
+        assert position.tolist() == [1, 1, 0]
+
+    def test_last_buy_action_sets_risk(self):
+        """When two buy actions fire together the later one's stop applies."""
+        strategy = {
+            "nodes": [
+                {"id": "a-1", "type": "action", "parameters": {"actionType": "buy", "stopLoss": 1}},
+                {"id": "a-2", "type": "action", "parameters": {"actionType": "buy", "stopLoss": 3}},
+            ],
+            "connections": [],
+        }
+        cond = np.array([True, False])
+        signals = build_signals(strategy, {"a-1": cond, "a-2": cond}, 2)
+        assert signals["stop_pct"].tolist() == [3.0, 0.0]
+
+
+class TestPositionEquivalence:
+    """The event-compressed resolver matches the bar-by-bar reference loop."""
+
+    @pytest.mark.parametrize("seed", range(20))
+    @pytest.mark.parametrize("density", [0.01, 0.1, 0.5])
+    def test_random_signals(self, seed, density):
+        """Random triggers, stops and targets resolve identically."""
+        rng = np.random.default_rng(seed)
+        n = 3000
+        close = random_walk(n, seed)
+        buy = rng.random(n) < density
+        sell = rng.random(n) < density / 3
+        stop = np.where(rng.random(n) < 0.5, rng.choice([0.5, 1.0, 3.0], n), 0.0)
+        target = np.where(rng.random(n) < 0.5, rng.choice([0.5, 2.0, 5.0], n), 0.0)
+        expected = reference_positions(close, buy, sell, stop, target)
+        actual = resolve_positions(close, buy, sell, stop, target)
+        for exp, act in zip(expected, actual):
+            np.testing.assert_array_equal(act, exp)
+
+    def test_no_signals(self):
+        """Without triggers the position stays flat."""
+        close = random_walk(100)
+        zeros = np.zeros(100)
+        position, entry, reason = resolve_positions(close, zeros.astype(bool), zeros.astype(bool), zeros, zeros)
+        assert not position.any() and not reason.any()
+        assert np.isnan(entry).all()
+
+    def test_position_left_open(self):
+        """A trade with no exit stays open through the last bar."""
+        close = np.linspace(100, 101, 500)
+        buy = np.zeros(500, dtype=bool)
+        buy[10] = True
+        position, entry, reason = resolve_positions(close, buy, np.zeros(500, bool), np.zeros(500), np.zeros(500))
+        assert position[10:].all() and not position[:10].any()
+        assert (entry[10:] == close[10]).all()
+        assert not reason.any()
+
+    def test_ema_flip_backtest_matches_reference(self):
+        """End to end: graph signals through both resolvers agree."""
+        data = prepare_data({"close": random_walk(5000, 3)})
+        outputs = evaluate_strategy(EMA_FLIP, data)
+        signals = build_signals(EMA_FLIP, outputs, 5000)
+        args = (data["close"], signals["buy"], signals["sell"], signals["stop_pct"], signals["target_pct"])
+        for exp, act in zip(reference_positions(*args), resolve_positions(*args)):
+            np.testing.assert_array_equal(act, exp)
+
+
+class TestBacktestEndpoint:
+    """POST /api/backtest/run runs the engine in-process."""
+
+    def test_backtest_ema_flip(self):
+        """The endpoint returns metrics, trades and an equity curve."""
+        close = random_walk(400).tolist()
+        client = TestClient(app)
+        r = client.post("/api/backtest/run", json={"strategy": EMA_FLIP, "data": {"close": close}, "fee_bps": 5})
+        assert r.status_code == 200
+        data = r.json()
+        assert len(data["equity"]) == 400
+        assert data["metrics"]["num_trades"] == len(data["trades"])
+        assert data["metrics"]["num_trades"] > 0
+        direct = run_backtest(EMA_FLIP, {"close": close}, fee_bps=5)
+        assert data["metrics"]["final_equity"] == pytest.approx(direct["metrics"]["final_equity"])
+
+    def test_backtest_requires_close(self):
+        """Missing price data is a 400, not a crash."""
+        client = TestClient(app)
+        r = client.post("/api/backtest/run", json={"strategy": EMA_FLIP, "data": {"close": []}})
+        assert r.status_code == 400
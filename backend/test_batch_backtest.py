@@ -0,0 +1,173 @@
+"""
+Sharded batch backtest tests
+
+Usage:
+    python -m pytest test_batch_backtest.py -v
+"""
+
+from __future__ import annotations
+
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import batch_backtest
+import main
+from backtest import backtest_arrays, prepare_data
+from batch_backtest import SharedArrays, expand_grid, plan_shards, run_shard
+from ohlcv_store import OHLCVStore
+from sweep import apply_overrides
+from test_backtest import EMA_FLIP
+from test_ohlcv_store import bars
+
+GRID_PARAMETERS = [
+    {"node_id": "ema-12", "parameter": "period", "values": [8, 12, 16]},
+    {"node_id": "ema-26", "parameter": "period", "values": [20, 26]},
+]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def pool():
+    yield
+    batch_backtest.shutdown_pool()
+
+
+def read_lines(response) -> list:
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. PLANNING AND SHARED DATA
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestSharding:
+    """Shards cover every (source, combination) exactly once."""
+
+    @pytest.mark.parametrize("sources, combinations, workers, shard_size", [
+        (1, 100, 4, None), (10, 7, 4, None), (3, 10, 1, 4), (1, 1, 8, None),
+    ])
+    def test_plan_covers_every_backtest(self, sources, combinations, workers, shard_size):
+        plan = plan_shards(sources, combinations, workers, shard_size)
+        covered = [(s, c) for s, start, end in plan for c in range(start, end)]
+        assert sorted(covered) == [(s, c) for s in range(sources) for c in range(combinations)]
+
+    def test_single_source_is_split_for_every_worker(self):
+        assert len(plan_shards(1, 1000, 4)) == 4 * batch_backtest.SHARDS_PER_WORKER
+
+    def test_expand_grid(self):
+        assert expand_grid({}) == [{}]
+        combos = expand_grid({"a": {"period": [1, 2]}, "b": {"period": [3], "value": [4, 5]}})
+        assert len(combos) == 4
+        assert combos[0] == {"a": {"period": 1}, "b": {"period": 3, "value": 4}}
+        with pytest.raises(ValueError):
+            expand_grid({"a": {"period": []}})
+
+    def test_shared_arrays_round_trip(self):
+        arrays = prepare_data(bars(0, 50))
+        shared = SharedArrays(arrays)
+        try:
+            shm, attached = batch_backtest.attach_source(shared.descriptor)
+            for name, values in arrays.items():
+                np.testing.assert_array_equal(attached[name], values)
+                assert attached[name].dtype == values.dtype
+                assert not attached[name].flags.writeable
+            attached = None
+            shm.close()
+        finally:
+            shared.close()
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. SHARDS
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestRunShard:
+    """A shard returns what backtest_arrays returns for each combination."""
+
+    def test_results_match_single_backtests(self):
+        arrays = prepare_data(bars(0, 400))
+        combos = expand_grid({"ema-12": {"period": [8, 12]}, "ema-26": {"period": [20, 26]}})
+        shared = SharedArrays(arrays)
+        try:
+            result = run_shard(3, "data", EMA_FLIP, shared.descriptor, combos, [], {"fee_bps": 5.0})
+        finally:
+            shared.close()
+        assert result["shard"] == 3 and "error" not in result
+        for combo, row in zip(combos, result["results"]):
+            expected = backtest_arrays(apply_overrides(EMA_FLIP, combo), arrays, fee_bps=5.0)
+            assert row == {"parameters": combo, "metrics": expected["metrics"]}
+
+    def test_errors_stay_in_their_shard(self, tmp_path):
+        source = {"store": str(tmp_path), "symbol": "NOPE", "interval": "1m"}
+        result = run_shard(0, "NOPE/1m", EMA_FLIP, source, [{}], [], {})
+        assert result["error"].startswith("ValueError")
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 3. ENDPOINT
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestBatchEndpoint:
+    """POST /api/backtest/batch streams shard results and a summary."""
+
+    @pytest.fixture
+    def client(self, monkeypatch, tmp_path):
+        store = OHLCVStore(str(tmp_path / "batch"))
+        store.append("BTC", "1m", bars(0, 300, seed=1))
+        store.append("ETH", "1m", bars(0, 300, seed=2))
+        monkeypatch.setattr(main, "ohlcv_store", store)
+        return TestClient(main.app)
+
+    def test_store_sources(self, client):
+        r = client.post("/api/backtest/batch", json={
+            "strategy": EMA_FLIP, "parameters": GRID_PARAMETERS, "shard_size": 4,
+            "sources": [{"symbol": "BTC", "interval": "1m"}, {"symbol": "ETH", "interval": "1m", "start": 60 * 50}],
+        })
+        assert r.status_code == 200
+        lines = read_lines(r)
+        summary = lines[-1]
+        assert summary["done"] and summary["failed"] == 0
+        assert summary["backtests"] == 12 and summary["shards"] == 4 == len(lines) - 1
+
+        results = {}
+        for line in lines[:-1]:
+            results.setdefault(line["source"], []).extend(line["results"])
+        assert sorted(results) == ["BTC/1m", "ETH/1m"]
+        eth = main.ohlcv_store.load("ETH", "1m", start=60 * 50)
+        for row in results["ETH/1m"]:
+            expected = backtest_arrays(apply_overrides(EMA_FLIP, row["parameters"]), eth)
+            assert row["metrics"] == expected["metrics"]
+
+    def test_inline_data(self, client):
+        data = bars(0, 300)
+        r = client.post("/api/backtest/batch", json={"strategy": EMA_FLIP, "data": data, "parameters": GRID_PARAMETERS})
+        assert r.status_code == 200
+        lines = read_lines(r)
+        rows = [row for line in lines[:-1] for row in line["results"]]
+        assert len(rows) == 6 and lines[-1]["failed"] == 0
+        sweep = client.post("/api/backtest/sweep", json={"strategy": EMA_FLIP, "data": data, "parameters": GRID_PARAMETERS,
+                                                         "top": None}).json()
+        key = lambda row: json.dumps(row["parameters"], sort_keys=True)
+        assert sorted(rows, key=key) == sorted(sweep["results"], key=key)
+
+    def test_errors(self, client, monkeypatch):
+        r = client.post("/api/backtest/batch", json={"strategy": EMA_FLIP})
+        assert r.status_code == 400 and "either" in r.json()["detail"]
+        r = client.post("/api/backtest/batch", json={"strategy": EMA_FLIP, "sources": [{"symbol": "NOPE", "interval": "1m"}]})
+        assert r.status_code == 400
+        monkeypatch.setattr(main, "MAX_BACKTESTS", 5)
+        r = client.post("/api/backtest/batch", json={"strategy": EMA_FLIP, "data": bars(0, 50), "parameters": GRID_PARAMETERS})
+        assert r.status_code == 400 and "limit" in r.json()["detail"]
+
+    def test_invalid_values(self, client):
+        for bad in [0, -1, "abc", 2.5, None]:
+            r = client.post("/api/backtest/batch", json={
+                "strategy": EMA_FLIP, "data": bars(0, 50),
+                "parameters": [{"node_id": "ema-12", "parameter": "period", "values": [5, bad]}],
+            })
+            assert r.status_code == 400 and r.json()["detail"].startswith("Batch error")
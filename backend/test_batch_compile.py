@@ -0,0 +1,95 @@
+"""
+Batch compile endpoint tests
+
+Usage:
+    python -m pytest test_batch_compile.py -v
+"""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import batch_compile
+import main
+from compiler import compile_to_pinescript, compile_to_mql
+from store import StrategyStore
+
+
+# ─── Sample Data ──────────────────────────────────────────────────────────────
+
+def ema_strategy(fast: int, slow: int) -> dict:
+    return {
+        "name": f"EMA {fast}/{slow}",
+        "nodes": [
+            {"id": "ema-fast", "type": "indicator", "name": "EMA", "parameters": {"period": fast}, "position": {"x": 0, "y": 0}},
+            {"id": "ema-slow", "type": "indicator", "name": "EMA", "parameters": {"period": slow}, "position": {"x": 0, "y": 0}},
+            {"id": "logic-1", "type": "logic", "name": "Cross", "parameters": {"operator": "crossover"}, "position": {"x": 0, "y": 0}},
+            {"id": "buy-1", "type": "action", "name": "Buy", "parameters": {"actionType": "buy"}, "position": {"x": 0, "y": 0}},
+        ],
+        "connections": [
+            {"source": "ema-fast", "target": "logic-1", "targetHandle": "a"},
+            {"source": "ema-slow", "target": "logic-1", "targetHandle": "b"},
+            {"source": "logic-1", "target": "buy-1"},
+        ],
+    }
+
+
+@pytest.fixture(scope="module")
+def client():
+    yield TestClient(main.app)
+    batch_compile.shutdown_pool()
+
+
+def read_lines(response) -> list:
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# BATCH COMPILATION
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestBatchCompile:
+    """POST /api/compile/batch streams per-item results."""
+
+    def test_output_matches_single_item_path(self, client):
+        """Every item compiles to exactly what the single-item compilers produce."""
+        strategies = [ema_strategy(f, f * 2) for f in range(5, 15)]
+        r = client.post("/api/compile/batch", json={"strategies": strategies, "targets": ["pinescript", "mql"]})
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("application/x-ndjson")
+        results = sorted(read_lines(r), key=lambda item: item["index"])
+        assert len(results) == 10
+        for item, strategy in zip(results, strategies):
+            assert item["code"]["pinescript"] == compile_to_pinescript(strategy)
+            assert item["code"]["mql"] == compile_to_mql(strategy)
+
+    def test_bad_items_do_not_fail_batch(self, client):
+        """Invalid graphs and unknown ids get their own error lines."""
+        bad = ema_strategy(5, 10)
+        bad["nodes"][0]["type"] = "foobar"
+        r = client.post("/api/compile/batch", json={
+            "strategies": [ema_strategy(5, 10), bad],
+            "strategy_ids": ["does-not-exist"],
+        })
+        results = {item["index"]: item for item in read_lines(r)}
+        assert "ta.ema" in results[0]["code"]["pinescript"]
+        assert results[1]["error"].startswith("Validation error")
+        assert results[2] == {"index": 2, "id": "does-not-exist", "error": "Strategy not found"}
+
+    def test_saved_strategy_ids(self, client, tmp_path, monkeypatch):
+        """Saved strategies can be referenced by id."""
+        monkeypatch.setattr(main, "strategy_store", StrategyStore(str(tmp_path / "s.db")))
+        saved = client.post("/api/strategies", json=ema_strategy(8, 21)).json()["id"]
+        r = client.post("/api/compile/batch", json={"strategy_ids": [saved]})
+        (item,) = read_lines(r)
+        assert item["id"] == saved
+        assert "ta.ema(close, 21)" in item["code"]["pinescript"]
+
+    def test_unknown_target_rejected(self, client):
+        """Targets are checked before any work is queued."""
+        r = client.post("/api/compile/batch", json={"strategies": [ema_strategy(5, 10)], "targets": ["rust"]})
+        assert r.status_code == 400
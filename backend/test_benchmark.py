@@ -0,0 +1,57 @@
+"""
+Benchmark generator and regression check tests
+
+Usage:
+    python -m pytest test_benchmark.py -v
+"""
+
+from __future__ import annotations
+
+import pytest
+
+from benchmark import check, generate_strategy, growth, run
+from graph import topological_sort
+from ir import KIND_ACTION, lower_strategy
+from validation import validate_strategy
+
+
+class TestGenerator:
+    @pytest.mark.parametrize("fan_in", [1, 2])
+    def test_generates_valid_dags(self, fan_in):
+        strategy = generate_strategy(500, seed=3, depth=6, fan_in=fan_in)
+        assert len(strategy["nodes"]) == 501
+        assert validate_strategy(strategy)
+        # Acyclic: every node survives the topological sort
+        assert len(topological_sort(strategy["nodes"], strategy["connections"])) == 501
+        ir = lower_strategy(strategy)
+        actions = [node for node in ir.nodes if node.kind == KIND_ACTION]
+        assert actions and all("condition" in node.inputs for node in actions)
+
+    def test_seeded(self):
+        assert generate_strategy(200, seed=7) == generate_strategy(200, seed=7)
+        assert generate_strategy(200, seed=7) != generate_strategy(200, seed=8)
+
+    def test_depth_is_respected(self):
+        strategy = generate_strategy(400, seed=1, depth=5)
+        assert max(node["position"]["x"] for node in strategy["nodes"]) == 5 * 200
+
+
+class TestRegressionCheck:
+    def test_run_reports_every_stage(self):
+        report = run([50, 100], repeat=1)
+        assert set(report["results"]) == {"parse", "validate", "toposort", "lower", "emit", "compile"}
+        assert report["results"]["emit"]["100"]["seconds"] > 0
+
+    def test_flags_slowdowns_and_superlinear_growth(self):
+        baseline = {"results": {"emit": {"1000": {"seconds": 1.0, "peak_bytes": 100},
+                                         "10000": {"seconds": 10.0, "peak_bytes": 1000}}}}
+        steady = {"results": {"emit": {"1000": {"seconds": 1.1, "peak_bytes": 100},
+                                       "10000": {"seconds": 11.0, "peak_bytes": 1000}}}}
+        assert check(steady, baseline, tolerance=0.5, max_growth=4.0) == []
+
+        quadratic = {"results": {"emit": {"1000": {"seconds": 1.0, "peak_bytes": 100},
+                                          "10000": {"seconds": 100.0, "peak_bytes": 1000}}}}
+        assert growth(quadratic["results"]["emit"]) == pytest.approx(10.0)
+        failures = check(quadratic, baseline, tolerance=0.5, max_growth=4.0)
+        assert any("grows" in failure for failure in failures)
+        assert any("emit @ 10000: seconds" in failure for failure in failures)
@@ -0,0 +1,158 @@
+"""
+Compile cache tests
+
+Usage:
+    python -m pytest test_compile_cache.py -v
+"""
+
+from __future__ import annotations
+
+import copy
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from compile_cache import CompileCache, strategy_fingerprint
+import main
+
+
+# ─── Sample Data ──────────────────────────────────────────────────────────────
+
+SAMPLE_STRATEGY = {
+    "name": "Cache Test",
+    "nodes": [
+        {"id": "rsi-1", "type": "indicator", "name": "RSI", "parameters": {"period": 14}, "position": {"x": 0, "y": 0}},
+        {"id": "logic-1", "type": "logic", "name": "RSI < 30", "parameters": {"operator": "<", "value": 30}, "position": {"x": 0, "y": 100}},
+        {"id": "action-1", "type": "action", "name": "Buy", "parameters": {"actionType": "buy"}, "position": {"x": 0, "y": 200}},
+    ],
+    "connections": [
+        {"source": "rsi-1", "target": "logic-1", "targetHandle": "a"},
+        {"source": "logic-1", "target": "action-1"},
+    ],
+}
+
+
+@pytest.fixture
+def client():
+    main.compile_cache.clear()
+    return TestClient(main.app)
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. FINGERPRINT
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestFingerprint:
+    """strategy_fingerprint keys on compile-relevant content only."""
+
+    def test_positions_are_ignored(self):
+        """Moving a node in the editor keeps the same key."""
+        moved = copy.deepcopy(SAMPLE_STRATEGY)
+        moved["nodes"][0]["position"] = {"x": 500, "y": -20}
+        assert strategy_fingerprint(moved, "pinescript") == strategy_fingerprint(SAMPLE_STRATEGY, "pinescript")
+
+    def test_parameters_and_target_change_key(self):
+        """Parameter edits and a different target are different entries."""
+        edited = copy.deepcopy(SAMPLE_STRATEGY)
+        edited["nodes"][0]["parameters"]["period"] = 21
+        base = strategy_fingerprint(SAMPLE_STRATEGY, "pinescript")
+        assert strategy_fingerprint(edited, "pinescript") != base
+        assert strategy_fingerprint(SAMPLE_STRATEGY, "mql") != base
+        assert strategy_fingerprint({**SAMPLE_STRATEGY, "keep_display_indicators": True}, "pinescript") != base
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. CACHE
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestCompileCache:
+    """LRU bounds and single-flight behaviour."""
+
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted first."""
+        cache = CompileCache(maxsize=2)
+        cache.get_or_compile("a", lambda: "A")
+        cache.get_or_compile("b", lambda: "B")
+        cache.get("a")
+        cache.get_or_compile("c", lambda: "C")
+        assert cache.get("a") == "A"
+        assert cache.get("b") is None
+        assert cache.stats()["size"] == 2
+
+    def test_concurrent_requests_compile_once(self):
+        """Identical in-flight requests wait for the first compilation."""
+        cache = CompileCache()
+        calls = []
+
+        def slow_compile():
+            calls.append(1)
+            time.sleep(0.05)
+            return "code"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compile("k", slow_compile))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(calls) == 1
+        assert results == ["code"] * 8
+        assert cache.stats()["coalesced"] + cache.stats()["hits"] == 7
+
+    def test_errors_are_not_cached(self):
+        """A failed compilation is retried on the next request."""
+        cache = CompileCache()
+
+        def broken():
+            raise ValueError("bad graph")
+
+        with pytest.raises(ValueError):
+            cache.get_or_compile("k", broken)
+        assert cache.get_or_compile("k", lambda: "fixed") == "fixed"
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 3. ENDPOINT
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestCompileTempCaching:
+    """/api/compile/temp ETag handling."""
+
+    def test_etag_round_trip(self, client):
+        """A matching If-None-Match returns 304 with no body."""
+        r = client.post("/api/compile/temp", json=SAMPLE_STRATEGY, params={"target": "pinescript"})
+        assert r.status_code == 200
+        etag = r.headers["etag"]
+        assert "ta.rsi" in r.json()["code"]
+
+        r2 = client.post("/api/compile/temp", json=SAMPLE_STRATEGY, headers={"If-None-Match": etag})
+        assert r2.status_code == 304
+        assert r2.headers["etag"] == etag
+
+    def test_layout_change_hits_cache(self, client):
+        """Dragging a node returns the same ETag from the cache."""
+        r = client.post("/api/compile/temp", json=SAMPLE_STRATEGY)
+        moved = copy.deepcopy(SAMPLE_STRATEGY)
+        moved["nodes"][1]["position"] = {"x": 42, "y": 42}
+        r2 = client.post("/api/compile/temp", json=moved)
+        assert r2.headers["etag"] == r.headers["etag"]
+        assert main.compile_cache.stats()["hits"] == 1
+
+    def test_stale_etag_recompiles(self, client):
+        """An unknown ETag is answered with fresh code."""
+        r = client.post("/api/compile/temp", json=SAMPLE_STRATEGY, headers={"If-None-Match": '"stale"'})
+        assert r.status_code == 200
+        assert r.headers["etag"] != '"stale"'
+
+    def test_invalid_strategy_still_400(self, client):
+        """Validation errors are not cached as code."""
+        bad = copy.deepcopy(SAMPLE_STRATEGY)
+        bad["nodes"][0]["type"] = "foobar"
+        assert client.post("/api/compile/temp", json=bad).status_code == 400
+        assert client.post("/api/compile/temp", json=bad).status_code == 400
+        assert main.compile_cache.stats()["size"] == 0
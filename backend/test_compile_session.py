@@ -0,0 +1,211 @@
+"""
+Incremental compile session tests
+
+Usage:
+    python -m pytest test_compile_session.py -v
+"""
+
+from __future__ import annotations
+
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from compile_session import CompileSession, DeltaError, apply_patch
+from compiler import compile_to_pinescript
+from main import app
+from test_compiler import edge, node
+
+client = TestClient(app)
+
+INDICATORS = [("EMA", "period", [10, 20]), ("SMA", "period", [10, 20]), ("RSI", "period", [7, 14])]
+OPERATORS = ["<", ">", "crossover"]
+
+
+def random_strategy(rng: random.Random, size: int) -> dict:
+    nodes = [node("start", "input", "Strategy Start")]
+    connections = []
+    values = ["start"]
+    conditions = []
+    for i in range(size):
+        if rng.random() < 0.5 or len(values) < 2:
+            name, param, choices = rng.choice(INDICATORS)
+            node_id = f"ind-{i}"
+            nodes.append(node(node_id, "indicator", name, **{param: rng.choice(choices)}))
+            connections.append(edge(rng.choice(values), node_id))
+            values.append(node_id)
+        else:
+            node_id = f"logic-{i}"
+            nodes.append(node(node_id, "logic", "Logic", operator=rng.choice(OPERATORS)))
+            a, b = rng.sample(values, 2)
+            connections += [edge(a, node_id, "a"), edge(b, node_id, "b")]
+            conditions.append(node_id)
+    for i, condition in enumerate(conditions[:4]):
+        action = "buy" if i % 2 == 0 else "sell"
+        nodes.append(node(f"act-{i}", "action", action.title(), actionType=action))
+        connections.append(edge(condition, f"act-{i}"))
+    return {"name": "Random", "nodes": nodes, "connections": connections}
+
+
+def random_delta(rng: random.Random, session: CompileSession) -> dict:
+    node_id = rng.choice(list(session.nodes))
+    raw = session.nodes[node_id]
+    name = raw["name"]
+    if raw["type"] == "action":
+        if raw["parameters"]["actionType"] == "buy":
+            return {"op": "set_parameters", "node_id": node_id, "parameters": {"stopLoss": rng.choice(["", "2", 0, 3])}}
+        return {"op": "update_node", "node": {**raw, "name": rng.choice(["Sell", "Exit"])}}
+    if raw["type"] == "logic":
+        return {"op": "set_parameters", "node_id": node_id, "parameters": {"operator": rng.choice(OPERATORS)}}
+    if raw["type"] == "indicator":
+        for indicator, param, choices in INDICATORS:
+            if indicator == name:
+                return {"op": "set_parameters", "node_id": node_id, "parameters": {param: rng.choice(choices)}}
+    return {"op": "set_parameters", "node_id": node_id, "parameters": {}}
+
+
+class TestCompileSession:
+    @pytest.mark.parametrize("seed", range(12))
+    def test_patches_track_full_compilation(self, seed):
+        """Every patch applied to the previous output equals a full recompile."""
+        rng = random.Random(seed)
+        session = CompileSession(random_strategy(rng, 30))
+        lines = session.lines()
+        assert "\n".join(lines) == compile_to_pinescript(session.strategy())
+        for _ in range(40):
+            patch = session.apply([random_delta(rng, session) for _ in range(rng.randint(1, 3))])
+            lines = apply_patch(lines, patch)
+            assert "\n".join(lines) == compile_to_pinescript(session.strategy())
+
+    def test_structural_deltas(self):
+        strategy = random_strategy(random.Random(1), 10)
+        session = CompileSession(strategy)
+        lines = session.lines()
+        deltas = [
+            {"op": "add_node", "node": node("ema-new", "indicator", "EMA", period=50)},
+            {"op": "add_edge", "connection": edge("start", "ema-new")},
+        ]
+        for batch in (deltas, [{"op": "remove_edge", "connection": edge("start", "ema-new")}],
+                      [{"op": "remove_node", "node_id": "ind-0"}]):
+            lines = apply_patch(lines, session.apply(batch))
+            assert "\n".join(lines) == compile_to_pinescript(session.strategy())
+        assert session.version == 3
+
+    def test_edit_reemits_only_the_affected_slice(self):
+        """Editing one leaf of a long chain touches just that node's lines."""
+        nodes = [node("start", "input", "Strategy Start")]
+        connections = []
+        for i in range(300):
+            nodes.append(node(f"ema-{i}", "indicator", "EMA", period=i + 2))
+            connections.append(edge("start", f"ema-{i}"))
+        session = CompileSession({"name": "Wide", "nodes": nodes, "connections": connections})
+        patch = session.apply([{"op": "set_parameters", "node_id": "ema-150", "parameters": {"period": 999}}])
+        assert len(patch) == 1
+        assert patch[0]["lines"][0] == "ema_150 = ta.ema(close, 999)"
+
+    def test_alias_follows_its_owner(self):
+        strategy = {
+            "name": "Dup",
+            "nodes": [node("ema-1", "indicator", "EMA", period=20), node("ema-2", "indicator", "EMA", period=20)],
+            "connections": [],
+        }
+        session = CompileSession(strategy)
+        assert "// ema_2 reuses ema_1" in session.code()
+        session.apply([{"op": "set_parameters", "node_id": "ema-1", "parameters": {"period": 30}}])
+        assert "reuses" not in session.code()
+        session.apply([{"op": "set_parameters", "node_id": "ema-2", "parameters": {"period": 30}}])
+        assert "// ema_2 reuses ema_1" in session.code()
+
+    def test_pruned_node_changing_kind_comes_back(self):
+        strategy = {
+            "name": "Revive",
+            "nodes": [node("rsi-1", "indicator", "RSI", period=14), node("logic-1", "logic", "Low", value=30),
+                      node("logic-2", "logic", "High", operator=">", value=70),
+                      node("buy-1", "action", "Buy", actionType="buy")],
+            "connections": [edge("rsi-1", "logic-1", "a"), edge("rsi-1", "logic-2", "a"), edge("logic-1", "buy-1")],
+        }
+        session = CompileSession(strategy)
+        lines = session.lines()
+        assert "logic-2" in session.ir.pruned
+        sell = {**session.nodes["logic-2"], "type": "action", "name": "Sell", "parameters": {"actionType": "sell"}}
+        lines = apply_patch(lines, session.apply([{"op": "update_node", "node": sell}]))
+        assert "\n".join(lines) == compile_to_pinescript(session.strategy())
+        assert "sell_trigger_2 = rsi_1 and can_sell" in lines
+
+    def test_bad_delta_leaves_session_untouched(self):
+        session = CompileSession(random_strategy(random.Random(2), 8))
+        before = session.code()
+        with pytest.raises(DeltaError):
+            session.apply([{"op": "set_parameters", "node_id": "ind-0", "parameters": {"period": 99}},
+                           {"op": "set_parameters", "node_id": "missing", "parameters": {}}])
+        with pytest.raises(DeltaError):
+            session.apply([{"op": "remove_node", "node_id": "ind-0"}, {"op": "bogus"}])
+        assert session.code() == before and session.version == 0
+
+
+class TestSessionEndpoints:
+    def test_session_roundtrip(self):
+        strategy = random_strategy(random.Random(3), 6)
+        created = client.post("/api/compile/sessions", json=strategy)
+        assert created.status_code == 200
+        session_id, lines = created.json()["session_id"], created.json()["code"].split("\n")
+
+        response = client.post(f"/api/compile/sessions/{session_id}/deltas", json={
+            "version": 0,
+            "deltas": [{"op": "set_parameters", "node_id": "ind-0", "parameters": {"period": 77}}],
+        })
+        assert response.status_code == 200
+        assert response.json()["version"] == 1
+        lines = apply_patch(lines, response.json()["patch"])
+        assert "\n".join(lines) == client.get(f"/api/compile/sessions/{session_id}").json()["code"]
+
+        stale = client.post(f"/api/compile/sessions/{session_id}/deltas", json={"version": 0, "deltas": []})
+        assert stale.status_code == 409
+        unknown = client.post(f"/api/compile/sessions/{session_id}/deltas",
+                              json={"deltas": [{"op": "remove_node", "node_id": "nope"}]})
+        assert unknown.status_code == 400
+
+        assert client.delete(f"/api/compile/sessions/{session_id}").status_code == 200
+        assert client.get(f"/api/compile/sessions/{session_id}").status_code == 404
+
+    def test_deltas_producing_an_invalid_graph_are_rejected(self):
+        strategy = {
+            "name": "Checked",
+            "nodes": [node("rsi-1", "indicator", "RSI"), node("sma-1", "indicator", "SMA", period=5),
+                      node("logic-1", "logic", "Low", value=30), node("buy-1", "action", "Buy", actionType="buy")],
+            "connections": [edge("rsi-1", "sma-1"), edge("sma-1", "logic-1", "a"), edge("logic-1", "buy-1")],
+        }
+        created = client.post("/api/compile/sessions", json=strategy).json()
+        url = f"/api/compile/sessions/{created['session_id']}/deltas"
+        cycle = client.post(url, json={"deltas": [{"op": "add_edge", "connection": edge("sma-1", "rsi-1")}]})
+        assert cycle.status_code == 400 and cycle.json()["detail"].startswith("Validation error")
+        bogus = client.post(url, json={"deltas": [
+            {"op": "set_parameters", "node_id": "logic-1", "parameters": {"operator": "bogus"}}]})
+        assert bogus.status_code == 400 and "bogus" in bogus.json()["detail"]
+        # Same verdict as a one-shot compile, and the session is left as it was
+        cyclic = {**strategy, "connections": strategy["connections"] + [edge("sma-1", "rsi-1")]}
+        assert client.post("/api/compile/temp", json=cyclic).status_code == 400
+        current = client.get(f"/api/compile/sessions/{created['session_id']}").json()
+        assert current["version"] == 0 and current["code"] == created["code"]
+
+    def test_display_indicators_match_temp_compile(self):
+        strategy = {
+            "name": "Display",
+            "nodes": [node("rsi-1", "indicator", "RSI", period=14), node("ema-1", "indicator", "EMA", period=50),
+                      node("logic-1", "logic", "Low", value=30), node("buy-1", "action", "Buy", actionType="buy")],
+            "connections": [edge("rsi-1", "logic-1", "a"), edge("logic-1", "buy-1")],
+            "keep_display_indicators": True,
+        }
+        created = client.post("/api/compile/sessions", json=strategy).json()
+        temp = client.post("/api/compile/temp", json=strategy).json()["code"]
+        assert created["code"] == temp and "ema_1 = ta.ema(close, 50)" in temp
+        with client.websocket_connect("/ws/compile") as ws:
+            ws.send_json({"type": "init", "strategy": strategy})
+            assert ws.receive_json()["code"] == temp
+        # A structural edit relowers with the flag still set
+        lines = apply_patch(created["code"].split("\n"), client.post(
+            f"/api/compile/sessions/{created['session_id']}/deltas",
+            json={"deltas": [{"op": "remove_edge", "connection": edge("logic-1", "buy-1")}]}).json()["patch"])
+        strategy["connections"] = strategy["connections"][:1]
+        assert "\n".join(lines) == client.post("/api/compile/temp", json=strategy).json()["code"]
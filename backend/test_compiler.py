@@ -0,0 +1,244 @@
+"""
+Pine Script compiler tests
+
+Usage:
+    python -m pytest test_compiler.py -v
+"""
+
+from __future__ import annotations
+
+from compiler import COMPILERS, compile_targets, compile_to_pinescript
+from ir import KIND_INDICATOR, KIND_INPUT, lower_strategy, prune_dead_nodes
+
+
+# ─── Helpers ──────────────────────────────────────────────────────────────────
+
+def node(node_id: str, node_type: str, name: str, **parameters) -> dict:
+    return {"id": node_id, "type": node_type, "name": name, "parameters": parameters, "position": {"x": 0, "y": 0}}
+
+
+def edge(source: str, target: str, handle: str | None = None) -> dict:
+    return {"source": source, "target": target, "targetHandle": handle}
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. COMMON SUBEXPRESSION ELIMINATION
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestCommonSubexpressions:
+    """Structurally identical nodes are computed once."""
+
+    def test_duplicate_indicators_share_one_call(self):
+        """Two EMA(close, 20) nodes emit a single ta.ema and one plot."""
+        strategy = {
+            "name": "Dup EMA",
+            "nodes": [
+                node("ema-1", "indicator", "EMA", period=20),
+                node("ema-2", "indicator", "EMA", period=20),
+                node("logic-1", "logic", "Logic", operator=">"),
+                node("buy-1", "action", "Buy", actionType="buy"),
+            ],
+            "connections": [edge("ema-1", "logic-1", "a"), edge("ema-2", "logic-1", "b"), edge("logic-1", "buy-1")],
+        }
+        code = compile_to_pinescript(strategy)
+        assert code.count("ta.ema(close, 20)") == 1
+        assert code.count("title='EMA 20'") == 1
+        assert "// ema_2 reuses ema_1" in code
+        assert "buy_trigger_1 = ema_1 > ema_1 and can_buy" in code
+
+    def test_duplicates_merge_transitively(self):
+        """RSI nodes fed by duplicate EMAs are duplicates too."""
+        strategy = {
+            "name": "Chains",
+            "nodes": [
+                node("ema-1", "indicator", "EMA", period=10),
+                node("ema-2", "indicator", "EMA", period=10),
+                node("rsi-1", "indicator", "RSI", period=14),
+                node("rsi-2", "indicator", "RSI", period=14),
+            ],
+            "connections": [edge("ema-1", "rsi-1"), edge("ema-2", "rsi-2")],
+        }
+        code = compile_to_pinescript(strategy)
+        assert code.count("ta.ema(") == 1
+        assert code.count("ta.rsi(") == 1
+        assert "rsi_1 = ta.rsi(ema_1, 14)" in code
+
+    def test_mirrored_comparisons_merge(self):
+        """a < b and b > a are the same condition."""
+        strategy = {
+            "name": "Mirror",
+            "nodes": [
+                node("sma-1", "indicator", "SMA", period=10),
+                node("sma-2", "indicator", "SMA", period=30),
+                node("logic-1", "logic", "Logic", operator="<"),
+                node("logic-2", "logic", "Logic", operator=">"),
+                node("buy-1", "action", "Buy", actionType="buy"),
+                node("buy-2", "action", "Buy", actionType="buy", stopLoss=2),
+                node("sell-1", "action", "Sell", actionType="sell"),
+            ],
+            "connections": [
+                edge("sma-1", "logic-1", "a"), edge("sma-2", "logic-1", "b"),
+                edge("sma-2", "logic-2", "a"), edge("sma-1", "logic-2", "b"),
+                edge("logic-1", "buy-1"), edge("logic-1", "buy-2"), edge("logic-2", "sell-1"),
+            ],
+        }
+        code = compile_to_pinescript(strategy)
+        assert "logic_1 = sma_1 < sma_2" in code
+        assert "logic_2 =" not in code
+        # logic_2 is used once, so it would be fused, but the variable already exists
+        assert "// logic_2 reuses logic_1" in code
+        assert "sell_trigger_1 = logic_1 and can_sell" in code
+
+    def test_distinct_parameters_are_kept(self):
+        """Different periods or operators are not merged."""
+        strategy = {
+            "name": "Distinct",
+            "nodes": [
+                node("ema-1", "indicator", "EMA", period=12),
+                node("ema-2", "indicator", "EMA", period=26),
+                node("logic-1", "logic", "Logic", operator="crossover"),
+                node("logic-2", "logic", "Logic", operator="crossunder"),
+            ],
+            "connections": [
+                edge("ema-1", "logic-1", "a"), edge("ema-2", "logic-1", "b"),
+                edge("ema-1", "logic-2", "a"), edge("ema-2", "logic-2", "b"),
+            ],
+        }
+        code = compile_to_pinescript(strategy)
+        assert "reuses" not in code
+        assert "ta.crossover(ema_1, ema_2)" in code
+        assert "ta.crossunder(ema_1, ema_2)" in code
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. INTERMEDIATE REPRESENTATION
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestLowering:
+    """Strategies are parsed once into slot-indexed IR nodes."""
+
+    STRATEGY = {
+        "name": "IR",
+        "nodes": [
+            node("buy-1", "actionNode", "Buy", actionType="buy", stopLoss="2"),
+            node("logic-1", "logic", "RSI < 30", operator="<", value="30"),
+            node("rsi-1", "indicatorNode", "RSI", period="14"),
+            node("start", "input", "Strategy Start"),
+        ],
+        "connections": [edge("start", "rsi-1"), edge("rsi-1", "logic-1", "a"), edge("logic-1", "buy-1", "a")],
+    }
+
+    def test_nodes_in_topological_slots(self):
+        ir = lower_strategy(self.STRATEGY)
+        assert [n.id for n in ir.nodes] == ["start", "rsi-1", "logic-1", "buy-1"]
+        assert [n.slot for n in ir.nodes] == [0, 1, 2, 3]
+        assert ir.nodes[0].kind == KIND_INPUT and ir.nodes[1].kind == KIND_INDICATOR
+
+    def test_ports_point_at_slots(self):
+        ir = lower_strategy(self.STRATEGY)
+        logic, buy = ir.nodes[2], ir.nodes[3]
+        assert logic.inputs == {"a": 1}
+        assert buy.inputs == {"condition": 2}
+        assert ir.source(logic, "a").id == "rsi-1"
+
+    def test_params_and_names_are_resolved(self):
+        ir = lower_strategy(self.STRATEGY)
+        rsi, logic, buy = ir.nodes[1], ir.nodes[2], ir.nodes[3]
+        assert rsi.param("period") == 14 and logic.param("value") == 30
+        assert logic.var == "rsi_lt_30_1"
+        assert (buy.action, buy.stop_loss, buy.take_profit) == ("buy", 2.0, 0)
+        assert ir.has_sl and not ir.has_tp
+
+    def test_cycles_are_dropped(self):
+        strategy = {
+            "name": "Cycle",
+            "nodes": [node("a-1", "logic", "A"), node("b-1", "logic", "B")],
+            "connections": [edge("a-1", "b-1", "a"), edge("b-1", "a-1", "a")],
+        }
+        assert lower_strategy(strategy).nodes == []
+
+    def test_multi_target_matches_single_target(self):
+        code = compile_targets(self.STRATEGY, list(COMPILERS))
+        assert code == {target: COMPILERS[target](self.STRATEGY) for target in COMPILERS}
+
+
+class TestDeadNodeElimination:
+    """Only nodes that can reach an action are emitted."""
+
+    STRATEGY = {
+        "name": "Dead",
+        "nodes": [
+            node("start", "input", "Strategy Start"),
+            node("rsi-1", "indicator", "RSI", period=14),
+            node("ema-1", "indicator", "EMA", period=20),
+            node("sma-1", "indicator", "SMA", period=50),
+            node("logic-1", "logic", "RSI < 30", operator="<", value=30),
+            node("logic-2", "logic", "Orphan", operator=">", value=70),
+            node("buy-1", "action", "Buy", actionType="buy"),
+        ],
+        "connections": [
+            edge("start", "rsi-1"), edge("start", "ema-1"), edge("ema-1", "sma-1"),
+            edge("rsi-1", "logic-1", "a"), edge("rsi-1", "logic-2", "a"), edge("logic-1", "buy-1"),
+        ],
+    }
+
+    def test_orphans_are_pruned_and_reported(self):
+        ir = lower_strategy(self.STRATEGY)
+        assert [n.id for n in ir.nodes] == ["start", "rsi-1", "logic-1", "buy-1"]
+        assert sorted(ir.pruned) == ["ema-1", "logic-2", "sma-1"]
+        assert [n.slot for n in ir.nodes] == [0, 1, 2, 3]
+        assert ir.nodes[2].inputs == {"a": 1} and ir.nodes[3].inputs == {"condition": 2}
+
+        code = compile_to_pinescript(self.STRATEGY)
+        assert "// Pruned 3 node(s) that feed no action:" in code
+        assert "ta.ema" not in code and "ta.sma" not in code and "logic_2 =" not in code
+        assert "rsi_1 = ta.rsi(close, 14)" in code
+
+    def test_keep_display_indicators(self):
+        ir = lower_strategy({**self.STRATEGY, "keep_display_indicators": True})
+        assert ir.pruned == ["logic-2"]
+        code = compile_to_pinescript({**self.STRATEGY, "keep_display_indicators": True})
+        assert "sma_1 = ta.sma(ema_1, 50)" in code
+
+    def test_graph_without_actions_is_untouched(self):
+        study = {**self.STRATEGY, "nodes": self.STRATEGY["nodes"][:-1], "connections": self.STRATEGY["connections"][:-1]}
+        ir = lower_strategy(study)
+        assert len(ir.nodes) == 6 and ir.pruned == []
+        assert prune_dead_nodes(ir) == []
+
+    def test_pruning_can_be_disabled(self):
+        assert len(lower_strategy(self.STRATEGY, prune=False).nodes) == 7
+
+
+class TestAdvertisedIndicators:
+    """Every indicator listed by /api/indicators has real Pine emission."""
+
+    def test_stochastic_atr_adx(self):
+        strategy = {
+            "name": "Oscillators",
+            "nodes": [
+                node("stoch-1", "indicator", "Stochastic", k=14, d=3),
+                node("atr-1", "indicator", "ATR", period=10),
+                node("adx-1", "indicator", "ADX", period=14),
+            ],
+            "connections": [],
+        }
+        code = compile_to_pinescript(strategy)
+        assert "Unknown indicator" not in code
+        assert "stochastic_1_k = ta.stoch(close, high, low, 14)" in code
+        assert "stochastic_1_d = ta.sma(stochastic_1_k, 3)" in code
+        assert "stochastic_1 = stochastic_1_k" in code
+        assert "atr_1 = ta.atr(10)" in code
+        assert "[adx_1_plus, adx_1_minus, adx_1_adx] = ta.dmi(14, 14)" in code
+        assert "adx_1 = adx_1_adx" in code
+
+    def test_atr_ignores_its_source_for_cse(self):
+        strategy = {
+            "name": "ATR",
+            "nodes": [node("ema-1", "indicator", "EMA", period=5),
+                      node("atr-1", "indicator", "ATR", period=14), node("atr-2", "indicator", "ATR", period=14)],
+            "connections": [edge("ema-1", "atr-2")],
+        }
+        assert "// atr_2 reuses atr_1" in compile_to_pinescript(strategy)
@@ -0,0 +1,199 @@
+"""
+Condition fusion and constant folding tests for generated Pine Script
+
+Usage:
+    python -m pytest test_condition_fusion.py -v
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+from backtest import evaluate_strategy, prepare_data
+from compile_session import CompileSession, apply_patch
+from compiler import compile_to_pinescript, pine_operand
+from test_compiler import edge, node
+
+
+def strategy(logic: list, connections: list, actions: list = None) -> dict:
+    """RSI and EMA feeding the given logic nodes, plus a buy on the last of them"""
+    actions = actions if actions is not None else [node("buy-1", "action", "Buy", actionType="buy")]
+    nodes = [node("rsi-1", "indicator", "RSI", period=14), node("ema-1", "indicator", "EMA", period=20)]
+    wiring = [edge(logic[-1]["id"], "buy-1")] if actions and actions[0]["id"] == "buy-1" else []
+    return {"name": "Fusion", "nodes": nodes + logic + actions, "connections": connections + wiring}
+
+
+def calculations(code: str) -> list:
+    return [line for line in code.split("\n") if " = " in line and not line.startswith((" ", "//", "plot", "var "))]
+
+
+CHAIN = strategy(
+    [
+        node("lt-1", "logic", "Oversold", operator="<", value=30),
+        node("gt-2", "logic", "Uptrend", operator=">"),
+        node("gt-3", "logic", "Overbought", operator=">", value=70),
+        node("or-4", "logic", "Either", operator="or"),
+        node("and-5", "logic", "Entry", operator="and"),
+    ],
+    [
+        edge("rsi-1", "lt-1", "a"), edge("ema-1", "gt-2", "b"),
+        edge("rsi-1", "gt-3", "a"), edge("gt-2", "or-4", "a"), edge("gt-3", "or-4", "b"),
+        edge("lt-1", "and-5", "a"), edge("or-4", "and-5", "b"),
+    ],
+)
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. FUSION
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestFusion:
+    """Single-use conditions become part of their consumer's expression."""
+
+    def test_single_use_comparison_is_fused_into_the_action(self):
+        code = compile_to_pinescript(strategy(
+            [node("lt-1", "logic", "Oversold", operator="<", value=30)], [edge("rsi-1", "lt-1", "a")]))
+        assert "oversold_1 =" not in code
+        assert "buy_trigger_1 = rsi_1 < 30 and can_buy" in code
+
+    def test_chain_collapses_into_one_expression(self):
+        code = compile_to_pinescript(CHAIN)
+        assert calculations(code) == [
+            "can_buy = not positionOpen",
+            "can_sell = positionOpen",
+            "rsi_1 = ta.rsi(close, 14)",
+            "ema_1 = ta.ema(close, 20)",
+            "buy_trigger_1 = rsi_1 < 30 and (close > ema_1 or rsi_1 > 70) and can_buy",
+        ]
+
+    def test_shared_condition_keeps_its_variable(self):
+        code = compile_to_pinescript(strategy(
+            [node("lt-1", "logic", "Oversold", operator="<", value=30)],
+            [edge("rsi-1", "lt-1", "a"), edge("lt-1", "buy-2")],
+            [node("buy-1", "action", "Buy", actionType="buy"), node("buy-2", "action", "Buy", actionType="buy")],
+        ))
+        assert "oversold_1 = rsi_1 < 30" in code
+        assert "buy_trigger_1 = oversold_1 and can_buy" in code and "buy_trigger_2 = oversold_1 and can_buy" in code
+
+    def test_crossovers_are_fused_into_actions_only(self):
+        code = compile_to_pinescript(strategy(
+            [node("x-1", "logic", "Cross", operator="crossover"), node("lt-2", "logic", "Low", operator="<", value=30),
+             node("and-3", "logic", "Both", operator="and")],
+            [edge("rsi-1", "x-1", "a"), edge("ema-1", "x-1", "b"), edge("rsi-1", "lt-2", "a"),
+             edge("lt-2", "and-3", "a"), edge("x-1", "and-3", "b")],
+        ))
+        # ta.crossover keeps its own line so it is evaluated on every bar, whatever and/or does
+        assert "cross_1 = ta.crossover(rsi_1, ema_1)" in code
+        assert "buy_trigger_1 = rsi_1 < 30 and cross_1 and can_buy" in code
+        code = compile_to_pinescript(strategy(
+            [node("x-1", "logic", "Cross", operator="crossover")], [edge("rsi-1", "x-1", "a"), edge("ema-1", "x-1", "b")]))
+        assert "buy_trigger_1 = ta.crossover(rsi_1, ema_1) and can_buy" in code
+
+    def test_operands_are_parenthesized_by_precedence(self):
+        assert pine_operand("a < b", 3) == "a < b"
+        assert pine_operand("a or b", 3) == "(a or b)"
+        assert pine_operand("a and b", 3) == "a and b"
+        assert pine_operand("a < b", 6) == "(a < b)"
+        assert pine_operand("(a or b) and c", 3) == "(a or b) and c"
+        assert pine_operand("ta.crossover(a, b)", 6) == "ta.crossover(a, b)"
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. CONSTANT FOLDING
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestConstantFolding:
+    """Static thresholds fold away; conditions that cannot fire leave no trigger."""
+
+    def fold(self, operator, value, **extra):
+        logic = [node("lt-1", "logic", "Oversold", operator="<", value=30),
+                 node("k-2", "logic", "Const", operator=operator, value=value)]
+        logic += extra.get("tail", [])
+        connections = [edge("rsi-1", "lt-1", "a"), edge("lt-1", "k-2", "a")] + extra.get("wiring", [])
+        return compile_to_pinescript(strategy(logic, connections))
+
+    def test_and_with_zero_never_fires(self):
+        code = self.fold("and", 0)
+        assert "// action_buy-1 skipped: condition is always false" in code
+        assert "buy_trigger_1" not in code and "strategy.entry" not in code
+
+    def test_and_with_nonzero_is_the_other_operand(self):
+        assert "buy_trigger_1 = rsi_1 < 30 and can_buy" in self.fold("and", 1)
+
+    def test_or_with_nonzero_always_fires(self):
+        code = self.fold("or", "2.5")
+        assert "buy_trigger_1 = can_buy" in code and "rsi_1 < 30" not in code
+
+    def test_or_with_zero_is_the_other_operand(self):
+        assert "buy_trigger_1 = rsi_1 < 30 and can_buy" in self.fold("or", 0)
+
+    def test_comparisons_of_constants_are_evaluated(self):
+        # (rsi < 30 or 1) is true, and true > 0.5 is true again
+        code = self.fold("or", 1, tail=[node("gt-3", "logic", "Gt", operator=">", value=0.5)],
+                         wiring=[edge("k-2", "gt-3", "a")])
+        assert "buy_trigger_1 = can_buy" in code
+        code = self.fold("or", 1, tail=[node("x-3", "logic", "X", operator="crossover", value=0.5)],
+                         wiring=[edge("k-2", "x-3", "a")])
+        assert "condition is always false" in code and "ta.crossover" not in code
+
+    def test_backtest_agrees_with_the_folded_script(self):
+        data = prepare_data({"close": np.linspace(100, 50, 60)})
+        for operator, value, expected in [("and", 0, False), ("or", 1, True)]:
+            logic = [node("lt-1", "logic", "Oversold", operator="<", value=30),
+                     node("k-2", "logic", "Const", operator=operator, value=value)]
+            outputs = evaluate_strategy(strategy(logic, [edge("rsi-1", "lt-1", "a"), edge("lt-1", "k-2", "a")]), data)
+            assert (outputs["k-2"] == expected).all()
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 3. EXIT LOGIC
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestExitLogic:
+    """Only the exits a strategy uses get a series."""
+
+    def test_stop_loss_only(self):
+        code = compile_to_pinescript(strategy(
+            [node("lt-1", "logic", "Oversold", operator="<", value=30)], [edge("rsi-1", "lt-1", "a")],
+            [node("buy-1", "action", "Buy", actionType="buy", stopLoss=2)]))
+        assert "targetHit" not in code and "and false" not in code
+        assert "exit_trigger = stopHit" in code
+        assert "strategy.close('Long', comment = 'Stop Loss Hit')" in code
+
+    def test_take_profit_only(self):
+        code = compile_to_pinescript(strategy(
+            [node("lt-1", "logic", "Oversold", operator="<", value=30)], [edge("rsi-1", "lt-1", "a")],
+            [node("buy-1", "action", "Buy", actionType="buy", takeProfit=4)]))
+        assert "stopHit" not in code
+        assert "exit_trigger = targetHit" in code
+        assert "strategy.close('Long', comment = 'Take Profit Hit')" in code
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 4. LIVE SESSIONS
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestSessions:
+    """Edits that fuse, unfuse or fold a node patch to the same script as a full compile."""
+
+    def test_edits_match_a_full_compile(self):
+        session = CompileSession(CHAIN)
+        deltas = [
+            {"op": "set_parameters", "node_id": "gt-2", "parameters": {"operator": "crossover"}},
+            {"op": "set_parameters", "node_id": "and-5", "parameters": {"operator": "or"}},
+            {"op": "set_parameters", "node_id": "or-4", "parameters": {"operator": "and"}},
+            {"op": "set_parameters", "node_id": "gt-2", "parameters": {"operator": "<"}},
+            {"op": "set_parameters", "node_id": "gt-3", "parameters": {"operator": "and", "value": 0}},
+            {"op": "set_parameters", "node_id": "and-5", "parameters": {"operator": "and", "value": 1}},
+            {"op": "set_parameters", "node_id": "gt-3", "parameters": {"operator": ">", "value": 70}},
+            {"op": "set_parameters", "node_id": "buy-1", "parameters": {"stopLoss": 2}},
+        ]
+        for delta in deltas:
+            old = session.lines()
+            patch = session.apply([delta])
+            assert session.code() == compile_to_pinescript(session.strategy())
+            assert apply_patch(old, patch) == session.lines()
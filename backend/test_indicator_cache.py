@@ -0,0 +1,149 @@
+"""
+Indicator result cache tests
+
+Usage:
+    python -m pytest test_indicator_cache.py -v
+"""
+
+from __future__ import annotations
+
+import os
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from backtest import backtest_arrays, prepare_data
+from indicator_cache import IndicatorCache, data_key
+from ohlcv_store import OHLCVStore
+from test_backtest import EMA_FLIP
+from test_ohlcv_store import bars
+
+
+def series(value: float, n: int = 100) -> np.ndarray:
+    return np.full(n, value)  # 800 bytes
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. CACHE
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestIndicatorCache:
+    """Byte budget, spill tier and counters."""
+
+    def test_byte_budget_evicts_least_recently_used(self):
+        cache = IndicatorCache(max_bytes=2000)
+        cache.put("a", series(1))
+        cache.put("b", series(2))
+        cache.get("a")
+        cache.put("c", series(3))
+        assert cache.get("b") is None
+        assert cache.get("a")[0] == 1 and cache.get("c")[0] == 3
+        stats = cache.stats()
+        assert stats["bytes"] == 1600 and stats["evictions"] == 1
+        assert stats["hits"] == 3 and stats["misses"] == 1
+
+    def test_entries_are_read_only(self):
+        cache = IndicatorCache()
+        original = series(1)
+        cache.put("a", original)
+        assert original.flags.writeable
+        with pytest.raises(ValueError):
+            cache.get("a")[0] = 5
+
+    def test_spill_round_trip(self, tmp_path):
+        cache = IndicatorCache(max_bytes=1000, spill_dir=str(tmp_path), spill_bytes=10_000)
+        cache.put("a", series(1))
+        cache.put("b", series(2))
+        assert cache.stats()["spilled_entries"] == 1
+        value = cache.get("a")
+        assert value[0] == 1 and not value.flags.writeable
+        assert cache.spill_hits == 1
+        # Promoting "a" pushed "b" out to disk in turn
+        assert cache.get("b")[0] == 2 and cache.spill_hits == 2
+
+    def test_spill_budget_and_startup_cleanup(self, tmp_path):
+        cache = IndicatorCache(max_bytes=0, spill_dir=str(tmp_path), spill_bytes=2000)
+        for i in range(4):
+            cache.put(str(i), series(i))
+        assert cache.stats()["spilled_entries"] == 2
+        assert len(os.listdir(tmp_path)) == 2
+        assert cache.get("0") is None and cache.get("3")[0] == 3
+        IndicatorCache(spill_dir=str(tmp_path))
+        assert os.listdir(tmp_path) == []
+
+    def test_scopes_are_isolated(self):
+        cache = IndicatorCache()
+        first, second = cache.scope("AAPL/1d/v1"), cache.scope("MSFT/1d/v1")
+        first["sig"] = series(1)
+        assert second.get("sig") is None and "sig" in first
+        assert list(first) == ["sig"] and len(second) == 0
+        del first["sig"]
+        assert first.get("sig") is None
+
+
+class TestDataKey:
+    """Identity of the bars a cache scope belongs to."""
+
+    def test_inline_data_is_hashed(self):
+        arrays = prepare_data(bars(0, 50))
+        assert data_key(arrays) == data_key(prepare_data(bars(0, 50)))
+        changed = prepare_data(bars(0, 50))
+        changed["close"] = changed["close"].copy()
+        changed["close"][10] += 0.01
+        assert data_key(changed) != data_key(arrays)
+
+    def test_store_version_changes_on_recreate(self, tmp_path):
+        store = OHLCVStore(str(tmp_path))
+        store.append("X", "1m", bars(0, 10))
+        version = store.version("X", "1m")
+        store.append("X", "1m", bars(600, 5))
+        assert store.version("X", "1m") == version
+        store.delete("X", "1m")
+        store.append("X", "1m", bars(0, 10))
+        assert store.version("X", "1m") != version
+        assert [s["interval"] for s in store.series()] == ["1m"]
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. ENDPOINTS
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestCachedBacktests:
+    """Repeated backtests over the same bars reuse node outputs."""
+
+    @pytest.fixture
+    def client(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(main, "indicator_cache", IndicatorCache())
+        monkeypatch.setattr(main, "ohlcv_store", OHLCVStore(str(tmp_path / "cache")))
+        return TestClient(main.app)
+
+    def test_repeat_runs_hit(self, client):
+        data = bars(0, 400)
+        first = client.post("/api/backtest/run", json={"strategy": EMA_FLIP, "data": data}).json()
+        misses = main.indicator_cache.misses
+        assert misses > 0 and main.indicator_cache.hits == 0
+        second = client.post("/api/backtest/run", json={"strategy": EMA_FLIP, "data": data}).json()
+        assert second == first
+        assert main.indicator_cache.misses == misses and main.indicator_cache.hits == misses
+        assert first["metrics"] == backtest_arrays(EMA_FLIP, prepare_data(data))["metrics"]
+
+    def test_stored_series_are_scoped_by_range(self, client):
+        client.post("/api/data/BTC/1m", json=bars(0, 400))
+        full = {"strategy": EMA_FLIP, "source": {"symbol": "BTC", "interval": "1m"}}
+        tail = {"strategy": EMA_FLIP, "source": {"symbol": "BTC", "interval": "1m", "start": 6000}}
+        client.post("/api/backtest/run", json=full)
+        hits = main.indicator_cache.hits
+        r = client.post("/api/backtest/run", json=tail)
+        assert main.indicator_cache.hits == hits
+        expected = backtest_arrays(EMA_FLIP, main.ohlcv_store.load("BTC", "1m", start=6000))
+        assert r.json()["metrics"] == expected["metrics"]
+
+        # A sweep shares entries for the nodes it does not vary
+        r = client.post("/api/backtest/sweep", json={
+            **full, "parameters": [{"node_id": "ema-12", "parameter": "period", "values": [12, 20]}],
+        })
+        assert r.status_code == 200 and main.indicator_cache.hits > hits
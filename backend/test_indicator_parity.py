@@ -0,0 +1,219 @@
+"""
+Numerical parity of the indicator kernels with Pine's ta.* definitions
+
+Each reference below is a bar-by-bar loop written the way Pine documents
+the built-in (na handling included), so the vectorized kernels are checked
+against the semantics rather than against themselves.
+
+Usage:
+    python -m pytest test_indicator_parity.py -v
+"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pytest
+
+import indicators as ta
+from backtest import evaluate_indicator, prepare_data
+
+NA = math.nan
+
+
+def ohlc(n: int = 2000, seed: int = 11):
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    spread = np.abs(rng.normal(0, 0.005, (2, n))) * close
+    high, low = close + spread[0], close - spread[1]
+    # A stretch of identical bars: flat ranges and zero directional movement
+    high[500:530] = low[500:530] = close[500:530] = close[499]
+    return high, low, close
+
+
+# ─── Pine-style references ────────────────────────────────────────────────────
+
+def na(x) -> bool:
+    return x is None or math.isnan(x)
+
+
+def ref_sma(src, length):
+    out = []
+    for t in range(len(src)):
+        window = src[t - length + 1:t + 1] if t >= length - 1 else []
+        out.append(sum(window) / length if len(window) == length and not any(map(na, window)) else NA)
+    return np.array(out)
+
+
+def ref_rma(src, length, alpha=None):
+    """ta.rma / ta.ema: seeded with the SMA of the first full window of values"""
+    alpha = 1.0 / length if alpha is None else alpha
+    out, prev, seen = [], NA, []
+    for x in src:
+        if na(prev):
+            if not na(x):
+                seen.append(x)
+            prev = sum(seen[-length:]) / length if len(seen) >= length else NA
+        else:
+            prev = alpha * x + (1 - alpha) * prev
+        out.append(prev)
+    return np.array(out)
+
+
+def ref_ema(src, length):
+    return ref_rma(src, length, 2.0 / (length + 1))
+
+
+def ref_rsi(src, length):
+    change = [NA] + [src[t] - src[t - 1] for t in range(1, len(src))]
+    up = ref_rma([NA if na(c) else max(c, 0.0) for c in change], length)
+    down = ref_rma([NA if na(c) else max(-c, 0.0) for c in change], length)
+    out = []
+    for u, d in zip(up, down):
+        out.append(NA if na(u) or na(d) else 100.0 if d == 0 else 0.0 if u == 0 else 100 - 100 / (1 + u / d))
+    return np.array(out)
+
+
+def ref_stdev(src, length):
+    out = []
+    for t in range(len(src)):
+        if t < length - 1:
+            out.append(NA)
+            continue
+        window = src[t - length + 1:t + 1]
+        mean = sum(window) / length
+        out.append(math.sqrt(sum((x - mean) ** 2 for x in window) / length))
+    return np.array(out)
+
+
+def ref_extreme(src, length, pick):
+    return np.array([pick(src[t - length + 1:t + 1]) if t >= length - 1 else NA for t in range(len(src))])
+
+
+def ref_stoch(close, high, low, length):
+    hh, ll = ref_extreme(high, length, max), ref_extreme(low, length, min)
+    return np.array([NA if na(h) or h == l else 100 * (c - l) / (h - l) for c, h, l in zip(close, hh, ll)])
+
+
+def ref_tr(high, low, close, handle_na):
+    out = []
+    for t in range(len(close)):
+        if t == 0:
+            out.append(high[0] - low[0] if handle_na else NA)
+        else:
+            out.append(max(high[t] - low[t], abs(high[t] - close[t - 1]), abs(low[t] - close[t - 1])))
+    return out
+
+
+def ref_dmi(high, low, close, di_length, adx_length):
+    plus_dm, minus_dm = [NA], [NA]
+    for t in range(1, len(high)):
+        up, down = high[t] - high[t - 1], -(low[t] - low[t - 1])
+        plus_dm.append(up if up > down and up > 0 else 0.0)
+        minus_dm.append(down if down > up and down > 0 else 0.0)
+    truerange = ref_rma(ref_tr(high, low, close, False), di_length)
+
+    def fixnan(values):
+        out, last = [], NA
+        for v in values:
+            last = last if na(v) else v
+            out.append(last)
+        return out
+
+    def ratio(num, den):
+        return NA if na(num) or na(den) or den == 0 else 100 * num / den
+
+    plus = fixnan([ratio(a, b) for a, b in zip(ref_rma(plus_dm, di_length), truerange)])
+    minus = fixnan([ratio(a, b) for a, b in zip(ref_rma(minus_dm, di_length), truerange)])
+    dx = [NA if na(p) or na(m) else abs(p - m) / (1 if p + m == 0 else p + m) for p, m in zip(plus, minus)]
+    adx = 100 * ref_rma(dx, adx_length)
+    return np.array(plus), np.array(minus), adx
+
+
+# ─── Parity ───────────────────────────────────────────────────────────────────
+
+def assert_parity(actual, expected):
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+class TestParity:
+    high, low, close = ohlc()
+
+    @pytest.mark.parametrize("length", [1, 2, 14, 50])
+    def test_sma(self, length):
+        assert_parity(ta.sma(self.close, length), ref_sma(self.close, length))
+
+    @pytest.mark.parametrize("length", [2, 20, 200])
+    def test_ema(self, length):
+        assert_parity(ta.ema(self.close, length), ref_ema(self.close, length))
+
+    @pytest.mark.parametrize("length", [2, 14, 100])
+    def test_rma_and_rsi(self, length):
+        assert_parity(ta.rma(self.close, length), ref_rma(self.close, length))
+        assert_parity(ta.rsi(self.close, length), ref_rsi(self.close, length))
+
+    def test_macd(self):
+        line, signal, hist = ta.macd(self.close, 12, 26, 9)
+        ref_line = ref_ema(self.close, 12) - ref_ema(self.close, 26)
+        assert_parity(line, ref_line)
+        assert_parity(signal, ref_ema(ref_line, 9))
+        assert_parity(hist, ref_line - ref_ema(ref_line, 9))
+
+    def test_bollinger(self):
+        upper, basis, lower = ta.bollinger(self.close, 20, 2.0)
+        assert_parity(basis, ref_sma(self.close, 20))
+        assert_parity(upper, ref_sma(self.close, 20) + 2.0 * ref_stdev(self.close, 20))
+        assert_parity(lower, ref_sma(self.close, 20) - 2.0 * ref_stdev(self.close, 20))
+
+    @pytest.mark.parametrize("length", [1, 3, 14, 64])
+    def test_highest_lowest(self, length):
+        assert_parity(ta.highest(self.high, length), ref_extreme(self.high, length, max))
+        assert_parity(ta.lowest(self.low, length), ref_extreme(self.low, length, min))
+
+    @pytest.mark.parametrize("k, d", [(14, 3), (5, 1), (30, 5)])
+    def test_stochastic(self, k, d):
+        k_line, d_line = ta.stochastic(self.close, self.high, self.low, k, d)
+        expected = ref_stoch(self.close, self.high, self.low, k)
+        assert_parity(k_line, expected)
+        assert np.isnan(k_line[529])  # every window ending here is flat
+        assert_parity(d_line, ref_sma(expected, d))
+
+    @pytest.mark.parametrize("length", [1, 14, 30])
+    def test_atr(self, length):
+        expected = ref_rma(ref_tr(self.high, self.low, self.close, True), length)
+        assert_parity(ta.atr(self.high, self.low, self.close, length), expected)
+
+    @pytest.mark.parametrize("di_length, adx_length", [(14, 14), (7, 21)])
+    def test_dmi(self, di_length, adx_length):
+        for actual, expected in zip(ta.dmi(self.high, self.low, self.close, di_length, adx_length),
+                                    ref_dmi(self.high, self.low, self.close, di_length, adx_length)):
+            assert_parity(actual, expected)
+
+    def test_rolling_extreme_propagates_na(self):
+        src = np.arange(20, dtype=float)
+        src[7] = np.nan
+        out = ta.highest(src, 4)
+        assert np.isnan(out[7:11]).all() and out[11] == 11.0 and out[6] == 6.0
+
+    def test_short_series(self):
+        assert np.isnan(ta.atr(self.high[:5], self.low[:5], self.close[:5], 14)).all()
+        assert np.isnan(ta.dmi(self.high[:5], self.low[:5], self.close[:5], 14, 14)[2]).all()
+        assert np.isnan(ta.stochastic(self.close[:5], self.high[:5], self.low[:5], 14, 3)[0]).all()
+
+
+class TestBacktestNodes:
+    """The backtest evaluates the new indicators on the chart's OHLC."""
+
+    high, low, close = ohlc(600)
+
+    @pytest.mark.parametrize("name, params, expected", [
+        ("Stochastic", {"k": 14, "d": 3}, lambda h, l, c: ta.stochastic(c, h, l, 14, 3)[0]),
+        ("ATR", {"period": "10"}, lambda h, l, c: ta.atr(h, l, c, 10)),
+        ("ADX", {"period": 14}, lambda h, l, c: ta.dmi(h, l, c, 14, 14)[2]),
+    ])
+    def test_indicator_nodes(self, name, params, expected):
+        data = prepare_data({"close": self.close, "high": self.high, "low": self.low})
+        actual = evaluate_indicator(name, params, data["close"], data)
+        assert_parity(actual, expected(self.high, self.low, self.close))
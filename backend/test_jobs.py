@@ -0,0 +1,172 @@
+"""
+Backtest job queue tests
+
+Usage:
+    python -m pytest test_jobs.py -v
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from backtest import run_backtest
+from jobs import JobManager, QueueFull
+from test_backtest import EMA_FLIP, random_walk
+
+
+def wait_for(manager: JobManager, job_id: str, timeout: float = 5.0) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        snapshot = manager.get(job_id).snapshot()
+        if snapshot["status"] not in ("queued", "running"):
+            return snapshot
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def blocked(gate: threading.Event, value=None):
+    """A job that holds its worker until the gate opens"""
+    def run(report):
+        report("processing")
+        gate.wait(5)
+        report("results")
+        return value
+    return run
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. JOB MANAGER
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestJobManager:
+    """Ordering, admission, cancellation and expiry."""
+
+    def test_result_and_progress(self):
+        manager = JobManager(workers=1)
+        gate = threading.Event()
+        job = manager.submit(blocked(gate, 42))
+        deadline = time.time() + 5
+        while job.phase != "processing" and time.time() < deadline:
+            time.sleep(0.01)
+        assert job.snapshot()["status"] == "running" and job.snapshot()["progress"] == 10
+        gate.set()
+        snapshot = wait_for(manager, job.id)
+        assert snapshot["status"] == "completed" and snapshot["result"] == 42
+        assert snapshot["progress"] == 100 and snapshot["elapsed"] >= 0
+
+    def test_priority_then_fifo(self):
+        manager = JobManager(workers=1)
+        gate = threading.Event()
+        order = []
+        manager.submit(blocked(gate))
+        jobs = [manager.submit(lambda report, name=name: order.append(name), priority=priority)
+                for name, priority in (("low", 0), ("high-1", 5), ("high-2", 5), ("low-2", 0))]
+        gate.set()
+        for job in jobs:
+            wait_for(manager, job.id)
+        assert order == ["high-1", "high-2", "low", "low-2"]
+
+    def test_admission_control(self):
+        manager = JobManager(workers=1, max_queued=2)
+        gate = threading.Event()
+        manager.submit(blocked(gate))
+        time.sleep(0.05)  # the first job is now running, not queued
+        manager.submit(blocked(gate))
+        manager.submit(blocked(gate))
+        with pytest.raises(QueueFull):
+            manager.submit(blocked(gate))
+        assert manager.rejected == 1
+        gate.set()
+
+    def test_cancel_queued_and_running(self):
+        manager = JobManager(workers=1)
+        gate = threading.Event()
+        running = manager.submit(blocked(gate))
+        time.sleep(0.05)
+        queued = manager.submit(lambda report: pytest.fail("cancelled job ran"))
+        assert manager.cancel(queued.id).status == "cancelled"
+        assert manager.queued == 0
+        manager.cancel(running.id)
+        gate.set()
+        assert wait_for(manager, running.id)["status"] == "cancelled"
+        assert manager.cancel("missing") is None
+
+    def test_errors_are_reported(self):
+        manager = JobManager(workers=1)
+
+        def broken(report):
+            raise ValueError("no bars")
+
+        snapshot = wait_for(manager, manager.submit(broken).id)
+        assert snapshot["status"] == "error" and snapshot["message"] == "no bars"
+        assert "result" not in snapshot
+
+    def test_finished_jobs_expire(self):
+        manager = JobManager(workers=1, ttl=0.05)
+        job = manager.submit(lambda report: 1)
+        wait_for(manager, job.id)
+        time.sleep(0.1)
+        assert manager.get(job.id) is None
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. ENDPOINTS
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestBacktestJobEndpoints:
+    """POST /api/backtest queues; /api/backtest/progress/{job_id} reports."""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        monkeypatch.setattr(main, "backtest_jobs", JobManager(workers=1, max_queued=1))
+        return TestClient(main.app)
+
+    def poll(self, client, job_id: str) -> dict:
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            data = client.get(f"/api/backtest/progress/{job_id}").json()
+            if data["status"] not in ("queued", "running"):
+                return data
+            time.sleep(0.01)
+        raise AssertionError("Backtest did not finish")
+
+    def test_job_result_matches_direct_run(self, client):
+        close = random_walk(400).tolist()
+        r = client.post("/api/backtest", json={"strategy": EMA_FLIP, "data": {"close": close}, "fee_bps": 5})
+        assert r.status_code == 200
+        data = self.poll(client, r.json()["job_id"])
+        assert data["status"] == "completed" and data["phase"] == "completed"
+        direct = run_backtest(EMA_FLIP, {"close": close}, fee_bps=5)
+        assert data["result"]["metrics"] == direct["metrics"]
+
+    def test_failures(self, client):
+        assert client.get("/api/backtest/progress/missing").status_code == 404
+        assert client.delete("/api/backtest/jobs/missing").status_code == 404
+        r = client.post("/api/backtest", json={"strategy": EMA_FLIP, "data": {"close": []}})
+        data = self.poll(client, r.json()["job_id"])
+        assert data["status"] == "error" and "close" in data["message"]
+
+    def test_queue_full_is_429(self, client):
+        gate = threading.Event()
+        main.backtest_jobs.submit(blocked(gate))
+        time.sleep(0.05)
+        main.backtest_jobs.submit(blocked(gate))
+        r = client.post("/api/backtest", json={"strategy": EMA_FLIP, "data": {"close": [1.0, 2.0]}})
+        assert r.status_code == 429 and r.headers["retry-after"]
+        gate.set()
+
+    def test_cancel(self, client):
+        gate = threading.Event()
+        main.backtest_jobs.submit(blocked(gate))
+        time.sleep(0.05)
+        r = client.post("/api/backtest", json={"strategy": EMA_FLIP, "data": {"close": [1.0, 2.0]}})
+        r = client.delete(f"/api/backtest/jobs/{r.json()['job_id']}")
+        assert r.status_code == 200 and r.json()["status"] == "cancelled"
+        gate.set()
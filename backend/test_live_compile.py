@@ -0,0 +1,95 @@
+"""
+Live-compile WebSocket tests
+
+Usage:
+    python -m pytest test_live_compile.py -v
+"""
+
+from __future__ import annotations
+
+import random
+
+from fastapi.testclient import TestClient
+
+from compile_session import apply_patch
+from compiler import compile_to_pinescript
+from live_compile import coalesce
+from main import app
+from test_compile_session import random_strategy
+from test_compiler import node
+
+client = TestClient(app)
+
+
+class TestCoalesce:
+    def test_init_supersedes_earlier_deltas(self):
+        strategy = {"name": "S", "nodes": [], "connections": []}
+        burst = [
+            {"type": "deltas", "deltas": [{"op": "remove_node", "node_id": "x"}], "seq": 1},
+            {"type": "init", "strategy": strategy, "seq": 2},
+            {"type": "deltas", "deltas": [{"op": "add_node"}], "seq": 3},
+        ]
+        assert coalesce(burst) == (strategy, [{"op": "add_node"}], [], 3)
+
+    def test_unknown_messages_are_errors(self):
+        _, _, errors, _ = coalesce([{"type": "nope"}, {"type": "deltas"}])
+        assert len(errors) == 2
+
+
+class TestLiveCompileSocket:
+    def test_init_then_coalesced_patch(self):
+        strategy = random_strategy(random.Random(5), 8)
+        with client.websocket_connect("/ws/compile") as ws:
+            ws.send_json({"type": "init", "strategy": strategy, "seq": 1})
+            reply = ws.receive_json()
+            assert reply["type"] == "code" and reply["seq"] == 1
+            lines = reply["code"].split("\n")
+
+            # A burst of edits to the same node arrives as one patch
+            for seq, period in enumerate([30, 31, 32], start=2):
+                ws.send_json({"type": "deltas", "seq": seq, "deltas": [
+                    {"op": "set_parameters", "node_id": "ind-0", "parameters": {"period": period}},
+                ]})
+            received = []
+            while not received or received[-1]["seq"] != 4:
+                received.append(ws.receive_json())
+            assert all(r["type"] == "patch" for r in received)
+            assert sum(r["coalesced"] for r in received) == 3
+            for r in received:
+                lines = apply_patch(lines, r["patch"])
+
+        strategy["nodes"] = [{**n, "parameters": {**n["parameters"], "period": 32}} if n["id"] == "ind-0" else n
+                             for n in strategy["nodes"]]
+        assert "\n".join(lines) == compile_to_pinescript(strategy)
+
+    def test_errors_do_not_close_the_connection(self):
+        with client.websocket_connect("/ws/compile") as ws:
+            ws.send_json({"type": "deltas", "deltas": [], "seq": 1})
+            assert "init" in ws.receive_json()["errors"][0]
+            ws.send_text("not json")
+            assert ws.receive_json()["type"] == "error"
+            ws.send_json({"type": "init", "strategy": {"name": "S", "nodes": [node("e-1", "bogus", "EMA")],
+                                                       "connections": []}})
+            assert "Validation error" in ws.receive_json()["errors"][0]
+            ws.send_json({"type": "init", "strategy": {"name": "S", "nodes": [], "connections": []}})
+            assert ws.receive_json()["type"] == "code"
+            ws.send_json({"type": "deltas", "deltas": [{"op": "remove_node", "node_id": "missing"}]})
+            assert "Delta error" in ws.receive_json()["errors"][0]
+
+    def test_deltas_producing_an_invalid_graph_are_rejected(self):
+        strategy = {"name": "S", "nodes": [node("rsi-1", "indicator", "RSI"), node("sma-1", "indicator", "SMA"),
+                                           node("logic-1", "logic", "Low", value=30)],
+                    "connections": [{"source": "rsi-1", "target": "sma-1"}]}
+        with client.websocket_connect("/ws/compile") as ws:
+            ws.send_json({"type": "init", "strategy": strategy})
+            code = ws.receive_json()["code"]
+            ws.send_json({"type": "deltas", "deltas": [
+                {"op": "add_edge", "connection": {"source": "sma-1", "target": "rsi-1"}}]})
+            assert "Validation error" in ws.receive_json()["errors"][0]
+            ws.send_json({"type": "deltas", "deltas": [
+                {"op": "set_parameters", "node_id": "logic-1", "parameters": {"operator": "bogus"}}]})
+            assert "bogus" in ws.receive_json()["errors"][0]
+            # The session still holds the last valid graph
+            ws.send_json({"type": "deltas", "deltas": []})
+            assert ws.receive_json() == {"type": "patch", "version": 0, "patch": [], "seq": None, "coalesced": 1}
+        assert code == compile_to_pinescript(strategy)
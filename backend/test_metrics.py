@@ -0,0 +1,75 @@
+"""
+Server-Timing and /metrics tests
+
+Usage:
+    python -m pytest test_metrics.py -v
+"""
+
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+import metrics
+from main import app, compile_cache
+from test_compiler import node
+
+client = TestClient(app)
+
+STRATEGY = {"name": "Timed", "nodes": [node("ema-1", "indicator", "EMA", period=9)], "connections": []}
+
+
+def timing_entries(response) -> dict:
+    entries = {}
+    for entry in response.headers["server-timing"].split(", "):
+        name, _, value = entry.partition(";")
+        entries[name] = value
+    return entries
+
+
+class TestServerTiming:
+    def test_compile_reports_each_stage(self):
+        compile_cache.clear()
+        entries = timing_entries(client.post("/api/compile/temp", json=STRATEGY))
+        for name in ("parse", "validate", "toposort", "lower", "emit", "total"):
+            assert entries[name].startswith("dur=")
+        assert entries["cache"] == 'desc="miss"'
+
+    def test_cache_hit_skips_compile_stages(self):
+        client.post("/api/compile/temp", json=STRATEGY)
+        entries = timing_entries(client.post("/api/compile/temp", json=STRATEGY))
+        assert entries["cache"] == 'desc="hit"'
+        assert "emit" not in entries
+
+    def test_stage_outside_a_request_is_a_no_op(self):
+        assert metrics.stage("anything") is metrics._NO_STAGE
+
+
+class TestMetricsEndpoint:
+    def test_exposes_requests_stages_and_gauges(self):
+        client.post("/api/compile/temp", json=STRATEGY)
+        body = client.get("/metrics").text
+        assert 'strategy_builder_requests_total{method="POST",route="/api/compile/temp",status="200"}' in body
+        assert 'strategy_builder_stage_duration_seconds_count{stage="emit"}' in body
+        assert "strategy_builder_compile_cache_hits_total" in body
+        assert "strategy_builder_strategies " in body
+
+    def test_unmatched_routes_share_one_label(self):
+        client.get("/no/such/path")
+        assert 'route="unmatched",status="404"' in client.get("/metrics").text
+
+
+class TestRegistry:
+    def test_histogram_buckets_are_cumulative(self):
+        registry = metrics.Registry()
+        for seconds in (0.0004, 0.003, 20.0):
+            registry.observe_request("GET", "/x", 200, seconds, [("emit", seconds)])
+        lines = registry.render().splitlines()
+        assert 'strategy_builder_request_duration_seconds_bucket{route="/x",le="0.0005"} 1' in lines
+        assert 'strategy_builder_request_duration_seconds_bucket{route="/x",le="0.005"} 2' in lines
+        assert 'strategy_builder_request_duration_seconds_bucket{route="/x",le="+Inf"} 3' in lines
+        assert 'strategy_builder_request_duration_seconds_count{route="/x"} 3' in lines
+
+    def test_labelled_collectors(self):
+        registry = metrics.Registry()
+        registry.register("jobs", "gauge", "Jobs by state", lambda: {(("state", "queued"),): 2})
+        assert 'strategy_builder_jobs{state="queued"} 2' in registry.render()
@@ -0,0 +1,119 @@
+"""
+MQL5 code generator tests
+
+Usage:
+    python -m pytest test_mql5.py -v
+"""
+
+from __future__ import annotations
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from compiler import compile_to_mql
+from test_backtest import EMA_FLIP
+from test_compiler import edge, node
+from test_ninjascript import RSI_STRATEGY
+
+
+def function(code: str, signature: str) -> str:
+    start = code.index(signature)
+    return code[start:code.index("\n}\n", start)]
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. HANDLES AND NEW-BAR GATING
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestExpertAdvisor:
+    """Handles live from OnInit to OnDeinit; OnTick works once per bar."""
+
+    def test_handles_are_created_once_and_released(self):
+        code = compile_to_mql(RSI_STRATEGY)
+        init, deinit, tick = (function(code, s) for s in ("int OnInit()", "void OnDeinit(", "void OnTick()"))
+        assert "rsi_1_handle = iRSI(_Symbol, _Period, 14, PRICE_CLOSE);" in init
+        assert "if(rsi_1_handle == INVALID_HANDLE)" in init
+        assert "IndicatorRelease(rsi_1_handle);" in deinit
+        assert "iRSI(" not in tick and "IndicatorRelease" not in tick
+
+    def test_tick_returns_until_a_new_bar_opens(self):
+        tick = function(compile_to_mql(RSI_STRATEGY), "void OnTick()")
+        gate = tick.index("if(barTime == lastBarTime)")
+        assert gate < tick.index("CopyBuffer(") < tick.index("lastBarTime = barTime;") < tick.index("bool canBuy")
+
+    def test_copies_only_the_bars_read(self):
+        code = compile_to_mql(RSI_STRATEGY)
+        assert "#define COPY_BARS 1" in code
+        assert "CopyBuffer(rsi_1_handle, 0, 1, COPY_BARS, rsi_1)" in code
+        assert "CopyClose(_Symbol, _Period, 1, COPY_BARS, bar_close)" in code
+        # A crossover needs the bar before as well
+        code = compile_to_mql(EMA_FLIP)
+        assert "#define COPY_BARS 2" in code
+        assert "bool logic_buy = ema_12[0] > ema_26[0] && ema_12[1] <= ema_26[1];" in code
+
+    def test_gated_entries_and_exits(self):
+        tick = function(compile_to_mql(RSI_STRATEGY), "void OnTick()")
+        assert "bool buy_trigger_1 = rsi_lt_30_1 && canBuy;" in tick
+        assert "bool sell_trigger_1 = rsi_gt_70_2 && canSell;" in tick
+        assert "stopLossPrice = entryPrice * (1 - 2.0 / 100);" in tick
+        assert "bool stopHit = positionOpen && stopLossPrice > 0 && bar_close[0] < stopLossPrice;" in tick
+        assert "takeProfitPrice" not in compile_to_mql(RSI_STRATEGY)
+
+    def test_braces_balance(self):
+        for strategy in (RSI_STRATEGY, EMA_FLIP):
+            code = compile_to_mql(strategy)
+            assert code.count("{") == code.count("}") and code.count("(") == code.count(")")
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. NODES
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestNodes:
+    """Every advertised indicator, chaining through handles and shared handles."""
+
+    @pytest.mark.parametrize("name, params, create", [
+        ("SMA", {"period": 20}, "iMA(_Symbol, _Period, 20, 0, MODE_SMA, PRICE_CLOSE)"),
+        ("EMA", {"period": "9"}, "iMA(_Symbol, _Period, 9, 0, MODE_EMA, PRICE_CLOSE)"),
+        ("MACD", {}, "iMACD(_Symbol, _Period, 12, 26, 9, PRICE_CLOSE)"),
+        ("Bollinger Bands", {"period": 20, "std_dev": 2}, "iBands(_Symbol, _Period, 20, 0, 2.0, PRICE_CLOSE)"),
+        ("Stochastic", {"k": 14, "d": 3}, "iStochastic(_Symbol, _Period, 14, 3, 1, MODE_SMA, STO_LOWHIGH)"),
+        ("ATR", {"period": 10}, "iATR(_Symbol, _Period, 10)"),
+        ("ADX", {"period": 14}, "iADXWilder(_Symbol, _Period, 14)"),
+    ])
+    def test_indicator(self, name, params, create):
+        strategy = {
+            "name": name,
+            "nodes": [node("ind-1", "indicator", name, **params), node("logic-1", "logic", "Above", operator=">", value=50),
+                      node("buy-1", "action", "Buy", actionType="buy")],
+            "connections": [edge("ind-1", "logic-1", "a"), edge("logic-1", "buy-1")],
+        }
+        code = compile_to_mql(strategy)
+        assert f"_handle = {create};" in code
+        assert ", 0, 1, COPY_BARS, " in code
+
+    def test_chained_indicators_take_the_upstream_handle(self):
+        strategy = {
+            "name": "Smoothed RSI",
+            "nodes": [node("rsi-1", "indicator", "RSI"), node("sma-1", "indicator", "SMA", period=5)],
+            "connections": [edge("rsi-1", "sma-1")],
+        }
+        assert "sma_1_handle = iMA(_Symbol, _Period, 5, 0, MODE_SMA, rsi_1_handle);" in compile_to_mql(strategy)
+
+    def test_duplicates_share_one_handle(self):
+        strategy = {
+            "name": "Dup",
+            "nodes": [node("rsi-1", "indicator", "RSI"), node("rsi-2", "indicator", "RSI"),
+                      node("lt-1", "logic", "A", operator="<", value=30), node("buy-1", "action", "Buy", actionType="buy")],
+            "connections": [edge("rsi-2", "lt-1", "a"), edge("lt-1", "buy-1")],
+        }
+        code = compile_to_mql({**strategy, "keep_display_indicators": True})
+        assert code.count("= iRSI(") == 1 and "// rsi_2 reuses rsi_1" in code
+        assert "bool a_1 = rsi_1[0] < 30.0;" in code
+
+    def test_endpoint(self):
+        r = TestClient(main.app).post("/api/compile/temp", json=EMA_FLIP, params={"target": "mql"})
+        assert r.status_code == 200 and r.json()["code"] == compile_to_mql(EMA_FLIP)
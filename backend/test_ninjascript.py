@@ -0,0 +1,152 @@
+"""
+NinjaScript (C#) code generator tests
+
+Usage:
+    python -m pytest test_ninjascript.py -v
+"""
+
+from __future__ import annotations
+
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from compiler import compile_to_csharp
+from ninjascript import class_name, identifier
+from test_backtest import EMA_FLIP
+from test_compiler import edge, node
+
+
+def on_bar_update(code: str) -> str:
+    return code[code.index("protected override void OnBarUpdate()"):]
+
+
+def data_loaded(code: str) -> str:
+    start = code.index("else if (State == State.DataLoaded)")
+    return code[start:code.index("protected override void OnBarUpdate()")]
+
+
+RSI_STRATEGY = {
+    "name": "RSI Dip",
+    "nodes": [
+        node("start", "input", "Strategy Start"),
+        node("rsi-1", "indicator", "RSI", period=14),
+        node("logic-1", "logic", "RSI < 30", operator="<", value=30),
+        node("logic-2", "logic", "RSI > 70", operator=">", value=70),
+        node("buy-1", "action", "Buy", actionType="buy", stopLoss="2", takeProfit=""),
+        node("sell-1", "action", "Sell", actionType="sell"),
+    ],
+    "connections": [
+        edge("start", "rsi-1"), edge("rsi-1", "logic-1", "a"), edge("rsi-1", "logic-2", "a"),
+        edge("logic-1", "buy-1"), edge("logic-2", "sell-1"),
+    ],
+}
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. STRATEGY STRUCTURE
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestStructure:
+    """Indicators are created once; OnBarUpdate only reads them."""
+
+    def test_indicators_are_created_in_data_loaded(self):
+        code = compile_to_csharp(RSI_STRATEGY)
+        assert "public class RSIDip : Strategy" in code
+        assert "private RSI rsi_1;" in code
+        assert "rsi_1 = RSI(Close, 14, 1);" in data_loaded(code)
+        assert "RSI(" not in on_bar_update(code)
+        assert "bool rsi_lt_30_1 = rsi_1[0] < 30.0;" in on_bar_update(code)
+
+    def test_no_per_bar_allocation(self):
+        for strategy in (RSI_STRATEGY, EMA_FLIP):
+            body = on_bar_update(compile_to_csharp(strategy))
+            assert "new " not in body
+            assert set(re.findall(r"^\s+(\w+) \w+ = ", body, re.M)) <= {"bool"}
+
+    def test_entries_and_exits_are_mutually_exclusive(self):
+        body = on_bar_update(compile_to_csharp(RSI_STRATEGY))
+        assert "bool canBuy = !positionOpen;" in body and "bool canSell = positionOpen;" in body
+        assert "bool buy_trigger_1 = rsi_lt_30_1 && canBuy;" in body
+        assert "bool sell_trigger_1 = rsi_gt_70_2 && canSell;" in body
+        assert "stopLossPrice = entryPrice * (1 - 2.0 / 100);" in body
+        # Only a stop is set, so there is no take-profit state at all
+        assert "takeProfitPrice" not in compile_to_csharp(RSI_STRATEGY)
+        assert 'ExitLong("Stop Loss Hit", "Long");' in body
+
+    def test_braces_balance(self):
+        for strategy in (RSI_STRATEGY, EMA_FLIP):
+            code = compile_to_csharp(strategy)
+            assert code.count("{") == code.count("}")
+
+    def test_stop_and_target(self):
+        body = on_bar_update(compile_to_csharp(EMA_FLIP))
+        assert "bool logic_buy = CrossAbove(ema_12, ema_26, 1);" in body
+        assert "takeProfitPrice = entryPrice * (1 + 4.0 / 100);" in body
+        assert "if (stopHit || targetHit)" in body
+        assert 'ExitLong(stopHit ? "Stop Loss Hit" : "Take Profit Hit", "Long");' in body
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. NODES
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestNodes:
+    """Every advertised indicator, chaining and shared instances."""
+
+    @pytest.mark.parametrize("name, params, call, value", [
+        ("SMA", {"period": 20}, "SMA(Close, 20)", "sma_1[0]"),
+        ("EMA", {"period": "9"}, "EMA(Close, 9)", "ema_1[0]"),
+        ("MACD", {}, "MACD(Close, 12, 26, 9)", "macd_1[0]"),
+        ("Bollinger Bands", {"period": 20, "std_dev": 2}, "Bollinger(Close, 2.0, 20)", "bollinger_bands_1.Middle[0]"),
+        ("Stochastic", {"k": 14, "d": 3}, "Stochastics(Close, 3, 14, 1)", "stochastic_1.K[0]"),
+        ("ATR", {"period": 10}, "ATR(10)", "atr_1[0]"),
+        ("ADX", {"period": 14}, "ADX(14)", "adx_1[0]"),
+    ])
+    def test_indicator(self, name, params, call, value):
+        strategy = {
+            "name": name,
+            "nodes": [node("ind-1", "indicator", name, **params), node("logic-1", "logic", "Above", operator=">", value=50),
+                      node("buy-1", "action", "Buy", actionType="buy")],
+            "connections": [edge("ind-1", "logic-1", "a"), edge("logic-1", "buy-1")],
+        }
+        code = compile_to_csharp(strategy)
+        assert f" = {call};" in data_loaded(code)
+        assert f"bool above_1 = {value} > 50.0;" in on_bar_update(code)
+
+    def test_chained_indicators_take_the_instance_as_input(self):
+        strategy = {
+            "name": "Smoothed RSI",
+            "nodes": [node("rsi-1", "indicator", "RSI"), node("sma-1", "indicator", "SMA", period=5)],
+            "connections": [edge("rsi-1", "sma-1")],
+        }
+        assert "sma_1 = SMA(rsi_1, 5);" in compile_to_csharp(strategy)
+
+    def test_duplicates_share_one_instance(self):
+        strategy = {
+            "name": "Dup",
+            "nodes": [
+                node("rsi-1", "indicator", "RSI"), node("rsi-2", "indicator", "RSI"),
+                node("lt-1", "logic", "A", operator="<", value=30), node("gt-2", "logic", "B", operator=">", value=30),
+                node("and-1", "logic", "Both", operator="and"),
+                node("buy-1", "action", "Buy", actionType="buy"),
+            ],
+            "connections": [edge("rsi-1", "lt-1", "a"), edge("rsi-2", "gt-2", "a"), edge("lt-1", "and-1", "a"),
+                            edge("gt-2", "and-1", "b"), edge("and-1", "buy-1")],
+        }
+        code = compile_to_csharp(strategy)
+        assert code.count("= RSI(") == 1 and "// rsi_2 reuses rsi_1" in code
+        assert "bool both_1 = a_1 && b_2;" in code
+
+    def test_names_become_identifiers(self):
+        assert identifier("rsi_%k_1") == "rsi__k_1" and identifier("1_x") == "_1_x"
+        assert class_name("3 bar reversal") == "Generated3BarReversal"
+        assert class_name("") == "GeneratedStrategy"
+
+    def test_endpoint(self):
+        r = TestClient(main.app).post("/api/compile/temp", json=EMA_FLIP, params={"target": "csharp"})
+        assert r.status_code == 200 and r.json()["code"] == compile_to_csharp(EMA_FLIP)
@@ -0,0 +1,130 @@
+"""
+Node handler registry tests
+
+Usage:
+    python -m pytest test_nodes.py -v
+"""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import nodes
+from backtest import evaluate_indicator, evaluate_strategy, prepare_data
+from compiler import compile_to_csharp, compile_to_mql, compile_to_pinescript
+from ir import lower_strategy
+from nodes import KIND_INDICATOR, KIND_LOGIC, NodeHandler, handler, handlers, register
+from test_compiler import edge, node
+
+
+def pine_momentum(node, sources, has_sl, has_tp):
+    length = node.params["length"]
+    return f"ta.mom({sources['source']}, {length})", [f"{node.var} = ta.mom({sources['source']}, {length})"]
+
+
+def momentum_kernel(params, source, data):
+    out = np.full(len(source), np.nan)
+    out[params["length"]:] = source[params["length"]:] - source[:-params["length"]]
+    return out
+
+
+MOMENTUM = NodeHandler(KIND_INDICATOR, "Momentum", {"pinescript": "test_nodes:pine_momentum"}, ports={"source": ("default", "close")},
+                       params={"length": (int, 10)}, kernel="test_nodes:momentum_kernel",
+                       id="momentum", category="momentum")
+
+
+@pytest.fixture
+def momentum(monkeypatch):
+    monkeypatch.setitem(nodes._handlers, (KIND_INDICATOR, "Momentum"), MOMENTUM)
+    return MOMENTUM
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. REGISTRY
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestRegistry:
+    """Lookup, fallbacks, parameter schema and lazy references."""
+
+    def test_lookup_and_fallback(self):
+        assert handler(KIND_INDICATOR, "RSI").id == "rsi"
+        assert handler(KIND_INDICATOR, "Nope").name is None
+        assert handler(KIND_LOGIC, "RSI < 30") is handler(KIND_LOGIC)
+        assert handler("output") is None
+        assert [h.name for h in handlers(KIND_INDICATOR)] == [
+            "RSI", "MACD", "SMA", "EMA", "Bollinger Bands", "Stochastic", "ATR", "ADX"]
+
+    def test_coerce(self):
+        bands = handler(KIND_INDICATOR, "Bollinger Bands")
+        assert bands.coerce({"period": "21.0", "std_dev": "2.5"}) == {"period": 21, "std_dev": 2.5}
+        assert bands.coerce({"period": "abc"}) == {"period": 20, "std_dev": 2}
+
+    def test_references_resolve_on_first_use(self):
+        lazy = NodeHandler(KIND_INDICATOR, "Lazy", {"pinescript": "test_nodes:pine_momentum"},
+                           kernel="test_nodes:momentum_kernel")
+        assert isinstance(lazy._emit["pinescript"], str) and isinstance(lazy._kernel, str)
+        assert lazy.pine is pine_momentum and lazy.kernel is momentum_kernel
+        plain = NodeHandler(KIND_INDICATOR, "Plain", {"pinescript": pine_momentum})
+        assert plain.kernel is None and plain.emitter("csharp") is None
+
+    def test_compiling_does_not_import_numpy(self):
+        script = "import sys, compiler; compiler.compile_to_pinescript({'nodes': []}); print('numpy' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+        assert result.stdout.strip() == "False"
+
+    def test_register_replaces(self, monkeypatch):
+        monkeypatch.setattr(nodes, "_handlers", dict(nodes._handlers))
+        replacement = NodeHandler(KIND_INDICATOR, "RSI", {"pinescript": pine_momentum}, params={"length": (int, 3)})
+        assert register(replacement) is replacement and handler(KIND_INDICATOR, "RSI") is replacement
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. A REGISTERED NODE, END TO END
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+STRATEGY = {
+    "name": "Momentum",
+    "nodes": [
+        node("start", "input", "Strategy Start"),
+        node("mom-1", "indicator", "Momentum"),
+        node("logic-1", "logic", "Mom > 0", operator=">", value=0),
+        node("buy-1", "action", "Buy", actionType="buy"),
+    ],
+    "connections": [edge("start", "mom-1"), edge("mom-1", "logic-1", "a"), edge("logic-1", "buy-1")],
+}
+
+
+class TestRegisteredNode:
+    """A node type added with one register() call compiles, evaluates and is listed."""
+
+    def test_lowering_fills_ports_and_defaults(self, momentum):
+        mom = lower_strategy(STRATEGY).nodes[1]
+        assert mom.handler is momentum
+        assert mom.inputs == {"source": 0} and mom.params == {"length": 10}
+
+    def test_compiles(self, momentum):
+        code = compile_to_pinescript(STRATEGY)
+        assert "momentum_1 = ta.mom(close, 10)" in code
+        assert "buy_trigger_1 = momentum_1 > 0 and can_buy" in code
+        # Targets the handler has no emitter for say so instead of failing
+        assert "// momentum_1: Momentum has no NinjaScript emitter" in compile_to_csharp(STRATEGY)
+        assert "// momentum_1: Momentum has no MQL5 emitter" in compile_to_mql(STRATEGY)
+
+    def test_evaluates(self, momentum):
+        data = prepare_data({"close": np.arange(30, dtype=float) ** 2})
+        outputs = evaluate_strategy(STRATEGY, data)
+        np.testing.assert_array_equal(outputs["mom-1"], momentum_kernel({"length": 10}, data["close"], data))
+        np.testing.assert_array_equal(evaluate_indicator("Momentum", {"length": "5"}, data["close"], data)[5:],
+                                      data["close"][5:] - data["close"][:-5])
+
+    def test_listed(self, momentum):
+        listed = TestClient(main.app).get("/api/indicators").json()
+        assert listed[-1] == {"id": "momentum", "name": "Momentum", "category": "momentum", "default_params": {"length": 10}}
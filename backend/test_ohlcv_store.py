@@ -0,0 +1,143 @@
+"""
+Memory-mapped OHLCV store tests
+
+Usage:
+    python -m pytest test_ohlcv_store.py -v
+"""
+
+from __future__ import annotations
+
+import os
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from backtest import backtest_arrays, run_backtest
+from ohlcv_store import COLUMNS, OHLCVStore
+from test_backtest import EMA_FLIP, random_walk
+
+
+def bars(start: int, count: int, seed: int = 1) -> dict:
+    close = random_walk(count, seed)
+    return {
+        "timestamp": list(range(start, start + count * 60, 60)),
+        "open": (close * 0.999).tolist(),
+        "high": (close * 1.01).tolist(),
+        "low": (close * 0.99).tolist(),
+        "close": close.tolist(),
+        "volume": [1000.0] * count,
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return OHLCVStore(str(tmp_path / "ohlcv"))
+
+
+class TestOHLCVStore:
+    def test_append_and_load(self, store):
+        data = bars(0, 100)
+        assert store.append("BTC-USD", "1m", data) == 100
+        arrays = store.load("BTC-USD", "1m")
+        assert set(arrays) == set(COLUMNS)
+        np.testing.assert_array_equal(arrays["close"], data["close"])
+        assert arrays["timestamp"].dtype == np.int64
+        assert store.info("BTC-USD", "1m") == {"symbol": "BTC-USD", "interval": "1m", "bars": 100,
+                                               "start": 0, "end": 99 * 60}
+
+    def test_range_slices_are_mapped_views(self, store):
+        store.append("BTC-USD", "1m", bars(0, 100))
+        columns = store.columns("BTC-USD", "1m")
+        assert isinstance(columns["close"], np.memmap)
+        arrays = store.load("BTC-USD", "1m", start=600, end=1190)
+        assert arrays["timestamp"][0] == 600 and arrays["timestamp"][-1] == 1140
+        assert len(arrays["close"]) == 10
+        assert np.shares_memory(arrays["close"], columns["close"])
+        assert not arrays["close"].flags.writeable
+        with pytest.raises(ValueError):
+            store.load("BTC-USD", "1m", start=10_000)
+
+    def test_append_skips_stored_bars(self, store):
+        store.append("ETH", "5m", bars(0, 50))
+        old = store.load("ETH", "5m")
+        overlap = bars(40 * 60, 30, seed=2)
+        assert store.append("ETH", "5m", overlap) == 20
+        arrays = store.load("ETH", "5m")
+        assert len(arrays["close"]) == 70
+        np.testing.assert_array_equal(arrays["timestamp"], np.arange(70) * 60)
+        # Views taken before the append still read the original bars
+        assert len(old["close"]) == 50
+        assert store.append("ETH", "5m", overlap) == 0
+
+    def test_bad_appends_are_rejected(self, store):
+        with pytest.raises(ValueError, match="strictly increasing"):
+            store.append("X", "1d", {"timestamp": [2, 1], "close": [1.0, 2.0]})
+        with pytest.raises(ValueError, match="timestamp"):
+            store.append("X", "1d", {"close": [1.0]})
+        with pytest.raises(ValueError, match="'high'"):
+            store.append("X", "1d", {"timestamp": [1, 2], "close": [1.0, 2.0], "high": [1.0]})
+        with pytest.raises(ValueError, match="Invalid symbol"):
+            store.append("../etc", "1d", {"timestamp": [1], "close": [1.0]})
+
+    def test_missing_columns_fall_back_to_close(self, store):
+        store.append("X", "1d", {"timestamp": [1, 2], "close": [10.0, 11.0]})
+        arrays = store.load("X", "1d")
+        np.testing.assert_array_equal(arrays["high"], [10.0, 11.0])
+        np.testing.assert_array_equal(arrays["volume"], [0.0, 0.0])
+
+    def test_torn_append_is_ignored_then_repaired(self, store, tmp_path):
+        store.append("X", "1h", bars(0, 10))
+        with open(tmp_path / "ohlcv" / "X" / "1h" / "close.bin", "ab") as f:
+            f.write(np.zeros(3).tobytes())
+        assert store.info("X", "1h")["bars"] == 10
+        store.append("X", "1h", bars(600, 5))
+        assert os.path.getsize(tmp_path / "ohlcv" / "X" / "1h" / "close.bin") == 15 * 8
+        assert store.info("X", "1h")["bars"] == 15
+
+    def test_series_and_delete(self, store):
+        store.append("B", "1m", bars(0, 3))
+        store.append("A", "1d", bars(0, 2))
+        assert [(s["symbol"], s["interval"]) for s in store.series()] == [("A", "1d"), ("B", "1m")]
+        assert store.delete("A", "1d") and not store.delete("A", "1d")
+        assert store.info("A", "1d") is None
+
+    def test_backtest_over_mapped_columns(self, store):
+        data = bars(0, 400)
+        store.append("BTC-USD", "1m", data)
+        mapped = backtest_arrays(EMA_FLIP, store.load("BTC-USD", "1m"))
+        inline = run_backtest(EMA_FLIP, data)
+        assert mapped["metrics"] == inline["metrics"]
+
+
+class TestOHLCVEndpoints:
+    @pytest.fixture
+    def client(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(main, "ohlcv_store", OHLCVStore(str(tmp_path / "api")))
+        return TestClient(main.app)
+
+    def test_append_then_backtest_from_store(self, client):
+        data = bars(0, 400)
+        r = client.post("/api/data/BTC-USD/1m", json=data)
+        assert r.status_code == 200 and r.json()["appended"] == 400
+        assert client.get("/api/data").json()[0]["bars"] == 400
+
+        source = {"symbol": "BTC-USD", "interval": "1m", "start": 60 * 100}
+        r = client.post("/api/backtest/run", json={"strategy": EMA_FLIP, "source": source})
+        assert r.status_code == 200
+        assert len(r.json()["equity"]) == 300
+
+        r = client.post("/api/backtest/sweep", json={
+            "strategy": EMA_FLIP, "source": source,
+            "parameters": [{"node_id": "ema-12", "parameter": "period", "values": [8, 12]}],
+        })
+        assert r.status_code == 200 and r.json()["combinations"] == 2
+
+    def test_errors(self, client):
+        assert client.get("/api/data/NOPE/1m").status_code == 404
+        assert client.post("/api/data/X/1m", json={"close": [1.0]}).status_code == 400
+        r = client.post("/api/backtest", json={"strategy": EMA_FLIP})
+        assert r.status_code == 400 and "either" in r.json()["detail"]
+        r = client.post("/api/backtest/run", json={"strategy": EMA_FLIP, "source": {"symbol": "NOPE", "interval": "1m"}})
+        assert r.status_code == 400
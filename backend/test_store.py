@@ -0,0 +1,123 @@
+"""
+Strategy store tests
+
+Usage:
+    python -m pytest test_store.py -v
+"""
+
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from store import StrategyStore
+
+
+def make_strategy(strategy_id: str, name: str = "S") -> dict:
+    return {"id": strategy_id, "name": name, "nodes": [], "connections": [], "target_platform": "pinescript"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return StrategyStore(str(tmp_path / "strategies.db"))
+
+
+class TestStrategyStore:
+    def test_save_and_get(self, store):
+        store.save(make_strategy("a", "Alpha"))
+        assert store.get("a")["name"] == "Alpha"
+        assert store.get("missing") is None
+
+    def test_save_replaces_in_place(self, store):
+        store.save(make_strategy("a", "Old"))
+        store.save(make_strategy("b"))
+        store.save(make_strategy("a", "New"))
+        items, _ = store.list()
+        assert [s["id"] for s in items] == ["a", "b"]
+        assert items[0]["name"] == "New"
+        assert store.count() == 2
+
+    def test_cursor_pagination_covers_everything_once(self, store):
+        for i in range(25):
+            store.save(make_strategy(f"s{i}"))
+        seen, cursor = [], None
+        while True:
+            items, cursor = store.list(cursor, limit=10)
+            seen.extend(s["id"] for s in items)
+            if cursor is None:
+                break
+        assert seen == [f"s{i}" for i in range(25)]
+
+    def test_exact_page_has_no_next_cursor(self, store):
+        for i in range(10):
+            store.save(make_strategy(f"s{i}"))
+        items, cursor = store.list(limit=10)
+        assert len(items) == 10 and cursor is None
+
+    def test_field_projection(self, store):
+        store.save(make_strategy("a", "Alpha"))
+        assert store.list(fields=["id", "name"])[0] == [{"id": "a", "name": "Alpha"}]
+        assert store.list(fields=["nodes"])[0] == [{"nodes": []}]
+
+    def test_get_many_and_delete(self, store):
+        store.save(make_strategy("a"))
+        store.save(make_strategy("b"))
+        assert set(store.get_many(["a", "b", "c"])) == {"a", "b"}
+        assert store.delete("a") and not store.delete("a")
+        assert store.get("a") is None
+
+    def test_concurrent_writes(self, store):
+        def writer(t):
+            for i in range(50):
+                store.save(make_strategy(f"t{t}-{i}"))
+        threads = [threading.Thread(target=writer, args=(t,)) for t in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert store.count() == 400
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "strategies.db")
+        StrategyStore(path).save(make_strategy("a"))
+        assert StrategyStore(path).get("a")["id"] == "a"
+
+
+class TestStrategiesEndpoint:
+    @pytest.fixture
+    def client(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(main, "strategy_store", StrategyStore(str(tmp_path / "api.db")))
+        return TestClient(main.app)
+
+    def test_paginated_listing(self, client):
+        for i in range(5):
+            client.post("/api/strategies", json={**make_strategy(f"s{i}", f"N{i}"), "nodes": [], "connections": []})
+        first = client.get("/api/strategies", params={"limit": 3, "fields": "id,name"})
+        assert first.status_code == 200
+        assert first.json() == [{"id": f"s{i}", "name": f"N{i}"} for i in range(3)]
+        rest = client.get("/api/strategies", params={"limit": 3, "cursor": first.headers["X-Next-Cursor"]})
+        assert [s["id"] for s in rest.json()] == ["s3", "s4"]
+        assert "X-Next-Cursor" not in rest.headers
+
+    def test_unpaginated_without_cursor_or_limit(self, client):
+        for i in range(120):
+            client.post("/api/strategies", json={**make_strategy(f"s{i}"), "nodes": [], "connections": []})
+        everything = client.get("/api/strategies", params={"fields": "id"})
+        assert [s["id"] for s in everything.json()] == [f"s{i}" for i in range(120)]
+        assert "X-Next-Cursor" not in everything.headers
+        # An explicit cursor alone pages with the default limit
+        assert len(client.get("/api/strategies", params={"cursor": "0"}).json()) == 100
+
+    def test_cursor_header_is_exposed_to_the_frontend(self, client):
+        r = client.get("/api/strategies", params={"limit": 1}, headers={"Origin": "http://localhost:5173"})
+        assert "X-Next-Cursor" in r.headers["access-control-expose-headers"]
+
+    def test_bad_cursor_and_limit(self, client):
+        assert client.get("/api/strategies", params={"cursor": "nope"}).status_code == 400
+        assert client.get("/api/strategies", params={"limit": 0}).status_code == 400
+
+    def test_compile_saved_strategy(self, client):
+        client.post("/api/strategies", json=make_strategy("saved"))
+        assert client.post("/api/compile/saved").status_code == 200
+        assert client.post("/api/compile/unknown").status_code == 404
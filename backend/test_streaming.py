@@ -0,0 +1,161 @@
+"""
+Streamed code, streamed listings and response compression tests
+
+Usage:
+    python -m pytest test_streaming.py -v
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import zlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from benchmark import generate_strategy
+from compiler import COMPILERS, stream_code
+from compression import CompressionMiddleware, negotiate
+from store import StrategyStore
+from test_store import make_strategy
+
+LARGE = generate_strategy(2000, seed=3)
+
+
+@pytest.fixture
+def client():
+    main.compile_cache.clear()
+    return TestClient(main.app)
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. NEGOTIATION AND MIDDLEWARE
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestCompression:
+    """Accept-Encoding negotiation and chunk-wise compression."""
+
+    @pytest.mark.parametrize("header, available, expected", [
+        ("gzip, deflate, br", ["br", "gzip"], "br"),
+        ("gzip, deflate, br", ["gzip"], "gzip"),
+        ("br;q=0.5, gzip", ["br", "gzip"], "gzip"),
+        ("br;q=0, gzip;q=0", ["br", "gzip"], None),
+        ("*", ["br", "gzip"], "br"),
+        ("identity", ["br", "gzip"], None),
+        ("", ["gzip"], None),
+    ])
+    def test_negotiate(self, header, available, expected):
+        assert negotiate(header, available) == expected
+
+    def test_every_streamed_chunk_decodes_on_arrival(self):
+        """Each chunk is flushed, so the client can decode it before the next one exists."""
+        chunks = [(f"line {i}\n" * 400).encode() for i in range(3)]
+
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+            for i, chunk in enumerate(chunks):
+                await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+        asyncio.run(CompressionMiddleware(app)(scope, None, send))
+        headers = dict(sent[0]["headers"])
+        assert headers[b"content-encoding"] == b"gzip" and b"content-length" not in headers
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        for chunk, message in zip(chunks, sent[1:]):
+            assert decoder.decompress(message["body"]) == chunk
+
+    def test_small_and_uncompressible_responses_pass_through(self, client):
+        r = client.get("/api/indicators", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in r.headers
+        r = client.post("/api/compile/temp", json=LARGE, headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in r.headers
+
+    def test_large_json_is_gzipped(self, client):
+        r = client.post("/api/compile/temp", json=LARGE, headers={"Accept-Encoding": "gzip"})
+        assert r.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in r.headers["vary"]
+        assert int(r.headers["content-length"]) < len(r.json()["code"]) / 3
+        assert r.json()["code"] == COMPILERS["pinescript"](LARGE)
+
+    @pytest.mark.parametrize("path", ["/api/compile/temp", "/api/compile/stream"])
+    def test_each_encoding_has_its_own_strong_etag(self, client, path):
+        client.post("/api/compile/temp", json=LARGE)  # the stream endpoint only revalidates cached code
+        gzipped = client.post(path, json=LARGE, headers={"Accept-Encoding": "gzip"})
+        plain = client.post(path, json=LARGE, headers={"Accept-Encoding": "identity"})
+        assert gzipped.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+        # The gzip validator does not revalidate the identity representation, nor the other way round
+        r = client.post(path, json=LARGE, headers={"Accept-Encoding": "identity", "If-None-Match": gzipped.headers["etag"]})
+        assert r.status_code == 200 and r.headers["etag"] == plain.headers["etag"]
+        r = client.post(path, json=LARGE, headers={"Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["etag"]})
+        assert r.status_code == 304 and r.headers["etag"] == gzipped.headers["etag"]
+        r = client.post(path, json=LARGE, headers={"Accept-Encoding": "identity", "If-None-Match": plain.headers["etag"]})
+        assert r.status_code == 304 and r.headers["etag"] == plain.headers["etag"]
+
+    def test_brotli_when_installed(self, client):
+        pytest.importorskip("brotli")
+        r = client.post("/api/compile/stream", json=LARGE, headers={"Accept-Encoding": "br"})
+        assert r.headers["content-encoding"] == "br"
+        assert r.text == COMPILERS["pinescript"](LARGE)
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. STREAMED CODE
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestStreamedCode:
+    """stream_code and /api/compile/stream produce exactly the compiled code."""
+
+    @pytest.mark.parametrize("target", ["pinescript", "csharp", "mql"])
+    def test_chunks_join_to_compiled_code(self, target):
+        chunks = list(stream_code(LARGE, target, chunk_size=4096))
+        assert "".join(chunks) == COMPILERS[target](LARGE)
+        if target == "pinescript":
+            assert len(chunks) > 10 and all(len(chunk) < 8192 for chunk in chunks)
+
+    def test_endpoint_matches_temp(self, client):
+        r = client.post("/api/compile/stream", json=LARGE)
+        assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
+        temp = client.post("/api/compile/temp", json=LARGE)
+        assert r.text == temp.json()["code"] and r.headers["etag"] == temp.headers["etag"]
+        # Now cached: served from the cache, and revalidated with 304
+        assert client.post("/api/compile/stream", json=LARGE).text == r.text
+        r = client.post("/api/compile/stream", json=LARGE, headers={"If-None-Match": temp.headers["etag"]})
+        assert r.status_code == 304
+
+    def test_errors_before_streaming(self, client):
+        bad = {**LARGE, "nodes": [{**LARGE["nodes"][0], "type": "foobar"}] + LARGE["nodes"][1:]}
+        assert client.post("/api/compile/stream", json=bad).status_code == 400
+        assert client.post("/api/compile/stream", json=LARGE, params={"target": "cobol"}).status_code == 400
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 3. STREAMED LISTING
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestStrategyExport:
+    """GET /api/strategies/export streams every saved strategy as NDJSON."""
+
+    def test_export(self, client, monkeypatch, tmp_path):
+        store = StrategyStore(str(tmp_path / "export.db"))
+        for i in range(1203):
+            store.save(make_strategy(f"s{i:04d}", name=f"Strategy {i}"))
+        monkeypatch.setattr(main, "strategy_store", store)
+
+        r = client.get("/api/strategies/export", headers={"Accept-Encoding": "gzip"})
+        assert r.status_code == 200 and r.headers["content-encoding"] == "gzip"
+        lines = [json.loads(line) for line in r.text.splitlines()]
+        assert [s["id"] for s in lines] == [f"s{i:04d}" for i in range(1203)]
+
+        r = client.get("/api/strategies/export", params={"fields": "id,name"}, headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in r.headers
+        assert json.loads(r.text.splitlines()[5]) == {"id": "s0005", "name": "Strategy 5"}
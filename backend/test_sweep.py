@@ -0,0 +1,121 @@
+"""
+Parameter sweep tests
+
+Usage:
+    python -m pytest test_sweep.py -v
+"""
+
+from __future__ import annotations
+
+import pytest
+from fastapi.testclient import TestClient
+
+import indicators
+from backtest import run_backtest
+from main import app
+from sweep import expand_values, apply_overrides, reusable_nodes, run_sweep, validate_grid
+from test_backtest import EMA_FLIP, random_walk
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# SWEEPS
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestSweep:
+    """Grid search with shared node computation."""
+
+    def test_expand_values(self):
+        """Ranges are inclusive and keep integer parameters integral."""
+        assert expand_values(start=10, stop=20, step=5) == [10, 15, 20]
+        assert expand_values(start=0.5, stop=1.5, step=0.5) == [0.5, 1.0, 1.5]
+        assert expand_values(values=[3, 7]) == [3, 7]
+        with pytest.raises(ValueError):
+            expand_values(start=5, stop=1)
+
+    def test_overrides_do_not_mutate_original(self):
+        """Only the overridden node dicts are copied."""
+        variant = apply_overrides(EMA_FLIP, {"ema-12": {"period": 9}})
+        assert variant["nodes"][0]["parameters"]["period"] == 9
+        assert EMA_FLIP["nodes"][0]["parameters"]["period"] == 12
+        assert variant["nodes"][1] is EMA_FLIP["nodes"][1]
+
+    def test_reusable_nodes(self):
+        """Swept EMAs are reused; their crossovers are unique per combination."""
+        grid = {"ema-12": {"period": [5, 10]}, "ema-26": {"period": [20, 30]}}
+        assert reusable_nodes(EMA_FLIP, grid) == {"ema-12", "ema-26"}
+
+    def test_ema_grid_computes_each_ema_once(self, monkeypatch):
+        """A 5x5 EMA grid runs 10 EMA kernels, not 50."""
+        calls = []
+        real_ema = indicators.ema
+        monkeypatch.setattr(indicators, "ema", lambda src, length: calls.append(length) or real_ema(src, length))
+        grid = {"ema-12": {"period": [5, 8, 10, 12, 15]}, "ema-26": {"period": [20, 26, 30, 40, 50]}}
+        result = run_sweep(EMA_FLIP, {"close": random_walk(2000)}, grid)
+        assert result["combinations"] == 25
+        assert len(result["results"]) == 25
+        assert len(calls) == 10
+
+    def test_cached_series_counts_only_this_sweep(self):
+        """A shared cache's earlier entries are reused but not counted."""
+        data = {"close": random_walk(500)}
+        grid = {"ema-12": {"period": [5, 8]}, "ema-26": {"period": [20, 26]}}
+        cache = {}
+        assert run_sweep(EMA_FLIP, data, grid, cache=cache)["cached_series"] == 4
+        cache["unrelated"] = random_walk(500)
+        assert run_sweep(EMA_FLIP, data, grid, cache=cache)["cached_series"] == 0
+        grid["ema-12"]["period"].append(10)
+        assert run_sweep(EMA_FLIP, data, grid, cache=cache)["cached_series"] == 1
+
+    def test_results_match_individual_backtests(self):
+        """Cached evaluation gives the same metrics as a fresh backtest."""
+        close = random_walk(1500, 11)
+        grid = {"ema-12": {"period": [8, 12]}, "action-buy": {"stopLoss": [0, 1.5]}}
+        result = run_sweep(EMA_FLIP, {"close": close}, grid, fee_bps=2)
+        for entry in result["results"]:
+            variant = apply_overrides(EMA_FLIP, entry["parameters"])
+            expected = run_backtest(variant, {"close": close}, fee_bps=2)["metrics"]
+            assert entry["metrics"] == pytest.approx(expected)
+        returns = [entry["metrics"]["total_return_pct"] for entry in result["results"]]
+        assert returns == sorted(returns, reverse=True)
+
+    def test_unknown_node_rejected(self):
+        """Grids must reference nodes in the strategy."""
+        with pytest.raises(ValueError):
+            run_sweep(EMA_FLIP, {"close": random_walk(100)}, {"nope": {"period": [1]}})
+
+    def test_invalid_values_rejected(self):
+        """Every swept value must pass the node's parameter rules."""
+        validate_grid(EMA_FLIP, {"ema-12": {"period": [5, 10]}})
+        for bad in [0, -1, "abc", 2.5, None]:
+            with pytest.raises(ValueError, match="period"):
+                validate_grid(EMA_FLIP, {"ema-12": {"period": [5, bad]}})
+
+    def test_sweep_endpoint_rejects_invalid_values(self):
+        """An invalid swept value is a 400, not a run labeled with it."""
+        client = TestClient(app)
+        for bad in [0, -1, "abc", 2.5, None]:
+            r = client.post("/api/backtest/sweep", json={
+                "strategy": EMA_FLIP,
+                "data": {"close": random_walk(100).tolist()},
+                "parameters": [{"node_id": "ema-12", "parameter": "period", "values": [10, bad]}],
+            })
+            assert r.status_code == 400
+            assert r.json()["detail"].startswith("Sweep error")
+
+    def test_sweep_endpoint(self):
+        """POST /api/backtest/sweep expands ranges and returns the top results."""
+        client = TestClient(app)
+        r = client.post("/api/backtest/sweep", json={
+            "strategy": EMA_FLIP,
+            "data": {"close": random_walk(800).tolist()},
+            "parameters": [
+                {"node_id": "ema-12", "parameter": "period", "start": 5, "stop": 15, "step": 5},
+                {"node_id": "ema-26", "parameter": "period", "values": [20, 30]},
+            ],
+            "top": 4,
+        })
+        assert r.status_code == 200
+        data = r.json()
+        assert data["combinations"] == 6
+        assert len(data["results"]) == 4
@@ -0,0 +1,196 @@
+"""
+Strategy graph validator tests
+
+Usage:
+    python -m pytest test_validation.py -v
+"""
+
+from __future__ import annotations
+
+import copy
+
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmark import generate_strategy
+from validation import StrategyValidationError, check_strategy, validate_strategy
+import main
+
+
+# ─── Sample Data ──────────────────────────────────────────────────────────────
+
+def node(node_id, kind, name, **params):
+    return {"id": node_id, "type": kind, "name": name, "parameters": params, "position": {"x": 0, "y": 0}}
+
+
+SAMPLE_STRATEGY = {
+    "name": "Validation Test",
+    "nodes": [
+        node("start", "input", "Strategy Start"),
+        node("rsi-1", "indicator", "RSI", period=14),
+        node("sma-1", "indicator", "SMA", period=20),
+        node("logic-1", "logic", "RSI < SMA", operator="<", value=30),
+        node("action-1", "action", "Buy", actionType="buy", stopLoss=2, takeProfit=""),
+    ],
+    "connections": [
+        {"source": "start", "target": "rsi-1"},
+        {"source": "start", "target": "sma-1"},
+        {"source": "rsi-1", "target": "logic-1", "targetHandle": "a"},
+        {"source": "sma-1", "target": "logic-1", "targetHandle": "b"},
+        {"source": "logic-1", "target": "action-1"},
+    ],
+}
+
+
+def strategy(**changes):
+    result = copy.deepcopy(SAMPLE_STRATEGY)
+    result.update(changes)
+    return result
+
+
+def codes(report, key="errors"):
+    return [issue["code"] for issue in report[key]]
+
+
+# ─── Checks ───────────────────────────────────────────────────────────────────
+
+class TestCheckStrategy:
+    def test_valid_strategy(self):
+        assert check_strategy(SAMPLE_STRATEGY) == {"errors": [], "warnings": []}
+
+    def test_generated_strategies_are_valid(self):
+        for seed in range(5):
+            assert check_strategy(generate_strategy(300, seed=seed))["errors"] == []
+
+    def test_node_suffixed_types_accepted(self):
+        s = strategy()
+        s["nodes"][1]["type"] = "IndicatorNode"
+        assert check_strategy(s)["errors"] == []
+
+    def test_invalid_type(self):
+        s = strategy()
+        s["nodes"][1]["type"] = "foobar"
+        assert codes(check_strategy(s)) == ["node"]
+
+    def test_duplicate_id(self):
+        s = strategy()
+        s["nodes"].append(node("rsi-1", "indicator", "RSI", period=5))
+        assert "Duplicate node id: rsi-1" in [e["message"] for e in check_strategy(s)["errors"]]
+
+    @pytest.mark.parametrize("params", [{"period": 0}, {"period": 2.5}, {"period": "abc"}, {"std_dev": -1},
+                                        {"stopLoss": -2}])
+    def test_bad_parameters(self, params):
+        s = strategy()
+        s["nodes"][1]["parameters"] = params
+        report = check_strategy(s)
+        assert codes(report) == ["parameter"]
+        assert report["errors"][0]["node_id"] == "rsi-1"
+
+    def test_numeric_strings_accepted(self):
+        s = strategy()
+        s["nodes"][1]["parameters"] = {"period": "14"}
+        s["nodes"][4]["parameters"]["stopLoss"] = "1.5"
+        assert check_strategy(s)["errors"] == []
+
+    def test_bad_operator_and_action_type(self):
+        s = strategy()
+        s["nodes"][3]["parameters"]["operator"] = "=~"
+        s["nodes"][4]["parameters"]["actionType"] = "hold"
+        assert codes(check_strategy(s)) == ["parameter", "parameter"]
+
+    def test_threshold_only_needed_without_b(self):
+        s = strategy()
+        s["nodes"][3]["parameters"]["value"] = "n/a"
+        assert check_strategy(s)["errors"] == []
+        s["connections"] = [c for c in s["connections"] if c.get("targetHandle") != "b"]
+        assert codes(check_strategy(s)) == ["parameter"]
+
+    def test_dangling_edge(self):
+        s = strategy()
+        s["connections"].append({"source": "ghost", "target": "logic-1", "targetHandle": "b"})
+        report = check_strategy(s)
+        assert codes(report) == ["edge"]
+        assert report["errors"][0]["edge"] == 5
+        assert "ghost" in report["errors"][0]["message"]
+
+    def test_unknown_port(self):
+        s = strategy()
+        s["connections"][2]["targetHandle"] = "c"
+        report = check_strategy(s)
+        assert codes(report) == ["port"]
+        assert "accepts: a, b, default" in report["errors"][0]["message"]
+
+    def test_port_wired_twice(self):
+        s = strategy()
+        # 'default' and 'a' are the same port on a logic node
+        s["connections"].append({"source": "sma-1", "target": "logic-1"})
+        assert codes(check_strategy(s)) == ["port"]
+
+    def test_action_has_no_output(self):
+        s = strategy()
+        s["nodes"].append(node("logic-2", "logic", "Chained", operator="and"))
+        s["connections"].append({"source": "action-1", "target": "logic-2", "targetHandle": "a"})
+        assert "port" in codes(check_strategy(s))
+
+    def test_cycle(self):
+        s = strategy()
+        s["connections"].append({"source": "logic-1", "target": "rsi-1"})
+        report = check_strategy(s)
+        # rsi-1's source port is now wired twice as well
+        assert codes(report) == ["port", "cycle"]
+        assert "rsi-1" in report["errors"][1]["message"] and "logic-1" in report["errors"][1]["message"]
+
+    def test_all_errors_reported_at_once(self):
+        s = strategy()
+        s["nodes"][1]["parameters"]["period"] = -3
+        s["nodes"][3]["parameters"]["operator"] = "=~"
+        s["connections"].append({"source": "ghost", "target": "action-1"})
+        s["connections"][2]["targetHandle"] = "z"
+        with pytest.raises(StrategyValidationError) as info:
+            validate_strategy(s)
+        assert [e["code"] for e in info.value.errors] == ["parameter", "parameter", "port", "edge"]
+        assert str(info.value).count(";") == 3
+
+    def test_unreachable_and_unconnected_warnings(self):
+        s = strategy()
+        s["nodes"].append(node("ema-1", "indicator", "EMA", period=9))
+        s["nodes"].append(node("action-2", "action", "Sell", actionType="sell"))
+        s["connections"].append({"source": "start", "target": "ema-1"})
+        report = validate_strategy(s)
+        assert codes(report, "warnings") == ["unconnected", "unreachable"]
+        assert report["warnings"][1]["node_ids"] == ["ema-1"]
+
+    def test_no_reachability_warnings_without_actions(self):
+        s = strategy()
+        s["nodes"] = s["nodes"][:4]
+        s["connections"] = s["connections"][:4]
+        assert check_strategy(s) == {"errors": [], "warnings": []}
+
+
+# ─── API ──────────────────────────────────────────────────────────────────────
+
+@pytest.fixture
+def client():
+    main.compile_cache.clear()
+    return TestClient(main.app)
+
+
+class TestValidationAPI:
+    def test_validate_endpoint(self, client):
+        s = strategy()
+        s["connections"].append({"source": "logic-1", "target": "rsi-1"})
+        data = client.post("/api/validate", json=s).json()
+        assert data["valid"] is False
+        assert [e["code"] for e in data["errors"]] == ["port", "cycle"]
+
+    def test_validate_endpoint_valid(self, client):
+        data = client.post("/api/validate", json=SAMPLE_STRATEGY).json()
+        assert data == {"valid": True, "errors": [], "warnings": []}
+
+    def test_compile_rejects_broken_graph(self, client):
+        s = strategy()
+        s["connections"].append({"source": "ghost", "target": "logic-1", "targetHandle": "b"})
+        s["nodes"][1]["parameters"]["period"] = 0
+        r = client.post("/api/compile/temp", json=s)
+        assert r.status_code == 400
+        assert "ghost" in r.json()["detail"] and "'period'" in r.json()["detail"]
@@ -0,0 +1,167 @@
+"""
+Walk-forward optimization tests
+
+Usage:
+    python -m pytest test_walkforward.py -v
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import batch_backtest
+import main
+from backtest import prepare_data, summarize
+from ohlcv_store import OHLCVStore
+from sweep import apply_overrides
+from test_backtest import EMA_FLIP
+from test_ohlcv_store import bars
+from walkforward import plan_windows, strategy_signals, walk_forward, window_positions
+
+GRID = {"ema-12": {"period": [5, 8, 12]}, "ema-26": {"period": [20, 30]}}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def pool():
+    yield
+    batch_backtest.shutdown_pool()
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. WINDOWS
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestWindows:
+    """Fold layout and per-window trading."""
+
+    def test_rolling_and_anchored(self):
+        assert plan_windows(10, 4, 3) == [(0, 4, 7), (3, 7, 10)]
+        assert plan_windows(11, 4, 3) == [(0, 4, 7), (3, 7, 10), (6, 10, 11)]
+        assert plan_windows(11, 4, 3, anchored=True) == [(0, 4, 7), (0, 7, 10), (0, 10, 11)]
+        with pytest.raises(ValueError):
+            plan_windows(4, 4, 3)
+        with pytest.raises(ValueError):
+            plan_windows(100, 4, 0)
+
+    def test_signals_are_causal(self):
+        """Slicing full-history signals equals computing them on the prefix."""
+        arrays = prepare_data(bars(0, 400))
+        full = strategy_signals(EMA_FLIP, arrays)
+        prefix = strategy_signals(EMA_FLIP, {name: column[:250] for name, column in arrays.items()})
+        for name, values in prefix.items():
+            np.testing.assert_array_equal(full[name][:250], values)
+
+    def test_windows_close_out(self):
+        close = np.linspace(100, 110, 6)
+        arrays = {"close": close}
+        signals = {"buy": np.array([0, 1, 0, 0, 0, 1], dtype=bool), "sell": np.zeros(6, dtype=bool),
+                   "stop_pct": np.zeros(6), "target_pct": np.zeros(6)}
+        position, exit_reason = window_positions(arrays, signals, 0, 4)
+        assert position.tolist() == [0, 1, 1, 0] and exit_reason.tolist() == [0, 0, 0, 4]
+        # A buy on the last bar of a window is not taken
+        position, exit_reason = window_positions(arrays, signals, 4, 6)
+        assert position.tolist() == [0, 0] and exit_reason.tolist() == [0, 0]
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. OPTIMIZATION
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestWalkForward:
+    """Fold winners and the stitched out-of-sample run."""
+
+    arrays = prepare_data(bars(0, 600, seed=4))
+
+    def brute_force_best(self, start, end, options):
+        best = None
+        for fast in GRID["ema-12"]["period"]:
+            for slow in GRID["ema-26"]["period"]:
+                overrides = {"ema-12": {"period": fast}, "ema-26": {"period": slow}}
+                signals = strategy_signals(apply_overrides(EMA_FLIP, overrides), self.arrays)
+                position, exit_reason = window_positions(self.arrays, signals, start, end)
+                window = {name: column[start:end] for name, column in self.arrays.items()}
+                value = summarize(window, position, exit_reason, include_details=False, **options)["metrics"]["total_return_pct"]
+                if best is None or value > best[0]:
+                    best = (value, overrides)
+        return best[1]
+
+    @pytest.mark.parametrize("anchored", [False, True])
+    def test_folds_pick_the_in_sample_winner(self, anchored):
+        result = walk_forward(EMA_FLIP, self.arrays, GRID, 200, 100, anchored=anchored, fee_bps=5)
+        assert result["combinations"] == 6 and len(result["folds"]) == 4
+        for fold in result["folds"]:
+            bounds = fold["in_sample"]
+            assert fold["parameters"] == self.brute_force_best(bounds["start"], bounds["end"], {"fee_bps": 5})
+            assert fold["out_of_sample"]["start"] == bounds["end"]
+            assert fold["in_sample"]["start"] == (0 if anchored else bounds["end"] - 200)
+
+    def test_stitched_run_compounds_the_folds(self):
+        result = walk_forward(EMA_FLIP, self.arrays, GRID, 200, 150, starting_cash=1000)
+        assert result["start_index"] == 200 and len(result["equity"]) == 400
+        expected = 1000 * np.prod([1 + f["out_of_sample_metrics"]["total_return_pct"] / 100 for f in result["folds"]])
+        assert result["metrics"]["final_equity"] == pytest.approx(expected)
+        assert result["metrics"]["num_trades"] == sum(f["out_of_sample_metrics"]["num_trades"] for f in result["folds"])
+        for trade in result["trades"]:
+            assert 200 <= trade["entry_index"] < trade["exit_index"] < 600
+            assert trade["exit_reason"] != "open"
+        assert "start_time" in result["folds"][0]["in_sample"]
+
+    def test_errors(self):
+        with pytest.raises(ValueError, match="unknown nodes"):
+            walk_forward(EMA_FLIP, self.arrays, {"nope": {"period": [1]}}, 200, 100)
+        with pytest.raises(ValueError, match="sort by"):
+            walk_forward(EMA_FLIP, self.arrays, GRID, 200, 100, sort_by="nope")
+        with pytest.raises(ValueError, match="whole number"):
+            walk_forward(EMA_FLIP, self.arrays, {"ema-12": {"period": [5, 2.5]}}, 200, 100)
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 3. ENDPOINT
+# ═════════════════════════════════════════════════════════════════════════════
+
+
+class TestWalkForwardEndpoint:
+    """POST /api/backtest/walkforward over inline and stored bars."""
+
+    PARAMETERS = [
+        {"node_id": "ema-12", "parameter": "period", "start": 5, "stop": 12, "step": 7},
+        {"node_id": "ema-26", "parameter": "period", "values": [20, 30]},
+    ]
+
+    @pytest.fixture
+    def client(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(main, "ohlcv_store", OHLCVStore(str(tmp_path / "wf")))
+        return TestClient(main.app)
+
+    def test_inline_and_stored_bars_agree(self, client):
+        data = bars(0, 500, seed=9)
+        request = {"strategy": EMA_FLIP, "parameters": self.PARAMETERS, "in_sample_bars": 200, "out_of_sample_bars": 100}
+        inline = client.post("/api/backtest/walkforward", json={**request, "data": data})
+        assert inline.status_code == 200
+        assert inline.json()["combinations"] == 4 and len(inline.json()["folds"]) == 3
+
+        client.post("/api/data/BTC/1m", json=data)
+        stored = client.post("/api/backtest/walkforward", json={**request, "source": {"symbol": "BTC", "interval": "1m"}})
+        assert stored.status_code == 200
+        assert stored.json()["folds"] == inline.json()["folds"]
+        assert stored.json()["equity"] == inline.json()["equity"]
+
+    def test_too_few_bars(self, client):
+        r = client.post("/api/backtest/walkforward", json={
+            "strategy": EMA_FLIP, "parameters": self.PARAMETERS, "data": bars(0, 100),
+            "in_sample_bars": 200, "out_of_sample_bars": 50,
+        })
+        assert r.status_code == 400 and "more than 200 bars" in r.json()["detail"]
+
+    def test_invalid_values(self, client):
+        for bad in [0, -1, "abc", 2.5, None]:
+            r = client.post("/api/backtest/walkforward", json={
+                "strategy": EMA_FLIP, "data": bars(0, 400),
+                "parameters": [{"node_id": "ema-12", "parameter": "period", "values": [5, bad]}],
+                "in_sample_bars": 200, "out_of_sample_bars": 100,
+            })
+            assert r.status_code == 400 and r.json()["detail"].startswith("Walk-forward error")
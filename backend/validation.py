@@ -1,36 +1,234 @@
-from pydantic import BaseModel, validator
+"""
+Strategy graph validation: node fields, parameters, edges, ports and cycles in one linear pass
+"""
+from itertools import count as count_from
+from operator import methodcaller
 from typing import List, Dict, Any, Optional
 
-class NodeValidation(BaseModel):
-    id: str
-    type: str
-    name: str
-    parameters: Optional[Dict[str, Any]] = {}
-
-    @validator('parameters', pre=True)
-    def parse_numeric_params(cls, v):
-        if not isinstance(v, dict): return v
-        new_v = {}
-        for key, value in v.items():
-            try:
-                if isinstance(value, str) and value.replace('.', '', 1).isdigit():
-                    new_v[key] = float(value)
+VALID_TYPES = {'indicator', 'logic', 'action', 'input', 'output', 'default'}
+
+OPERATORS = {"<", ">", "<=", ">=", "==", "!=", "and", "or", "crossover", "crossunder"}
+ACTION_TYPES = {"buy", "sell"}
+
+# Lengths must be whole bars
+INTEGER_PARAMS = {"period", "fast", "slow", "signal", "k", "d"}
+POSITIVE_PARAMS = {"std_dev"}
+# Percentages where None, "" or 0 mean disabled
+RISK_PARAMS = {"stopLoss", "takeProfit"}
+CHECKED_KINDS = {"indicator", "logic", "action"}
+
+# Target handle -> canonical port per node kind; 'a' and 'default' are
+# interchangeable on single-input nodes (see graph.resolve_input)
+PORTS = {
+    'indicator': {'default': 'source', 'a': 'source'},
+    'logic': {'a': 'a', 'default': 'a', 'b': 'b'},
+    'action': {'default': 'condition', 'a': 'condition'},
+    'input': {},
+}
+# Small integer per canonical port, so (node, port) packs into one int key
+_PORT_CODES = {'source': 0, 'a': 1, 'b': 2, 'condition': 3}
+
+
+class StrategyValidationError(ValueError):
+    """Every error found in a strategy; str() joins their messages"""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        self.errors = errors
+        super().__init__("; ".join(error["message"] for error in errors))
+
+
+def _issue(code: str, message: str, node_id: Optional[str] = None, edge: Optional[int] = None) -> Dict[str, Any]:
+    issue = {"code": code, "message": message}
+    if node_id is not None:
+        issue["node_id"] = node_id
+    if edge is not None:
+        issue["edge"] = edge
+    return issue
+
+
+def _number(value: Any) -> Optional[float]:
+    """Numeric value of an int/float or numeric string, else None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _node_kind(node_type: Any) -> Optional[str]:
+    """'IndicatorNode' / 'indicator' -> 'indicator'; None for anything unknown"""
+    kind = node_type.lower() if isinstance(node_type, str) else None
+    if kind is not None and kind.endswith("node"):
+        kind = kind[:-4]
+    return kind if kind in VALID_TYPES else None
+
+
+def _check_parameters(node_id: str, kind: str, params: Dict[str, Any], errors: List[Dict[str, Any]]) -> bool:
+    """Append parameter errors; True if a logic threshold is unusable (fine only when B is wired)"""
+    for key, value in params.items():
+        if type(value) is int and value >= 1:
+            continue  # Valid for every checked parameter, and by far the common case
+        if key in INTEGER_PARAMS:
+            number = _number(value)
+            if number is None or not number.is_integer() or number < 1:
+                errors.append(_issue("parameter", f"{node_id}: '{key}' must be a whole number >= 1, got {value!r}", node_id))
+        elif key in POSITIVE_PARAMS:
+            number = _number(value)
+            if number is None or number <= 0:
+                errors.append(_issue("parameter", f"{node_id}: '{key}' must be a positive number, got {value!r}", node_id))
+        elif key in RISK_PARAMS and value not in (None, ""):
+            number = _number(value)
+            if number is None or number < 0:
+                errors.append(_issue("parameter", f"{node_id}: '{key}' must be a non-negative percentage, got {value!r}", node_id))
+
+    if kind == "logic":
+        operator = params.get("operator", "<")
+        if operator not in OPERATORS:
+            errors.append(_issue("parameter", f"{node_id}: unsupported operator {operator!r}", node_id))
+        return _number(params.get("value", 0)) is None
+    if kind == "action":
+        action_type = params.get("actionType", "buy")
+        if not isinstance(action_type, str) or action_type.lower() not in ACTION_TYPES:
+            errors.append(_issue("parameter", f"{node_id}: actionType must be 'buy' or 'sell', got {action_type!r}", node_id))
+    return False
+
+
+def check_strategy(strategy: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """All problems in a strategy -> {"errors": [...], "warnings": [...]}
+
+    Errors make the generated code wrong or silently incomplete: bad node
+    fields or parameters, edges to unknown nodes or ports, two edges into one
+    port, and cycles (which the compiler would drop). Warnings flag nodes that
+    cannot affect any trade. Each node and edge is visited a constant number
+    of times.
+    """
+    errors: List[Dict[str, Any]] = []
+    warnings: List[Dict[str, Any]] = []
+    nodes = strategy.get("nodes", [])
+    connections = strategy.get("connections", [])
+
+    index: Dict[str, int] = {}
+    ids: List[str] = []
+    kinds: List[str] = []
+    # Logic nodes whose threshold is not a number: an error unless B is wired
+    thresholds: List[int] = []
+    kind_of: Dict[Any, Optional[str]] = {}
+    for node in nodes:
+        node_id = node.get("id")
+        if type(node_id) is not str or not node_id:
+            errors.append(_issue("node", f"Node without a valid id: {node_id!r}"))
+            continue
+        if node_id in index:
+            errors.append(_issue("node", f"Duplicate node id: {node_id}", node_id))
+            continue
+        node_type = node.get("type")
+        name = node.get("name")
+        params = node.get("parameters") or {}
+        try:
+            kind = kind_of[node_type]
+        except KeyError:
+            kind = kind_of[node_type] = _node_kind(node_type)
+        except TypeError:  # Unhashable type
+            kind = None
+        if kind is None:
+            errors.append(_issue("node", f"Invalid node type: {node_type}", node_id))
+            kind = "invalid"
+        elif name == "Strategy Start":
+            kind = "input"
+        if type(name) is not str:
+            errors.append(_issue("node", f"{node_id}: name must be a string", node_id))
+        if type(params) is not dict:
+            errors.append(_issue("node", f"{node_id}: parameters must be an object", node_id))
+        elif kind in CHECKED_KINDS and _check_parameters(node_id, kind, params, errors):
+            thresholds.append(len(ids))
+        index[node_id] = len(ids)
+        ids.append(node_id)
+        kinds.append(kind)
+
+    # Edges: endpoints, ports and fan-in per port
+    count = len(ids)
+    ports_of = [PORTS.get(kind) for kind in kinds]
+    successors: List[List[int]] = [[] for _ in range(count)]
+    in_degree = [0] * count
+    # Flag per (node index * 4 + port code): the port already has an edge
+    wired = bytearray(count * 4)
+    # Endpoint and handle lookups run in C; the loop only sees indices
+    sources = list(map(index.get, map(methodcaller("get", "source"), connections)))
+    targets = list(map(index.get, map(methodcaller("get", "target"), connections)))
+    handles = map(methodcaller("get", "targetHandle"), connections)
+    for edge, s, t, handle in zip(count_from(), sources, targets, handles):
+        if s is None or t is None:
+            source, target = connections[edge].get("source"), connections[edge].get("target")
+            missing = ", ".join(str(end) for end, i in ((source, s), (target, t)) if i is None)
+            errors.append(_issue("edge", f"Connection {source} -> {target} references unknown node {missing}", edge=edge))
+            continue
+        if kinds[s] == "action":
+            errors.append(_issue("port", f"Connection {ids[s]} -> {ids[t]}: action nodes have no output", ids[s], edge))
+        ports = ports_of[t]
+        if ports is not None:
+            handle = handle or "default"
+            port = ports.get(handle)
+            if port is None:
+                accepted = ", ".join(sorted(ports)) or "none"
+                errors.append(_issue("port", f"Connection {ids[s]} -> {ids[t]}: {kinds[t]} node has no input "
+                                             f"'{handle}' (accepts: {accepted})", ids[t], edge))
+            else:
+                key = t * 4 + _PORT_CODES[port]
+                if wired[key]:
+                    errors.append(_issue("port", f"{ids[t]}: input '{port}' has more than one connection", ids[t], edge))
                 else:
-                    new_v[key] = value
-            except:
-                new_v[key] = value
-        return new_v
-
-    @validator('type')
-    def validate_type(cls, v):
-        valid_types = ['indicator', 'logic', 'action', 'input', 'output', 'default']
-        if v.lower() not in valid_types:
-            # Also allow the 'node' suffixed types if they haven't been normalized yet
-            if v.lower() not in ['indicatornode', 'logicnode', 'actionnode', 'inputnode', 'outputnode']:
-                raise ValueError(f'Invalid node type: {v}')
-        return v.lower()
-
-def validate_strategy(strategy: Dict[str, Any]):
-    for node in strategy.get("nodes", []):
-        NodeValidation(**node)
-    return True
+                    wired[key] = 1
+        successors[s].append(t)
+        in_degree[t] += 1
+
+    # The threshold stands in for an unwired 'b'
+    for i in thresholds:
+        if not wired[i * 4 + 2]:
+            errors.append(_issue("parameter", f"{ids[i]}: threshold 'value' must be a number when B is not connected",
+                                 ids[i]))
+
+    # Cycles: whatever Kahn's algorithm cannot order
+    order = [i for i in range(count) if in_degree[i] == 0]
+    for i in order:  # grows while iterating
+        for t in successors[i]:
+            in_degree[t] -= 1
+            if in_degree[t] == 0:
+                order.append(t)
+    if len(order) < count:
+        cyclic = [ids[i] for i in range(count) if in_degree[i] > 0]
+        shown = ", ".join(cyclic[:10]) + (f" and {len(cyclic) - 10} more" if len(cyclic) > 10 else "")
+        errors.append(_issue("cycle", f"Cycle through nodes {shown}; nodes on a cycle are never evaluated"))
+
+    # Reachability: nodes that feed no action cannot affect a trade. Sweeping
+    # the order backwards, a node reaches an action if one of its successors does.
+    has_actions = False
+    reaches = [False] * count
+    for i in reversed(order):
+        if kinds[i] == "action":
+            has_actions = True
+            reaches[i] = True
+            if not wired[i * 4 + 3]:
+                warnings.append(_issue("unconnected", f"{ids[i]}: action has no condition connected", ids[i]))
+        elif successors[i]:
+            reaches[i] = any(map(reaches.__getitem__, successors[i]))
+    if has_actions:
+        dead = [ids[i] for i in order if not reaches[i] and kinds[i] in ("indicator", "logic")]
+        if dead:
+            shown = ", ".join(dead[:10]) + (f" and {len(dead) - 10} more" if len(dead) > 10 else "")
+            warnings.append({"code": "unreachable", "message": f"{len(dead)} node(s) feed no action: {shown}",
+                             "node_ids": dead})
+
+    return {"errors": errors, "warnings": warnings}
+
+
+def validate_strategy(strategy: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """check_strategy, raising StrategyValidationError with every error if there are any"""
+    report = check_strategy(strategy)
+    if report["errors"]:
+        raise StrategyValidationError(report["errors"])
+    return report
@@ -0,0 +1,193 @@
+"""
+Walk-forward optimization: pick parameters on each in-sample window, trade them on the next out-of-sample one
+"""
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from backtest import (EXIT_WINDOW_END, build_signals, evaluate_strategy, resolve_positions, summarize)
+from batch_backtest import (SharedArrays, attach_source, expand_grid, get_pool, plan_shards, release,
+                            shutdown_pool, worker_count)
+from sweep import ASCENDING_METRICS, MAX_COMBINATIONS, apply_overrides, reusable_nodes, validate_grid
+
+MAX_FOLDS = 500
+
+
+def plan_windows(bars: int, in_sample: int, out_of_sample: int, anchored: bool = False) -> List[Tuple[int, int, int]]:
+    """(in-sample start, out-of-sample start, out-of-sample end) per fold
+
+    Out-of-sample windows tile every bar after the first in-sample window, so
+    their trades stitch into one curve; the last one may be shorter. Rolling
+    in-sample windows keep their length, anchored ones all start at bar 0.
+    """
+    if in_sample < 2 or out_of_sample < 1:
+        raise ValueError("Walk-forward needs at least 2 in-sample bars and 1 out-of-sample bar")
+    if bars <= in_sample:
+        raise ValueError(f"Walk-forward needs more than {in_sample} bars, got {bars}")
+    windows = [(0 if anchored else split - in_sample, split, min(split + out_of_sample, bars))
+               for split in range(in_sample, bars, out_of_sample)]
+    if len(windows) > MAX_FOLDS:
+        raise ValueError(f"Walk-forward has {len(windows)} folds, the limit is {MAX_FOLDS}")
+    return windows
+
+
+def strategy_signals(strategy: dict, arrays: Dict[str, np.ndarray], cache: Optional[Dict[str, np.ndarray]] = None,
+                     cacheable: Optional[set] = None) -> Dict[str, np.ndarray]:
+    """Buy/sell triggers over the whole history
+
+    Every node is causal, so the value at a bar is the same whether or not
+    later bars exist: folds slice these instead of re-evaluating their window,
+    and out-of-sample windows see indicators warmed up on the bars before them.
+    """
+    outputs = evaluate_strategy(strategy, arrays, cache=cache, cacheable=cacheable)
+    return build_signals(strategy, outputs, len(arrays["close"]))
+
+
+def window_positions(arrays: Dict[str, np.ndarray], signals: Dict[str, np.ndarray],
+                     start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(position, exit reason) over bars [start, end), entering flat and closing out on the last bar"""
+    position, _, exit_reason = resolve_positions(
+        arrays["close"][start:end], signals["buy"][start:end], signals["sell"][start:end],
+        signals["stop_pct"][start:end], signals["target_pct"][start:end],
+    )
+    if position[-1]:
+        if len(position) > 1 and position[-2]:
+            exit_reason[-1] = EXIT_WINDOW_END
+        # An entry on the last bar is simply not taken
+        position[-1] = 0
+    return position, exit_reason
+
+
+def _window(arrays: Dict[str, np.ndarray], start: int, end: int) -> Dict[str, np.ndarray]:
+    return {name: column[start:end] for name, column in arrays.items()}
+
+
+def _bounds(arrays: Dict[str, np.ndarray], start: int, end: int) -> Dict[str, Any]:
+    bounds = {"start": start, "end": end}
+    timestamps = arrays.get("timestamp")
+    if timestamps is not None:
+        bounds["start_time"] = int(timestamps[start])
+        bounds["end_time"] = int(timestamps[end - 1])
+    return bounds
+
+
+def score_shard(strategy: dict, source: Dict[str, Any], combos: List[dict], windows: List[Tuple[int, int, int]],
+                reusable: List[str], options: Dict[str, float], sort_by: str) -> List[Tuple[float, int, Dict[str, Any]]]:
+    """(score, index in combos, in-sample metrics) of this slice's best combination per fold (runs in a worker)"""
+    sign = -1.0 if sort_by in ASCENDING_METRICS else 1.0
+    shm = None
+    try:
+        shm, arrays = attach_source(source)
+        cache: Dict[str, np.ndarray] = {}
+        cacheable = set(reusable)
+        best: List[Optional[Tuple[float, int, Dict[str, Any]]]] = [None] * len(windows)
+        for index, overrides in enumerate(combos):
+            signals = strategy_signals(apply_overrides(strategy, overrides), arrays, cache, cacheable)
+            for fold, (start, split, _) in enumerate(windows):
+                position, exit_reason = window_positions(arrays, signals, start, split)
+                metrics = summarize(_window(arrays, start, split), position, exit_reason,
+                                    include_details=False, **options)["metrics"]
+                if sort_by not in metrics:
+                    raise ValueError(f"Unknown metric to sort by: {sort_by}")
+                score = sign * metrics[sort_by]
+                if best[fold] is None or score > best[fold][0]:
+                    best[fold] = (score, index, metrics)
+        return best
+    finally:
+        # Views into a shared block must be gone before it can be closed
+        arrays = cache = signals = position = exit_reason = None
+        release(shm)
+
+
+def walk_forward(strategy: dict, arrays: Dict[str, np.ndarray], grid: Dict[str, Dict[str, List[Any]]],
+                 in_sample: int, out_of_sample: int, anchored: bool = False, sort_by: str = "total_return_pct",
+                 starting_cash: float = 10000.0, fee_bps: float = 0.0, slippage_bps: float = 0.0,
+                 source: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Optimize the grid on every in-sample window and stitch the out-of-sample results
+
+    Combinations are split across the batch backtest pool. A combination's
+    indicators are computed once over the full history and reused by every
+    fold, rather than once per window. source is a store descriptor the
+    workers can map themselves; without one the arrays are shared through a
+    shared memory block.
+    """
+    node_ids = {node["id"] for node in strategy.get("nodes", [])}
+    unknown = [node_id for node_id in grid if node_id not in node_ids]
+    if unknown:
+        raise ValueError(f"Walk-forward references unknown nodes: {', '.join(unknown)}")
+    combos = expand_grid(grid)
+    if len(combos) > MAX_COMBINATIONS:
+        raise ValueError(f"Walk-forward has {len(combos)} combinations, the limit is {MAX_COMBINATIONS}")
+    validate_grid(strategy, grid)
+    bars = len(arrays["close"])
+    windows = plan_windows(bars, in_sample, out_of_sample, anchored)
+    options = {"starting_cash": starting_cash, "fee_bps": fee_bps, "slippage_bps": slippage_bps}
+    reusable = sorted(reusable_nodes(strategy, grid))
+
+    shared = None
+    if source is None:
+        shared = SharedArrays(arrays)
+        source = shared.descriptor
+    futures = []
+    try:
+        pool = get_pool()
+        for _, start, end in plan_shards(1, len(combos), worker_count()):
+            futures.append((start, pool.submit(score_shard, strategy, source, combos[start:end],
+                                               windows, reusable, options, sort_by)))
+        # Best per fold: highest score, then the earliest combination
+        best: List[Optional[Tuple[float, int, Dict[str, Any]]]] = [None] * len(windows)
+        for start, future in futures:
+            for fold, (score, index, metrics) in enumerate(future.result()):
+                candidate = (score, -(start + index), metrics)
+                if best[fold] is None or candidate[:2] > best[fold][:2]:
+                    best[fold] = candidate
+    except BrokenProcessPool:
+        shutdown_pool()
+        raise
+    finally:
+        for _, future in futures:
+            future.cancel()
+        if shared is not None:
+            shared.close()
+
+    cache: Dict[str, np.ndarray] = {}
+    chosen_signals: Dict[int, Dict[str, np.ndarray]] = {}
+    positions, exits, folds = [], [], []
+    for fold, ((start, split, end), (_, negative_index, in_sample_metrics)) in enumerate(zip(windows, best)):
+        index = -negative_index
+        if index not in chosen_signals:
+            chosen_signals[index] = strategy_signals(apply_overrides(strategy, combos[index]), arrays, cache)
+        position, exit_reason = window_positions(arrays, chosen_signals[index], split, end)
+        positions.append(position)
+        exits.append(exit_reason)
+        folds.append({
+            "fold": fold,
+            "in_sample": _bounds(arrays, start, split),
+            "out_of_sample": _bounds(arrays, split, end),
+            "parameters": combos[index],
+            "in_sample_metrics": in_sample_metrics,
+            "out_of_sample_metrics": summarize(_window(arrays, split, end), position, exit_reason,
+                                               include_details=False, **options)["metrics"],
+        })
+
+    # Every fold ends flat, so the out-of-sample positions chain into one run
+    first = windows[0][1]
+    combined = summarize(_window(arrays, first, bars), np.concatenate(positions), np.concatenate(exits), **options)
+    for trade in combined["trades"]:
+        trade["entry_index"] += first
+        if trade["exit_index"] is not None:
+            trade["exit_index"] += first
+
+    # Walk-forward efficiency: out-of-sample return per bar relative to in-sample
+    is_rate = np.mean([f["in_sample_metrics"]["total_return_pct"] / f["in_sample_metrics"]["bars"] for f in folds])
+    oos_rate = np.mean([f["out_of_sample_metrics"]["total_return_pct"] / f["out_of_sample_metrics"]["bars"] for f in folds])
+    return {
+        "combinations": len(combos),
+        "folds": folds,
+        "start_index": first,
+        "metrics": combined["metrics"],
+        "efficiency_pct": float(oos_rate / is_rate * 100.0) if is_rate > 0 else None,
+        "trades": combined["trades"],
+        "equity": combined["equity"],
+    }